@@ -1,16 +1,22 @@
+import asyncio
 import os
-import json
 import logging
 from datetime import datetime
-from typing import List, Optional
+from functools import partial
+from typing import List, Optional, Tuple
 
-import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from tavily import TavilyClient
-from openai import OpenAI
+from tavily import AsyncTavilyClient, TavilyClient
+from openai import AsyncOpenAI, OpenAI
 
 from state.ev_market_state import EVMarketState  # Pydantic 상태 사용
+from utils.fetch_policy import Deadline, fetch_policy
+from utils.resilience import upstreams
+from utils.result_log import ResultLog
+from utils.sharding import LARGE_UNIVERSE_THRESHOLD, run_sharded
+from utils.text_ranker import compress_text, estimate_tokens
+from utils.watermark import IngestWindow, failed_ingest, merge_articles, parse_period, published_date
 
 # 환경 설정
 load_dotenv()
@@ -22,130 +28,404 @@ LLM_MODEL = "gpt-4o"
 OUTPUT_DIR = "results/company_results"
 MAX_CONTENT_LENGTH = 5000
 MAX_SUMMARY_TOKENS = 500
-REQUEST_TIMEOUT = 5
-START_DATE = "2024-11-19"
-END_DATE = "2025-05-19"
+MAX_PROMPT_TOKENS = 1500  # 요약 프롬프트에 넣을 기사 본문 토큰 예산
+AGENT_DEADLINE = 300  # 에이전트 전체 작업 시간 예산(초)
+COMPANY_DEADLINE = 60  # 기업당 검색/수집 시간 예산(초)
+RESULTS_PER_SEARCH = 10
+ASYNC_CONCURRENCY = 8  # 비동기 실행 시 동시에 분석할 기업 수
+MAX_SOURCES = 10  # 결과에 남길 출처 기사 수 (다음 실행의 중복 제외에도 사용)
+# 요약 프롬프트 항목(전략, R&D, 투자, 차별화)에 맞춘 문장 선별용 질의
+RANKING_QUERY = (
+    "business strategy core plan new product launch model R&D research technology "
+    "battery production capacity factory plant investment billion expansion "
+    "competitor market share differentiation"
+)
+# 기업 요약 프롬프트 (동기/비동기 요약에서 공통 사용)
+SUMMARY_PROMPT = (
+    "당신은 글로벌 기업의 사업 동향을 분석하는 전문 애널리스트입니다.\n\n"
+    "다음 항목에 맞춰 체계적으로 정리하세요:\n"
+    "1. 사업 전략 (Core Strategy)\n"
+    "2. 신제품 출시 및 R&D 동향\n"
+    "3. 생산 능력 확대 및 투자 계획\n"
+    "4. 경쟁사 대비 차별화 요소\n\n"
+    "- 반드시 정량적 정보(수치, 일정, 투자 규모 등)를 포함하세요.\n"
+    "- 전체 요약은 500~600자 이내로 작성하세요."
+)
+# 이전 실행의 요약에 새 기사 내용을 반영할 때 사용하는 입력 형식
+MERGE_TEMPLATE = (
+    "아래 기존 요약을 새 기사 내용으로 갱신하세요. 새 기사와 상충하는 내용은 새 기사를 따르고, "
+    "여전히 유효한 기존 내용은 유지하세요.\n\n[기존 요약]\n{previous}\n\n[새 기사]\n{content}"
+)
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 tavily_client = TavilyClient(TAVILY_API_KEY)
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+result_log = ResultLog(OUTPUT_DIR, "business_analysis")
+# 재시도는 utils.resilience에서 백오프/예산/차단기로 처리하므로 SDK 자체 재시도는 끔
+openai_client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+async_tavily_client = AsyncTavilyClient(TAVILY_API_KEY)
+async_openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
 
 # LangGraph Node 실행 함수
 def run(state: EVMarketState) -> EVMarketState:
     companies = state.companies or []
     num_results = state.num_results
+    period = parse_period(state.analysis_period)
     results = []
+    agent_deadline = Deadline(AGENT_DEADLINE)
 
-    for company in companies:
-        logging.info(f"[CompanyAnalyzer] 분석 시작 - {company}")
-        result = analyze_company(company, num_results)
-        if result.get("status") == "success":
-            results.append(result)
+    if len(companies) > LARGE_UNIVERSE_THRESHOLD:
+        results = _run_sharded(companies, num_results, period, state)
+    else:
+        for company in companies:
+            if agent_deadline.expired():
+                logging.warning(f"[CompanyAnalyzer] 작업 기한 초과 - {company} 생략")
+                _accept(state, results, _skipped(company, period))
+                continue
+            logging.info(f"[CompanyAnalyzer] 분석 시작 - {company}")
+            result = analyze_company(
+                company, num_results, agent_deadline.child(COMPANY_DEADLINE), period=period
+            )
+            _accept(state, results, result)
 
     # 상태 업데이트
     state.company_data = results
+    result_log.flush()
     return state
 
+async def arun(state: EVMarketState) -> EVMarketState:
+    """run()의 비동기 버전 - 여러 기업의 검색/수집/요약을 하나의 이벤트 루프에서 겹쳐 실행"""
+    companies = state.companies or []
+    num_results = state.num_results
+    period = parse_period(state.analysis_period)
+    agent_deadline = Deadline(AGENT_DEADLINE)
+
+    if len(companies) > LARGE_UNIVERSE_THRESHOLD:
+        # 대규모 목록은 프로세스 격리가 필요하므로 기존 샤드 실행을 스레드에서 기다림
+        results = await asyncio.to_thread(_run_sharded, companies, num_results, period, state)
+    else:
+        limit = asyncio.Semaphore(ASYNC_CONCURRENCY)
+
+        async def analyze(company: str) -> Optional[dict]:
+            async with limit:
+                if agent_deadline.expired():
+                    logging.warning(f"[CompanyAnalyzer] 작업 기한 초과 - {company} 생략")
+                    return _skipped(company, period)
+                logging.info(f"[CompanyAnalyzer] 분석 시작 - {company}")
+                return await analyze_company_async(
+                    company, num_results, agent_deadline.child(COMPANY_DEADLINE), period=period
+                )
+
+        outcomes = await asyncio.gather(*(analyze(c) for c in companies), return_exceptions=True)
+        results = []
+        for company, outcome in zip(companies, outcomes):
+            if isinstance(outcome, Exception):
+                logging.error(f"[CompanyAnalyzer] 분석 실패 - {company} - {outcome}")
+                outcome = failed_ingest(
+                    "Company_Analyzer", company, IngestWindow(period, result_log.latest(company)), str(outcome)
+                )
+            _accept(state, results, outcome)
+
+    state.company_data = results
+    result_log.flush()
+    return state
+
+def _analyze_shard(companies: List[str], num_results: int, period: Tuple[str, str]) -> List[dict]:
+    # 워커 프로세스에서 실행되며, 결과 로그 기록은 부모 프로세스가 담당 (이전 결과는 읽기만 함)
+    results = []
+    for company in companies:
+        logging.info(f"[CompanyAnalyzer] 분석 시작 - {company}")
+        results.append(
+            analyze_company(company, num_results, Deadline(COMPANY_DEADLINE), save=False, period=period)
+        )
+    return results
+
+def _run_sharded(
+    companies: List[str], num_results: int, period: Tuple[str, str], state: EVMarketState
+) -> List[dict]:
+    results = []
+    shard_fn = partial(_analyze_shard, num_results=num_results, period=period)
+    for shard, shard_results in run_sharded(shard_fn, companies, label="CompanyAnalyzer"):
+        if isinstance(shard_results, Exception):
+            shard_results = [
+                failed_ingest(
+                    "Company_Analyzer", company, IngestWindow(period, result_log.latest(company)), str(shard_results)
+                )
+                for company in shard
+            ]
+
+        for result in shard_results:
+            if result.get("status") == "success":
+                _save_to_file(result, result["company"])
+            _accept(state, results, result)
+
+        # 끝난 샤드의 결과를 상태에 바로 반영
+        state.company_data = list(results)
+    return results
+
 # 분석 함수
-def analyze_company(company_name: str, num_results: int = 5) -> dict:
-    collected_articles = []
-    query_base = f"{company_name} business strategy investment R&D"
-    attempts = 0
-    max_attempts = 3
-    results_per_attempt = 10
-
-    while len(collected_articles) < num_results and attempts < max_attempts:
-        query = f"{query_base} from {START_DATE} to {END_DATE}"
-        try:
-            response = tavily_client.search(query=query, max_results=results_per_attempt)
-            new_articles = _filter_and_collect_articles(response, num_results - len(collected_articles))
-            collected_articles.extend(new_articles)
-        except Exception as e:
-            logging.error(f"[CompanyAnalyzer] 검색 실패 - {company_name} - {e}")
-        attempts += 1
-
-    if len(collected_articles) < num_results:
-        logging.warning(f"[CompanyAnalyzer] {company_name} 기사 부족 - {len(collected_articles)}개 확보됨")
-
-    result = _format_results(collected_articles, company_name)
-    _save_to_file(result, company_name)
-    return result
+def analyze_company(
+    company_name: str,
+    num_results: int = 5,
+    deadline: Optional[Deadline] = None,
+    save: bool = True,
+    period: Optional[Tuple[str, str]] = None,
+) -> dict:
+    window = IngestWindow(period or parse_period(None), result_log.latest(company_name))
+    if window.up_to_date:
+        return _up_to_date(company_name, window)
+    # 일시적 오류는 지터 백오프로 재시도하고, 같은 질의를 즉시 반복하지 않음
+    try:
+        response = upstreams.get("tavily").call(
+            tavily_client.search, **_search_request(company_name, window), deadline=deadline
+        )
+        articles = _filter_and_collect_articles(_new_items(response, window), num_results, deadline)
+    except Exception as e:
+        return _search_failed(company_name, window, e)
+
+    failure, content, complete = _summary_plan(company_name, articles, num_results, window, deadline)
+    if failure is not None:
+        return failure
+    summary = _summarize_content(content, _previous_summary(window)) if content else _previous_summary(window)
+    return _finish(summary, company_name, window, articles, complete, save)
 
-def _filter_and_collect_articles(raw_data: dict, needed: int) -> List[dict]:
-    results = raw_data.get("results", [])
-    collected = []
-
-    for item in results:
-        url = item.get("url", "")
-        content = _fetch_article_content(url)
-        if content:
-            collected.append({
-                "headline": item.get("title", "No Title"),
-                "url": url,
-                "published_at": item.get("published_at") or "Unknown",
-                "content": content,
-            })
-        if len(collected) >= needed:
-            break
-
-    return collected
-
-def _fetch_article_content(url: str) -> Optional[str]:
+async def analyze_company_async(
+    company_name: str,
+    num_results: int = 5,
+    deadline: Optional[Deadline] = None,
+    save: bool = True,
+    period: Optional[Tuple[str, str]] = None,
+) -> dict:
+    """analyze_company()의 비동기 버전 (검색/수집/요약 호출만 await로 바뀜)"""
+    window = IngestWindow(period or parse_period(None), result_log.latest(company_name))
+    if window.up_to_date:
+        return _up_to_date(company_name, window)
     try:
-        response = requests.get(url, timeout=REQUEST_TIMEOUT)
-        if response.ok:
-            soup = BeautifulSoup(response.text, "html.parser")
-            paragraphs = soup.find_all("p")
-            return " ".join(p.get_text() for p in paragraphs)[:MAX_CONTENT_LENGTH]
-    except requests.RequestException:
-        pass
+        response = await upstreams.get("tavily").acall(
+            async_tavily_client.search, **_search_request(company_name, window), deadline=deadline
+        )
+        articles = await _afilter_and_collect_articles(_new_items(response, window), num_results, deadline)
+    except Exception as e:
+        return _search_failed(company_name, window, e)
+
+    failure, content, complete = _summary_plan(company_name, articles, num_results, window, deadline)
+    if failure is not None:
+        return failure
+    summary = (
+        await _asummarize_content(content, _previous_summary(window)) if content else _previous_summary(window)
+    )
+    return _finish(summary, company_name, window, articles, complete, save)
+
+def _up_to_date(company_name: str, window: IngestWindow) -> dict:
+    logging.info(f"[CompanyAnalyzer] 새로 검색할 기간 없음 - {company_name} 이전 결과 사용")
+    return window.previous
+
+def _search_failed(company_name: str, window: IngestWindow, error: Exception) -> dict:
+    logging.error(f"[CompanyAnalyzer] 검색 실패 - {company_name} - {error}")
+    return failed_ingest("Company_Analyzer", company_name, window, f"검색 실패: {error}")
+
+def _summary_plan(
+    company_name: str, articles: List[dict], needed: int, window: IngestWindow, deadline: Optional[Deadline]
+) -> Tuple[Optional[dict], Optional[str], bool]:
+    """수집 결과로 (실패 결과, 요약할 본문, 검색 완료 여부)를 결정.
+
+    요약할 본문이 None이면 새 기사가 없는 증분 실행이므로 이전 요약을 그대로 사용한다.
+    """
+    # 필요한 개수를 채우지 못한 채 기한이 지났으면 수집한 기사만 반영하고 워터마크는 유지
+    complete = len(articles) >= needed or deadline is None or not deadline.expired()
+    if not articles and not window.incremental:
+        # 요약할 기사가 없는 첫 수집은 결과를 남기지 않고 다음 실행에서 다시 검색
+        error = "수집된 기사 없음" if complete else "작업 기한 초과"
+        return failed_ingest("Company_Analyzer", company_name, window, error), None, complete
+    _log_collected(company_name, articles, needed, window)
+    content = _compress_articles(articles, company_name) if articles else None
+    return None, content, complete
+
+def _finish(
+    summary: Optional[dict],
+    company_name: str,
+    window: IngestWindow,
+    articles: List[dict],
+    complete: bool,
+    save: bool,
+) -> dict:
+    result = _build_result(summary, company_name, window, articles, complete)
+    if save and result["status"] == "success":
+        _save_to_file(result, company_name)
+    return result
+
+def _skipped(company_name: str, period: Tuple[str, str]) -> dict:
+    window = IngestWindow(period, result_log.latest(company_name))
+    return failed_ingest("Company_Analyzer", company_name, window, "작업 기한 초과")
+
+def _accept(state: EVMarketState, results: List[dict], result: dict):
+    # 실패한 기업은 오류로 남기고, 이전 실행 결과가 있으면 그대로 리포트에 사용
+    if result.get("status") == "success":
+        results.append(result)
+        return
+    state.errors[result["company"]] = result.get("error_info", "분석 실패")
+    if result.get("previous"):
+        results.append(result["previous"])
+
+def _search_request(company_name: str, window: IngestWindow) -> dict:
+    # 워터마크 이후 기간만 검색 (질의 문구와 날짜 범위 인자 모두에 반영)
+    return {
+        "query": f"{company_name} business strategy investment R&D from {window.start} to {window.end}",
+        "max_results": RESULTS_PER_SEARCH,
+        **window.search_kwargs(),
+    }
+
+def _new_items(raw_data: dict, window: IngestWindow) -> dict:
+    seen = {source.get("url", "") for source in (window.previous or {}).get("sources", [])}
+    return {"results": [item for item in raw_data.get("results", []) if window.is_new(item, seen)]}
+
+def _log_collected(company_name: str, articles: List[dict], needed: int, window: IngestWindow):
+    if window.incremental:
+        logging.info(
+            f"[CompanyAnalyzer] 증분 수집 - {company_name} - {window.start} 이후 새 기사 {len(articles)}개"
+        )
+    elif len(articles) < needed:
+        logging.warning(f"[CompanyAnalyzer] {company_name} 기사 부족 - {len(articles)}개 확보됨")
+
+def _previous_summary(window: IngestWindow) -> Optional[dict]:
+    return window.previous["business_strategy"] if window.incremental else None
+
+def _filter_and_collect_articles(raw_data: dict, needed: int, deadline: Optional[Deadline] = None) -> List[dict]:
+    items = _items_by_url(raw_data)
+    fetched = fetch_policy.fetch_candidates(
+        list(items), lambda url: _fetch_article_content(url, deadline), needed, deadline
+    )
+    return _collected_articles(items, fetched)
+
+async def _afilter_and_collect_articles(
+    raw_data: dict, needed: int, deadline: Optional[Deadline] = None
+) -> List[dict]:
+    items = _items_by_url(raw_data)
+    fetched = await fetch_policy.afetch_candidates(
+        list(items), lambda url: _afetch_article_content(url, deadline), needed, deadline
+    )
+    return _collected_articles(items, fetched)
+
+def _items_by_url(raw_data: dict) -> dict:
+    return {item.get("url", ""): item for item in raw_data.get("results", [])}
+
+def _collected_articles(items: dict, fetched: List[Tuple[str, str]]) -> List[dict]:
+    return [
+        {
+            "headline": items[url].get("title", "No Title"),
+            "url": url,
+            "published_at": published_date(items[url]) or "Unknown",
+            "content": content,
+        }
+        for url, content in fetched
+    ]
+
+def _fetch_article_content(url: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+    response = fetch_policy.get(url, deadline)
+    if response is not None and response.ok:
+        return _extract_paragraphs(response.text)
     return None
 
-def _format_results(articles: List[dict], company_name: str) -> dict:
+async def _afetch_article_content(url: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+    response = await fetch_policy.aget(url, deadline)
+    if response is not None and response.is_success:
+        # HTML 파싱은 CPU 작업이라 이벤트 루프를 막지 않도록 스레드에서 실행
+        return await asyncio.to_thread(_extract_paragraphs, response.text)
+    return None
+
+def _extract_paragraphs(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    paragraphs = soup.find_all("p")
+    return " ".join(p.get_text() for p in paragraphs)[:MAX_CONTENT_LENGTH]
+
+def _compress_articles(articles: List[dict], company_name: str) -> str:
     combined_text = "\n\n".join(article["content"] for article in articles if article["content"])
-    summary = _summarize_content(combined_text)
+    compressed_text = compress_text(combined_text, RANKING_QUERY, MAX_PROMPT_TOKENS)
+    logging.info(
+        f"[CompanyAnalyzer] 본문 압축 - {company_name} - "
+        f"{estimate_tokens(combined_text)} -> {estimate_tokens(compressed_text)} 토큰"
+    )
+    return compressed_text
 
-    return {
+def _build_result(
+    summary: Optional[dict],
+    company_name: str,
+    window: Optional[IngestWindow] = None,
+    articles: List[dict] = (),
+    complete: bool = True,
+) -> dict:
+    if summary is None and window is not None and window.incremental:
+        # 갱신 요약이 실패하면 워터마크를 올리지 않고 이전 결과를 유지해 다음 실행에서 다시 시도
+        logging.warning(f"[CompanyAnalyzer] 요약 갱신 실패 - {company_name} 이전 결과 유지")
+        return window.previous
+    if summary is None:
+        # 요약에 실패한 기업은 "요약 실패" 문구 대신 실패 상태로 남겨 리포트에서 제외
+        return {
+            "agent_name": "Company_Analyzer",
+            "status": "fail",
+            "timestamp": datetime.utcnow().isoformat(),
+            "company": company_name,
+            "error_info": "LLM 요약 실패",
+        }
+    result = {
         "agent_name": "Company_Analyzer",
         "status": "success",
         "timestamp": datetime.utcnow().isoformat(),
         "company": company_name,
         "business_strategy": summary,
     }
+    if window is not None:
+        sources = [
+            {key: article[key] for key in ("headline", "url", "published_at")} for article in articles
+        ]
+        previous_sources = (window.previous or {}).get("sources", [])
+        result["sources"] = merge_articles(sources, previous_sources, window.period_start, MAX_SOURCES)
+        result["coverage"] = window.next_coverage(articles, complete)
+        if not complete:
+            logging.warning(
+                f"[CompanyAnalyzer] 작업 기한 초과 - {company_name} 기사 {len(articles)}개로 부분 결과 저장 (워터마크 유지)"
+            )
+    return result
 
-def _summarize_content(content: str) -> dict:
+def _summary_request(content: str, previous: Optional[dict] = None) -> dict:
+    if previous:
+        content = MERGE_TEMPLATE.format(previous=_format_summary(previous), content=content)
+    return dict(
+        model=LLM_MODEL,
+        agent="CompanyAnalyzer",
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": content},
+        ],
+        max_tokens=MAX_SUMMARY_TOKENS,
+        temperature=0.3,
+    )
+
+def _summarize_content(content: str, previous: Optional[dict] = None) -> Optional[dict]:
     try:
-        response = openai_client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "당신은 글로벌 기업의 사업 동향을 분석하는 전문 애널리스트입니다.\n\n"
-                        "다음 항목에 맞춰 체계적으로 정리하세요:\n"
-                        "1. 사업 전략 (Core Strategy)\n"
-                        "2. 신제품 출시 및 R&D 동향\n"
-                        "3. 생산 능력 확대 및 투자 계획\n"
-                        "4. 경쟁사 대비 차별화 요소\n\n"
-                        "- 반드시 정량적 정보(수치, 일정, 투자 규모 등)를 포함하세요.\n"
-                        "- 전체 요약은 500~600자 이내로 작성하세요."
-                    ),
-                },
-                {"role": "user", "content": content},
-            ],
-            max_tokens=MAX_SUMMARY_TOKENS,
-            temperature=0.3,
+        response = upstreams.get("openai").call(
+            openai_client.chat.completions.create, **_summary_request(content, previous)
         )
-        summary_text = response.choices[0].message.content.strip()
-        return _parse_summary(summary_text)
+        return _parse_summary(response.choices[0].message.content.strip())
     except Exception as e:
-        logging.error(f"요약 실패 - Error: {e}")
-        return {
-            "core_strategy": "요약 실패",
-            "new_products_rnd": "요약 실패",
-            "investment_plans": "요약 실패",
-            "differentiators": "요약 실패",
-        }
+        logging.error(f"[CompanyAnalyzer] 요약 실패 - {e}")
+        return None
+
+async def _asummarize_content(content: str, previous: Optional[dict] = None) -> Optional[dict]:
+    try:
+        response = await upstreams.get("openai").acall(
+            async_openai_client.chat.completions.create, **_summary_request(content, previous)
+        )
+        return _parse_summary(response.choices[0].message.content.strip())
+    except Exception as e:
+        logging.error(f"[CompanyAnalyzer] 요약 실패 - {e}")
+        return None
+
+def _format_summary(summary: dict) -> str:
+    # _parse_summary()가 다시 읽을 수 있는 번호 목록 형식
+    return "\n".join(
+        f"{i}. {summary.get(key, '')}"
+        for i, key in enumerate(("core_strategy", "new_products_rnd", "investment_plans", "differentiators"), 1)
+    )
 
 def _parse_summary(summary_text: str) -> dict:
     sections = {
@@ -176,13 +456,4 @@ def _parse_summary(summary_text: str) -> dict:
     return sections
 
 def _save_to_file(data: dict, company_name: str):
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    filename = f"{company_name}_business_analysis_{timestamp}.json"
-    filepath = os.path.join(OUTPUT_DIR, filename)
-
-    try:
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        logging.info(f"[CompanyAnalyzer] 저장 완료 - {filepath}")
-    except IOError as e:
-        logging.error(f"[CompanyAnalyzer] 저장 실패 - {e}")
+    result_log.append(data, key=company_name)
@@ -1,15 +1,23 @@
+import asyncio
 import os
-import json
 import logging
+import threading
 
+from collections import defaultdict
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
-import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from tavily import TavilyClient
-from openai import OpenAI
+from tavily import AsyncTavilyClient, TavilyClient
+from openai import AsyncOpenAI, OpenAI
+
+from utils.fetch_policy import Deadline, fetch_policy
+from utils.pipeline import AsyncStreamingPipeline, Stage, StreamingPipeline
+from utils.resilience import upstreams
+from utils.result_log import ResultLog
+from utils.text_ranker import compress_text
+from utils.watermark import IngestWindow, failed_ingest, merge_articles, parse_period, published_date
 
 # 환경 설정 및 초기화
 load_dotenv()
@@ -23,13 +31,23 @@ LLM_MODEL = "gpt-4o"
 OUTPUT_DIR = "results/market_results"
 MAX_CONTENT_LENGTH = 5000
 MAX_SUMMARY_TOKENS = 300
-REQUEST_TIMEOUT = 5
-START_DATE = "2024-11-19"
-END_DATE = "2025-05-19"
+AGENT_DEADLINE = 300  # 에이전트 전체 작업 시간 예산(초)
+COMPANY_DEADLINE = 60  # 기업당 검색/수집 시간 예산(초)
+MAX_ARTICLES_PER_COMPANY = 10  # 이전 실행 기사와 병합한 뒤 기업별로 유지할 기사 수
+# 검색 → 수집 → 본문 추출 → 요약 스트리밍 파이프라인의 단계별 동시성
+PIPELINE_WORKERS = {"search": 2, "fetch": 8, "extract": 2, "summarize": 4}
+RESULTS_PER_SEARCH = 10
+# LLM 요약을 쓸 수 없을 때 대신 뽑는 핵심 문장의 토큰 예산과 선별 질의
+FALLBACK_SUMMARY_TOKENS = 150
+FALLBACK_QUERY = "electric vehicle EV market sales growth share battery price demand policy subsidy billion percent"
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 tavily_client = TavilyClient(TAVILY_API_KEY)
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+result_log = ResultLog(OUTPUT_DIR, "market_trends")
+# 재시도는 utils.resilience에서 백오프/예산/차단기로 처리하므로 SDK 자체 재시도는 끔
+openai_client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+async_tavily_client = AsyncTavilyClient(TAVILY_API_KEY)
+async_openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
 
 
 # LangGraph Node 함수
@@ -39,159 +57,482 @@ from state.ev_market_state import EVMarketState  # 상태 모델 import
 def run(state: EVMarketState) -> EVMarketState:
     companies = state.companies or []
     num_results = state.num_results or 5
-    market_results = []
 
     if state.market_summary_content:
-        # 미리 주어진 요약 내용이 있는 경우 직접 결과 구성
-        logging.info("[MarketResearcher] 미리 제공된 market_summary_content 사용")
-        market_results.append(
-            {
-                "agent_name": "Market_Researcher",
-                "status": "success",
-                "timestamp": datetime.utcnow().isoformat(),
-                "company": ", ".join(companies),
-                "market_trends": [
-                    {
-                        "headline": "요약 제공",
-                        "url": "",
-                        "published_at": "",
-                        "summary": state.market_summary_content,
-                    }
-                ],
-            }
+        market_results = [_provided_summary_result(state)]
+    else:
+        market_results = _run_pipeline(
+            companies, num_results, Deadline(AGENT_DEADLINE), parse_period(state.analysis_period)
         )
+
+    state.market_data = _accept(state, market_results)
+    result_log.flush()
+    return state
+
+
+async def arun(state: EVMarketState) -> EVMarketState:
+    """run()의 비동기 버전 - 모든 기업의 검색/수집/요약을 하나의 이벤트 루프에서 겹쳐 실행"""
+    companies = state.companies or []
+    num_results = state.num_results or 5
+
+    if state.market_summary_content:
+        market_results = [_provided_summary_result(state)]
     else:
-        for company in companies:
-            logging.info(f"[MarketResearcher] 트렌드 조사 시작 - {company}")
-            result = search_trends(company, num_results)
-            if result.get("status") == "success":
-                market_results.append(result)
+        market_results = await _arun_pipeline(
+            companies, num_results, Deadline(AGENT_DEADLINE), parse_period(state.analysis_period)
+        )
 
-    state.market_data = market_results
+    state.market_data = _accept(state, market_results)
+    result_log.flush()
     return state
 
 
-# 검색 및 요약 관련 함수들
-def search_trends(company: str, num_results: int = 5) -> Dict[str, Any]:
-    collected_articles = []
-    query_base = f"{company} electric vehicle market trends"
-    attempts = 0
-    max_attempts = 3
-    results_per_attempt = 10
-
-    while len(collected_articles) < num_results and attempts < max_attempts:
-        query = f"{query_base} from {START_DATE} to {END_DATE}"
+def _accept(state: EVMarketState, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # 수집이 끝나지 않은 기업은 오류로 남기고, 이전 실행 결과가 있으면 그대로 사용
+    accepted = []
+    for result in results:
+        if result.get("status") == "success":
+            accepted.append(result)
+            continue
+        state.errors[f"market:{result['company']}"] = result.get("error_info", "수집 실패")
+        if result.get("previous"):
+            accepted.append(result["previous"])
+    return accepted
+
+
+def _provided_summary_result(state: EVMarketState) -> Dict[str, Any]:
+    # 미리 주어진 요약 내용이 있는 경우 직접 결과 구성
+    logging.info("[MarketResearcher] 미리 제공된 market_summary_content 사용")
+    return {
+        "agent_name": "Market_Researcher",
+        "status": "success",
+        "timestamp": datetime.utcnow().isoformat(),
+        "company": ", ".join(state.companies or []),
+        "market_trends": [
+            {
+                "headline": "요약 제공",
+                "url": "",
+                "published_at": "",
+                "summary": state.market_summary_content,
+            }
+        ],
+    }
+
+
+class _Collection:
+    """여러 기업의 기사 수집 진행 상황 (동기/비동기 파이프라인 단계가 공유)"""
+
+    def __init__(self, companies: List[str], num_results: int, period: Tuple[str, str]):
+        self.num_results = num_results
+        self.windows = {company: IngestWindow(period, result_log.latest(company)) for company in companies}
+        self.grouped: Dict[str, List[Dict[str, Any]]] = {company: [] for company in companies}
+        self.search_errors: Dict[str, str] = {}
+        self.claimed = defaultdict(int)  # 기업별로 확보한 기사 수
+        # 검색이 끝난 기업별로 아직 파이프라인을 빠져나오지 않은 기사 수 (기한 초과 시 중단된 기업 판별용)
+        self.outstanding: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def search_window(self, company: str) -> Optional[IngestWindow]:
+        """새로 검색할 기간이 있으면 검색 구간, 없으면 None"""
+        window = self.windows[company]
+        if window.up_to_date:
+            logging.info(f"[MarketResearcher] 새로 검색할 기간 없음 - {company} 이전 결과 사용")
+            return None
+        logging.info(f"[MarketResearcher] 트렌드 조사 시작 - {company}")
+        return window
+
+    def searched(self, company: str, response: Dict[str, Any]) -> List[Dict[str, Any]]:
+        tasks = [
+            {"company": company, "rank": rank, "item": item}
+            for rank, item in enumerate(_new_items(response, self.windows[company]))
+        ]
+        with self._lock:
+            self.outstanding[company] = len(tasks)
+        return tasks
+
+    def search_failed(self, company: str, error: Exception) -> List[Dict[str, Any]]:
+        logging.error(f"[MarketResearcher] Tavily 검색 실패 - {company} - {error}")
+        self.search_errors[company] = f"검색 실패: {error}"
+        return []
+
+    def wanted(self, task: Dict[str, Any]) -> bool:
+        return self.claimed[task["company"]] < self.num_results
+
+    def claim(self, task: Dict[str, Any], content: str) -> Optional[Dict[str, Any]]:
+        # 본문을 확보한 순서대로 기업별 num_results개까지만 요약 단계로 넘김
+        if not content:
+            return None
+        with self._lock:
+            if self.claimed[task["company"]] >= self.num_results:
+                return None
+            self.claimed[task["company"]] += 1
+        task["content"] = content
+        return task
+
+    def settle(self, company: str):
+        with self._lock:
+            self.outstanding[company] -= 1
+
+    def tracked(self, fn):
+        # 단계에서 버려지거나 실패한 기사도 처리가 끝난 것으로 셈
+        def wrapper(task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            try:
+                output = fn(task)
+            except Exception:
+                self.settle(task["company"])
+                raise
+            if output is None:
+                self.settle(task["company"])
+            return output
+
+        return wrapper
+
+    def atracked(self, afn):
+        """tracked()의 비동기 버전"""
+
+        async def wrapper(task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            try:
+                output = await afn(task)
+            except Exception:
+                self.settle(task["company"])
+                raise
+            if output is None:
+                self.settle(task["company"])
+            return output
+
+        return wrapper
+
+    def add(self, task: Dict[str, Any]):
+        self.grouped[task["company"]].append(task)
+        self.settle(task["company"])
+
+    def results(self, pipeline_completed: bool) -> List[Dict[str, Any]]:
+        market_results = []
+        for company, tasks in self.grouped.items():
+            window = self.windows[company]
+            if window.up_to_date:
+                market_results.append(window.previous)
+                continue
+            if company in self.search_errors:
+                market_results.append(
+                    failed_ingest("Market_Researcher", company, window, self.search_errors[company])
+                )
+                continue
+            # 파이프라인이 기한 초과로 멈췄을 때 처리 중인 기사가 남은 기업만 워터마크를 유지
+            complete = (
+                pipeline_completed
+                or len(tasks) >= self.num_results
+                or self.outstanding.get(company, 1) <= 0
+            )
+            if not complete and not tasks:
+                market_results.append(failed_ingest("Market_Researcher", company, window, "작업 기한 초과"))
+                continue
+            _log_collected(company, len(tasks), self.num_results, window)
+            tasks.sort(key=lambda task: task["rank"])
+            result = _build_result([task["article"] for task in tasks], company, window, complete)
+            _save_to_file(result, company)
+            market_results.append(result)
+        return market_results
+
+
+def _article(item: Dict[str, Any], summary: Dict[str, str]) -> Dict[str, str]:
+    return {
+        "headline": item.get("title", "No Title"),
+        "url": item.get("url", ""),
+        "published_at": published_date(item) or "Unknown",
+        **summary,
+    }
+
+
+def _pipeline_stages(search, fetch, extract, summarize, track) -> List[Stage]:
+    # 검색 → 수집 → 본문 추출 → 요약 (track은 중단된 기업 판별을 위해 버려진 기사를 셈)
+    return [
+        Stage("search", search, PIPELINE_WORKERS["search"], fan_out=True),
+        Stage("fetch", track(fetch), PIPELINE_WORKERS["fetch"]),
+        Stage("extract", track(extract), PIPELINE_WORKERS["extract"]),
+        Stage("summarize", track(summarize), PIPELINE_WORKERS["summarize"]),
+    ]
+
+
+def _run_pipeline(
+    companies: List[str], num_results: int, deadline: Deadline, period: Tuple[str, str]
+) -> List[Dict[str, Any]]:
+    """여러 기업의 기사 수집과 요약을 단계별로 겹쳐 실행"""
+    collection = _Collection(companies, num_results, period)
+
+    def search(company: str) -> List[Dict[str, Any]]:
+        window = collection.search_window(company)
+        if window is None:
+            return []
         try:
-            response = tavily_client.search(
-                query=query, max_results=results_per_attempt
+            response = upstreams.get("tavily").call(
+                tavily_client.search, **_search_request(company, window), deadline=deadline
             )
-            new_articles = _filter_and_collect_articles(
-                response, num_results - len(collected_articles)
+        except Exception as e:
+            return collection.search_failed(company, e)
+        return collection.searched(company, response)
+
+    def fetch(task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not collection.wanted(task):
+            return None
+        response = fetch_policy.get(task["item"].get("url", ""), deadline)
+        if response is None or not response.ok:
+            return None
+        task["html"] = response.text
+        return task
+
+    def extract(task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return collection.claim(task, _extract_paragraphs(task.pop("html")))
+
+    def summarize(task: Dict[str, Any]) -> Dict[str, Any]:
+        task["article"] = _article(task.pop("item"), _summarize_content(task.pop("content")))
+        return task
+
+    pipeline = StreamingPipeline(
+        _pipeline_stages(search, fetch, extract, summarize, collection.tracked), name="market"
+    )
+    for task in pipeline.run(companies, deadline):
+        collection.add(task)
+    logging.info(f"[MarketResearcher] 파이프라인 지표 - {pipeline.metrics()}")
+    return collection.results(pipeline.completed)
+
+
+async def _arun_pipeline(
+    companies: List[str], num_results: int, deadline: Deadline, period: Tuple[str, str]
+) -> List[Dict[str, Any]]:
+    """_run_pipeline()의 비동기 버전. 같은 단계 구성과 bounded queue를 asyncio 태스크로 실행"""
+    collection = _Collection(companies, num_results, period)
+
+    async def search(company: str) -> List[Dict[str, Any]]:
+        window = collection.search_window(company)
+        if window is None:
+            return []
+        try:
+            response = await upstreams.get("tavily").acall(
+                async_tavily_client.search, **_search_request(company, window), deadline=deadline
             )
-            collected_articles.extend(new_articles)
         except Exception as e:
-            logging.error(f"[MarketResearcher] Tavily 검색 실패 - {company} - {e}")
-        attempts += 1
+            return collection.search_failed(company, e)
+        return collection.searched(company, response)
+
+    async def fetch(task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not collection.wanted(task):
+            return None
+        response = await fetch_policy.aget(task["item"].get("url", ""), deadline)
+        if response is None or not response.is_success:
+            return None
+        task["html"] = response.text
+        return task
+
+    async def extract(task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # HTML 파싱은 CPU 작업이라 이벤트 루프를 막지 않도록 스레드에서 실행
+        content = await asyncio.to_thread(_extract_paragraphs, task.pop("html"))
+        return collection.claim(task, content)
+
+    async def summarize(task: Dict[str, Any]) -> Dict[str, Any]:
+        task["article"] = _article(task.pop("item"), await _asummarize_content(task.pop("content")))
+        return task
+
+    pipeline = AsyncStreamingPipeline(
+        _pipeline_stages(search, fetch, extract, summarize, collection.atracked), name="market"
+    )
+    async for task in pipeline.run(companies, deadline):
+        collection.add(task)
+    logging.info(f"[MarketResearcher] 파이프라인 지표 - {pipeline.metrics()}")
+    return collection.results(pipeline.completed)
+
+
+# 검색 및 요약 관련 함수들
+def search_trends(
+    company: str,
+    num_results: int = 5,
+    deadline: Optional[Deadline] = None,
+    period: Optional[Tuple[str, str]] = None,
+) -> Dict[str, Any]:
+    deadline = deadline or Deadline(COMPANY_DEADLINE)
+    window = IngestWindow(period or parse_period(None), result_log.latest(company))
+    if window.up_to_date:
+        return window.previous
 
-    if len(collected_articles) < num_results:
-        logging.warning(
-            f"[MarketResearcher] {company} 기사 부족 - {len(collected_articles)}개 확보됨"
+    # 일시적 오류는 지터 백오프로 재시도하고, 같은 질의를 즉시 반복하지 않음
+    try:
+        response = upstreams.get("tavily").call(
+            tavily_client.search, **_search_request(company, window), deadline=deadline
+        )
+        collected_articles = _filter_and_collect_articles(
+            {"results": _new_items(response, window)}, num_results, deadline
         )
+    except Exception as e:
+        logging.error(f"[MarketResearcher] Tavily 검색 실패 - {company} - {e}")
+        return failed_ingest("Market_Researcher", company, window, f"검색 실패: {e}")
+    complete = len(collected_articles) >= num_results or not deadline.expired()
+    if not complete and not collected_articles:
+        return failed_ingest("Market_Researcher", company, window, "작업 기한 초과")
 
-    result = _format_results(collected_articles, company)
+    _log_collected(company, len(collected_articles), num_results, window)
+    result = _format_results(collected_articles, company, window, complete)
     _save_to_file(result, company)
     return result
 
 
+def _search_request(company: str, window: IngestWindow) -> Dict[str, Any]:
+    # 워터마크 이후 기간만 검색 (질의 문구와 날짜 범위 인자 모두에 반영)
+    return {
+        "query": f"{company} electric vehicle market trends from {window.start} to {window.end}",
+        "max_results": RESULTS_PER_SEARCH,
+        **window.search_kwargs(),
+    }
+
+
+def _new_items(raw_data: Dict[str, Any], window: IngestWindow) -> List[Dict[str, Any]]:
+    seen = {article.get("url", "") for article in (window.previous or {}).get("market_trends", [])}
+    return [item for item in raw_data.get("results", []) if window.is_new(item, seen)]
+
+
+def _log_collected(company: str, collected: int, needed: int, window: IngestWindow):
+    if window.incremental:
+        logging.info(
+            f"[MarketResearcher] 증분 수집 - {company} - {window.start} 이후 새 기사 {collected}개"
+        )
+    elif collected < needed:
+        logging.warning(f"[MarketResearcher] {company} 기사 부족 - {collected}개 확보됨")
+
+
 def _filter_and_collect_articles(
-    raw_data: Dict[str, Any], needed: int
+    raw_data: Dict[str, Any], needed: int, deadline: Optional[Deadline] = None
 ) -> List[Dict[str, str]]:
     results = raw_data.get("results", [])
-    collected = []
+    items = {item.get("url", ""): item for item in results}
 
-    for item in results:
-        url = item.get("url", "")
-        content = _fetch_article_content(url)
-        if content:
-            collected.append(
-                {
-                    "headline": item.get("title", "No Title"),
-                    "url": url,
-                    "published_at": item.get("published_at") or "Unknown",
-                    "content": content,
-                }
-            )
-        if len(collected) >= needed:
-            break
+    fetched = fetch_policy.fetch_candidates(
+        list(items),
+        lambda url: _fetch_article_content(url, deadline),
+        needed,
+        deadline,
+    )
+
+    collected = []
+    for url, content in fetched:
+        item = items[url]
+        collected.append(
+            {
+                "headline": item.get("title", "No Title"),
+                "url": url,
+                "published_at": published_date(item) or "Unknown",
+                "content": content,
+            }
+        )
 
     return collected
 
 
-def _fetch_article_content(url: str) -> Optional[str]:
-    try:
-        response = requests.get(url, timeout=REQUEST_TIMEOUT)
-        if response.ok:
-            soup = BeautifulSoup(response.text, "html.parser")
-            paragraphs = soup.find_all("p")
-            return " ".join(p.get_text() for p in paragraphs)[:MAX_CONTENT_LENGTH]
-    except requests.RequestException:
-        pass
+def _fetch_article_content(
+    url: str, deadline: Optional[Deadline] = None
+) -> Optional[str]:
+    response = fetch_policy.get(url, deadline)
+    if response is not None and response.ok:
+        return _extract_paragraphs(response.text)
     return None
 
 
-def _format_results(articles: List[Dict[str, str]], company: str) -> Dict[str, Any]:
+def _extract_paragraphs(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    paragraphs = soup.find_all("p")
+    return " ".join(p.get_text() for p in paragraphs)[:MAX_CONTENT_LENGTH]
+
+
+def _format_results(
+    articles: List[Dict[str, str]],
+    company: str,
+    window: Optional[IngestWindow] = None,
+    complete: bool = True,
+) -> Dict[str, Any]:
     formatted_results = []
     for article in articles:
-        summary = _summarize_content(article["content"])
         formatted_results.append(
             {
                 "headline": article["headline"],
                 "url": article["url"],
                 "published_at": article["published_at"],
-                "summary": summary,
+                **_summarize_content(article["content"]),
             }
         )
 
-    return {
+    return _build_result(formatted_results, company, window, complete)
+
+
+def _build_result(
+    formatted_results: List[Dict[str, str]],
+    company: str,
+    window: Optional[IngestWindow] = None,
+    complete: bool = True,
+) -> Dict[str, Any]:
+    result = {
         "agent_name": "Market_Researcher",
         "status": "success",
         "timestamp": datetime.utcnow().isoformat(),
         "company": company,
         "market_trends": formatted_results,
     }
+    if window is not None:
+        # 이전 실행의 요약 기사와 병합하고 다음 실행을 위한 워터마크를 기록
+        previous = (window.previous or {}).get("market_trends", [])
+        result["market_trends"] = merge_articles(
+            formatted_results, previous, window.period_start, MAX_ARTICLES_PER_COMPANY
+        )
+        result["coverage"] = window.next_coverage(formatted_results, complete)
+        if not complete:
+            logging.warning(
+                f"[MarketResearcher] 작업 기한 초과 - {company} 기사 {len(formatted_results)}개로 부분 결과 저장 (워터마크 유지)"
+            )
+    return result
+
+
+def _summary_request(content: str) -> Dict[str, Any]:
+    return dict(
+        model=LLM_MODEL,
+        agent="MarketResearcher",
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a helpful assistant that summarizes news articles in Korean.",
+            },
+            {
+                "role": "user",
+                "content": f"Summarize this article in Korean:\n{content}",
+            },
+        ],
+        max_tokens=MAX_SUMMARY_TOKENS,
+        temperature=0.3,
+    )
+
+
+def _fallback_summary(content: str, error: Exception) -> Dict[str, str]:
+    # LLM 요약 실패 시 본문에서 핵심 문장을 골라 요약을 대신하고 출처를 표시
+    logging.warning(f"[MarketResearcher] LLM 요약 실패, 추출 요약 사용 - {error}")
+    return {
+        "summary": compress_text(content, FALLBACK_QUERY, FALLBACK_SUMMARY_TOKENS),
+        "summary_source": "extractive",
+    }
 
 
-def _summarize_content(content: str) -> str:
+def _summarize_content(content: str) -> Dict[str, str]:
     try:
+        response = upstreams.get("openai").call(openai_client.chat.completions.create, **_summary_request(content))
+        return {"summary": response.choices[0].message.content.strip(), "summary_source": "llm"}
+    except Exception as e:
+        return _fallback_summary(content, e)
+
 
-        response = openai_client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that summarizes news articles in Korean.",
-                },
-                {
-                    "role": "user",
-                    "content": f"Summarize this article in Korean:\n{content}",
-                },
-            ],
-            max_tokens=MAX_SUMMARY_TOKENS,
-            temperature=0.3,
+async def _asummarize_content(content: str) -> Dict[str, str]:
+    try:
+        response = await upstreams.get("openai").acall(
+            async_openai_client.chat.completions.create, **_summary_request(content)
         )
-        return response.choices[0].message.content.strip()
-    except Exception:
-        return "요약 실패"
+        return {"summary": response.choices[0].message.content.strip(), "summary_source": "llm"}
+    except Exception as e:
+        return _fallback_summary(content, e)
 
 
 def _save_to_file(data: Dict[str, Any], company: str):
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    filename = f"{company}_trends_{timestamp}.json"
-    filepath = os.path.join(OUTPUT_DIR, filename)
-
-    try:
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        logging.info(f"[MarketResearcher] 저장 완료 - {filepath}")
-    except IOError as e:
-        logging.error(f"[MarketResearcher] 저장 실패 - {e}")
+    result_log.append(data, key=company)
@@ -1,18 +1,20 @@
+import asyncio
 import os
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from dotenv import load_dotenv
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from PIL import Image as PILImage
 
 from state.ev_market_state import EVMarketState
+from utils.report_formats import RENDERERS, parse_formats, write_reports
+from utils.report_sections import changed_inputs, digest, section_cache
+from utils.resilience import upstreams
+from utils.watermark import DEFAULT_ANALYSIS_PERIOD
 from .visualization import ChartMetadata
 
 # 환경 변수 및 설정
@@ -21,66 +23,203 @@ logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-FONT_PATH = r"C:/Windows/Fonts/malgun.ttf"
-PDF_FONT_NAME = "MalgunGothic"
 OUTPUT_DIR = "results/final_reports"
 LLM_MODEL = "gpt-4o"
+# 1이면 PDF를 백그라운드 프로세스에서 만들고 그래프는 바로 다음 단계로 진행
+PDF_BACKGROUND = os.getenv("REPORT_PDF_BACKGROUND", "0") == "1"
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
-pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, FONT_PATH))
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# 재시도는 utils.resilience에서 백오프/예산/차단기로 처리하므로 SDK 자체 재시도는 끔
+openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+async_openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+
+@dataclass(frozen=True)
+class ReportSection:
+    key: str
+    heading: str  # 빈 문자열이면 제목 없이 본문으로 시작
+    instructions: str
+    inputs: Tuple[str, ...]  # _prepare()의 프롬프트 입력 중 이 섹션이 참고하는 항목
+    charts: Tuple[str, ...] = ()
+    after: Tuple[str, ...] = ()  # 본문을 입력으로 받는 섹션 (먼저 생성되어야 함)
+    max_tokens: int = 1500
+
+
+BODY_SECTIONS = ("market_trends", "company_strategy", "investment")
+# 리포트에 실리는 순서. 섹션별 입력 해시가 바뀐 섹션만 다시 생성
+SECTIONS: Tuple[ReportSection, ...] = (
+    ReportSection(
+        key="summary",
+        heading="",
+        instructions="""**요약(Summary)**: 5문장 이내로 전체 보고서 핵심을 설명하는 단락을 작성하세요. 제목 없이 본문으로 시작합니다.""",
+        inputs=("target_companies", "analysis_period"),
+        after=BODY_SECTIONS,
+        max_tokens=600,
+    ),
+    ReportSection(
+        key="market_trends",
+        heading="2. 시장 트렌드 분석",
+        instructions="""**2. 시장 트렌드 분석**
+   - 차트(`ev_market_growth`)를 본문 중간 또는 바로 아래에 포함시키고, **전기차 시장 규모 및 연평균 성장률(CAGR)** 등을 수치로 해석하세요.
+   - 기술 혁신, 정책 변화 등의 트렌드 요소를 설명하세요.""",
+        inputs=("market_data", "analysis_period"),
+        charts=("ev_market_growth",),
+    ),
+    ReportSection(
+        key="company_strategy",
+        heading="3. 기업 사업 전개 분석",
+        instructions="""**3. 기업 사업 전개 분석**
+   - 기업별 전략을 설명하며, **구체적인 수치 (예: 매출, PER, ROE)** 포함하세요.
+   - 각 기업의 전략은 다음과 같이 정리해 주세요:
+     - Tesla:
+     - BYD: 
+     - ...""",
+        inputs=("company_data", "stock_data", "target_companies"),
+        charts=("valuation_scatter",),
+    ),
+    ReportSection(
+        key="investment",
+        heading="4. 투자 시사점",
+        instructions="""**4. 투자 시사점**
+   - 성장 가능성과 위험 요소를 종합적으로 5문장 설명한다음, 항목별로 정리하세요.
+   - 예:
+    전기차 시장 성장 가능성은 높으나, 현재 평가가 높은 기업들은 투자 기회가 적을 수 있습니다.
+     - Tesla: 고성장 기대 / 고평가 상태(PER 68), ROE 15.4%
+     - Volkswagen: 저평가(PER 5.4) / 안정적 현금 흐름""",
+        inputs=("stock_data", "stock_summary_content", "target_companies"),
+        charts=("price_performance", "drawdown"),
+    ),
+    ReportSection(
+        key="conclusion",
+        heading="5. 결론",
+        instructions="""**5. 결론**
+   - 전체 시장과 기업 요약 평가
+   - 투자자에게 시사하는 전략적 판단 요점 2~3개""",
+        inputs=("target_companies",),
+        after=BODY_SECTIONS,
+        max_tokens=1000,
+    ),
+)
+SECTIONS_BY_KEY = {section.key: section for section in SECTIONS}
+# 섹션 지시문이나 아래 공통 지침을 바꾸면 올려서 기존 섹션 캐시 무효화
+SECTION_VERSION = 2
+
+# 내용과 무관하게 실행마다 바뀌거나 프롬프트에 불필요한 필드 (섹션 입력 해시에서도 제외)
+VOLATILE_FIELDS = {"timestamp", "agent_name", "status", "coverage", "price_series"}
+
+INPUT_LABELS = {
+    "market_data": "시장 분석 데이터",
+    "company_data": "기업 분석 데이터",
+    "stock_data": "주가/재무 분석 데이터",
+    "stock_summary_content": "요약 데이터",
+    "target_companies": "분석 대상 기업",
+    "analysis_period": "분석 기간",
+}
+
+WRITING_GUIDE = """작성 시 유의사항:
+- 본문은 **전문적인 어조의 자연스러운 문단 형식**으로 작성합니다.
+- **불릿 포인트(-)**는 기업 비교 및 투자 시사점에서만 사용 가능합니다.
+- **수치 기반의 정량 데이터**를 반드시 포함하여 신뢰도를 높이세요.
+- 그래프에 대한 해석과 출처 명시는 반드시 포함하세요.
+- 각 단락들 모두 최소 800자를 넘기세요."""
 
 
-def _convert_to_rgb_png(path: str) -> str:
-    if path.lower().endswith(".png"):
-        return path
-    new_path = os.path.splitext(path)[0] + ".converted.png"
-    try:
-        with PILImage.open(path) as img:
-            rgb_img = img.convert("RGB")
-            rgb_img.save(new_path)
-            return new_path
-    except Exception as e:
-        logging.warning(f"[ImageConvert] 변환 실패: {path} - {e}")
-        return path
+def run(state: EVMarketState) -> EVMarketState:
+    request = _prepare(state)
+    report_content, state.report_sections = _compose_report(request["prompt"])
+    return _write_outputs(state, request, report_content)
 
 
-def run(state: EVMarketState) -> EVMarketState:
+async def arun(state: EVMarketState) -> EVMarketState:
+    request = _prepare(state)
+    report_content, state.report_sections = await _acompose_report(request["prompt"])
+    # 파일 쓰기와 ReportLab 빌드는 블로킹 작업이라 스레드에서 실행
+    return await asyncio.to_thread(_write_outputs, state, request, report_content)
+
+
+async def acompose_section(
+    state: EVMarketState, key: str, texts: Dict[str, str], records: dict
+) -> None:
+    """섹션 하나를 입력이 준비된 시점에 생성 (스케줄러용, 결과는 texts/records에 채움)"""
+    request = _prepare(state)
+    for item in _lookup_stage([SECTIONS_BY_KEY[key]], request["prompt"], texts, records):
+        _store_section(item, await _agenerate_section(*item[:2]), texts, records)
+
+
+async def awrite_report(state: EVMarketState, texts: Dict[str, str], records: dict) -> EVMarketState:
+    """acompose_section()으로 채운 섹션을 조립해 요청된 형식으로 저장"""
+    request = _prepare(state)
+    report_content, state.report_sections = _assemble(texts, records)
+    return await asyncio.to_thread(_write_outputs, state, request, report_content)
+
+
+def _prepare(state: EVMarketState) -> dict:
     current_date = state.current_date or datetime.utcnow().strftime("%Y-%m-%d")
-    analysis_period = state.analysis_period or "2024-11-01 ~ 2025-05-19"
+    analysis_period = state.analysis_period or DEFAULT_ANALYSIS_PERIOD
     target_companies = (
         state.target_companies or "Tesla, BYD, Volkswagen, Ford, Samsung SDI"
     )
-    report_format = state.report_format or "pdf"
-
-    market_data = _load_json(state.market_data_path)
-    company_data = _load_json(state.company_data_path)
-    stock_data = _load_json(state.stock_data_path)
+    formats = parse_formats(state.report_format)
+    unsupported = [f for f in formats if f != "pdf" and f not in RENDERERS]
+    if unsupported:
+        state.errors["report_format"] = f"지원하지 않는 리포트 형식: {', '.join(unsupported)}"
+        formats = [f for f in formats if f not in unsupported]
 
     chart_metadata = {
         k: v.dict() if hasattr(v, "dict") else v
         for k, v in state.generated_charts.items()
     }
 
-    report_content = _generate_report_content(
-        market_data,
-        company_data,
-        stock_data,
-        current_date,
-        analysis_period,
-        target_companies,
-        chart_metadata=chart_metadata,
-        stock_summary_content=state.stock_summary_content or "",
+    return {
+        "current_date": current_date,
+        "report_name": state.report_name or f"EV_Market_Report_{current_date}",
+        "formats": formats,
+        "chart_metadata": chart_metadata,
+        "prompt": dict(
+            market_data=_prompt_data(state.market_data_path, state.market_data),
+            company_data=_prompt_data(state.company_data_path, state.company_data),
+            stock_data=_prompt_data(state.stock_data_path, state.stock_data),
+            current_date=current_date,
+            analysis_period=analysis_period,
+            target_companies=target_companies,
+            chart_metadata=chart_metadata,
+            stock_summary_content=state.stock_summary_content or "",
+        ),
+    }
+
+
+def _write_outputs(state: EVMarketState, request: dict, report_content: str) -> EVMarketState:
+    formats = request["formats"]
+    chart_metadata = request["chart_metadata"]
+
+    # 한 번 생성한 본문으로 요청된 모든 형식을 렌더링 (텍스트 형식은 ReportLab을 거치지 않음)
+    base_path = os.path.join(OUTPUT_DIR, request["report_name"])
+    report_paths = write_reports(
+        base_path, [f for f in formats if f != "pdf"], report_content, chart_metadata
     )
+    if "pdf" in formats:
+        report_paths["pdf"] = _save_as_pdf(report_content, request["report_name"], chart_metadata)
 
-    if report_format == "pdf":
-        report_path = _save_as_pdf(report_content, current_date, chart_metadata)
-        state.final_report_path = report_path
-        state.final_report_content = report_content
+    state.final_report_paths = report_paths
+    state.final_report_path = report_paths.get(formats[0]) if formats else None
+    state.final_report_content = report_content
 
     return state
 
 
+def _strip_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if k not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+
+def _prompt_data(file_path: Optional[str], records: List[dict]) -> Any:
+    """에이전트 결과(파일 경로가 지정되면 파일)에서 실행마다 바뀌는 필드를 뺀 프롬프트 입력"""
+    return _strip_volatile(_load_json(file_path) if file_path else records)
+
+
 def _load_json(file_path: str) -> dict:
     if not file_path:
         return {}
@@ -88,74 +227,173 @@ def _load_json(file_path: str) -> dict:
         return json.load(f)
 
 
-def _generate_report_content(
-    market_data: dict,
-    company_data: dict,
-    stock_data: dict,
-    current_date: str,
-    analysis_period: str,
-    target_companies: str,
-    chart_metadata: dict,
-    stock_summary_content: str,
-) -> str:
+def _section_inputs(section: ReportSection, prompt_inputs: dict, texts: Dict[str, str]) -> Dict[str, Any]:
+    """섹션이 참고하는 입력만 골라냄 (요약/결론은 먼저 생성된 본문 섹션을 입력으로 사용)"""
+    values = {name: prompt_inputs[name] for name in section.inputs}
+    charts = prompt_inputs["chart_metadata"]
+    for chart in section.charts:
+        if chart in charts:
+            values[f"chart:{chart}"] = charts[chart]
+    for key in section.after:
+        values[f"section:{key}"] = texts[key]
+    return values
+
+
+def _section_hash(section: ReportSection, values: Dict[str, Any]) -> Tuple[str, Dict[str, str]]:
+    inputs = {name: digest(value) for name, value in values.items()}
+    input_hash = digest(
+        {"section": section.key, "version": SECTION_VERSION, "model": LLM_MODEL, "inputs": inputs}
+    )
+    return input_hash, inputs
+
+
+def _input_label(name: str) -> str:
+    kind, _, key = name.partition(":")
+    if kind == "chart":
+        return f"시각화 차트 정보 ({key})"
+    if kind == "section":
+        return f"본문 - {SECTIONS_BY_KEY[key].heading}"
+    return INPUT_LABELS.get(name, name)
+
+
+def _build_section_prompt(section: ReportSection, values: Dict[str, Any]) -> list:
+    data = "\n".join(
+        f"- {_input_label(name)}: "
+        f"{value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, indent=2)}"
+        for name, value in values.items()
+    )
+    start = f"'{section.heading}' 제목으로 시작하고" if section.heading else "제목 없이 본문으로 시작하고"
     prompt_template = f"""
 당신은 글로벌 전기차 산업 분석 보고서를 작성하는 전문가입니다.
 
-아래의 JSON 데이터와 차트 정보를 기반으로 다음과 같은 형식의 보고서를 작성하세요:
+보고서는 섹션별로 나누어 작성합니다. 아래 입력 데이터를 기반으로 지정된 섹션 하나만 작성하세요.
+{start}, 다른 섹션의 내용은 쓰지 마세요.
 
 ## 입력 데이터
-- 시장 분석 데이터: {json.dumps(market_data, ensure_ascii=False, indent=2)}
-- 기업 분석 데이터: {json.dumps(company_data, ensure_ascii=False, indent=2)}
-- 주가/재무 분석 데이터: {json.dumps(stock_data, ensure_ascii=False, indent=2)}
-- 요약 데이터: {stock_summary_content}
-- 시각화 차트 정보: {json.dumps(chart_metadata, ensure_ascii=False, indent=2)}
-- 리포트 제목: 글로벌 전기차 시장 트렌드 및 주요 기업 주식 분석 - {current_date}
-- 분석 대상 기업: {target_companies}
-- 분석 기간: {analysis_period}
-
-1. **요약(Summary)**: 5문장 이내로 전체 보고서 핵심을 설명하는 단락을 작성하세요. 제목 없이 본문으로 시작합니다. 5문장 이내로 작성히세요.
-
-2. **2. 시장 트렌드 분석**
-   - 차트(`ev_market_growth`)를 본문 중간 또는 바로 아래에 포함시키고, **전기차 시장 규모 및 연평균 성장률(CAGR)** 등을 수치로 해석하세요.
-   - 기술 혁신, 정책 변화 등의 트렌드 요소를 설명하세요.
+{data}
 
-3. **3. 기업 사업 전개 분석**
-   - 기업별 전략을 설명하며, **구체적인 수치 (예: 매출, PER, ROE)** 포함하세요.
-   - 각 기업의 전략은 다음과 같이 정리해 주세요:
-     - Tesla:
-     - BYD: 
-     - ...
+## 작성할 섹션
+{section.instructions}
 
-4. **4. 투자 시사점**
-   - 성장 가능성과 위험 요소를 종합적으로 5문장 설명한다음, 항목별로 정리하세요.
-   - 예:
-    전기차 시장 성장 가능성은 높으나, 현재 평가가 높은 기업들은 투자 기회가 적을 수 있습니다.
-     - Tesla: 고성장 기대 / 고평가 상태(PER 68), ROE 15.4%
-     - Volkswagen: 저평가(PER 5.4) / 안정적 현금 흐름
+{WRITING_GUIDE}
+"""
+    return [
+        {
+            "role": "system",
+            "content": "당신은 전문 리서치 리포트를 작성하는 어시스턴트입니다.",
+        },
+        {"role": "user", "content": prompt_template},
+    ]
 
-5. **5. 결론**
-   - 전체 시장과 기업 요약 평가
-   - 투자자에게 시사하는 전략적 판단 요점 2~3개
 
-작성 시 유의사항:
-- 본문은 **전문적인 어조의 자연스러운 문단 형식**으로 작성합니다.
-- **불릿 포인트(-)**는 기업 비교 및 투자 시사점에서만 사용 가능합니다.
-- **수치 기반의 정량 데이터**를 반드시 포함하여 신뢰도를 높이세요.
-- 그래프에 대한 해석과 출처 명시는 반드시 포함하세요.
-- 각 단락들 모두 최소 800자를 넘기세요.
+def _with_heading(section: ReportSection, text: str) -> str:
+    # 배치(layout_blocks)가 섹션 제목으로 차트 위치를 찾으므로 제목이 빠진 응답은 보완
+    if section.heading and section.heading not in text.split("\n", 1)[0]:
+        return f"## {section.heading}\n\n{text}"
+    return text
+
+
+def _section_stages() -> List[List[ReportSection]]:
+    """after 의존 관계에 따라 동시에 생성할 수 있는 섹션 묶음으로 나눔"""
+    stages, done = [], set()
+    remaining = list(SECTIONS)
+    while remaining:
+        stage = [s for s in remaining if all(key in done for key in s.after)]
+        stages.append(stage)
+        done.update(s.key for s in stage)
+        remaining = [s for s in remaining if s.key not in done]
+    return stages
+
+
+def _lookup_stage(stage: List[ReportSection], prompt_inputs: dict, texts: Dict[str, str], records: dict) -> list:
+    """캐시에 있는 섹션은 바로 채우고, 다시 생성할 섹션 목록을 반환"""
+    pending = []
+    for section in stage:
+        values = _section_inputs(section, prompt_inputs, texts)
+        input_hash, inputs = _section_hash(section, values)
+        cached = section_cache.get(section.key, input_hash)
+        if cached is not None:
+            logging.info(f"[ReportCompiler] 캐시된 섹션 사용 - {section.key}")
+            texts[section.key] = cached["text"]
+            records[section.key] = _section_record(cached, reused=True)
+            continue
+        changed = changed_inputs(inputs, section_cache.latest(section.key))
+        logging.info(f"[ReportCompiler] 섹션 생성 - {section.key} (변경된 입력: {', '.join(changed)})")
+        pending.append((section, values, input_hash, inputs))
+    return pending
+
+
+def _store_section(pending_item: tuple, text: str, texts: Dict[str, str], records: dict):
+    section, _, input_hash, inputs = pending_item
+    entry = section_cache.put(section.key, input_hash, inputs, _with_heading(section, text))
+    texts[section.key] = entry["text"]
+    records[section.key] = _section_record(entry, reused=False)
+
+
+def _section_record(entry: dict, reused: bool) -> dict:
+    return {
+        "input_hash": entry["input_hash"],
+        "inputs": sorted(entry["inputs"]),
+        "generated_at": entry["generated_at"],
+        "reused": reused,
+    }
 
-"""
 
-    response = openai_client.chat.completions.create(
+def _assemble(texts: Dict[str, str], records: dict) -> Tuple[str, dict]:
+    if any(not record["reused"] for record in records.values()):
+        section_cache.save()
+    reused = sum(record["reused"] for record in records.values())
+    logging.info(f"[ReportCompiler] 섹션 {len(SECTIONS)}개 중 {reused}개 재사용")
+    return "\n\n".join(texts[section.key] for section in SECTIONS), records
+
+
+def _compose_report(prompt_inputs: dict) -> Tuple[str, dict]:
+    """입력 해시가 바뀐 섹션만 다시 생성하고 나머지는 캐시에서 가져와 본문을 조립"""
+    texts: Dict[str, str] = {}
+    records: dict = {}
+    for stage in _section_stages():
+        pending = _lookup_stage(stage, prompt_inputs, texts, records)
+        if not pending:
+            continue
+        with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+            generated = list(executor.map(lambda item: _generate_section(*item[:2]), pending))
+        for item, text in zip(pending, generated):
+            _store_section(item, text, texts, records)
+    return _assemble(texts, records)
+
+
+async def _acompose_report(prompt_inputs: dict) -> Tuple[str, dict]:
+    """_compose_report()의 비동기 버전"""
+    texts: Dict[str, str] = {}
+    records: dict = {}
+    for stage in _section_stages():
+        pending = _lookup_stage(stage, prompt_inputs, texts, records)
+        generated = await asyncio.gather(*(_agenerate_section(*item[:2]) for item in pending))
+        for item, text in zip(pending, generated):
+            _store_section(item, text, texts, records)
+    return _assemble(texts, records)
+
+
+def _generate_section(section: ReportSection, values: Dict[str, Any]) -> str:
+    response = upstreams.get("openai").call(
+        openai_client.chat.completions.create,
+        model=LLM_MODEL,
+        agent="ReportCompiler",
+        messages=_build_section_prompt(section, values),
+        max_tokens=section.max_tokens,
+        temperature=0.2,
+    )
+
+    return response.choices[0].message.content.strip()
+
+
+async def _agenerate_section(section: ReportSection, values: Dict[str, Any]) -> str:
+    response = await upstreams.get("openai").acall(
+        async_openai_client.chat.completions.create,
         model=LLM_MODEL,
-        messages=[
-            {
-                "role": "system",
-                "content": "당신은 전문 리서치 리포트를 작성하는 어시스턴트입니다.",
-            },
-            {"role": "user", "content": prompt_template},
-        ],
-        max_tokens=3000,
+        agent="ReportCompiler",
+        messages=_build_section_prompt(section, values),
+        max_tokens=section.max_tokens,
         temperature=0.2,
     )
 
@@ -163,79 +401,15 @@ def _generate_report_content(
 
 
 def _save_as_pdf(
-    report_text: str, current_date: str, chart_metadata: dict = None
+    report_text: str, report_name: str, chart_metadata: dict = None
 ) -> str:
-    filename = f"EV_Market_Report_{current_date}.pdf"
-    filepath = os.path.join(OUTPUT_DIR, filename)
-
-    doc = SimpleDocTemplate(
-        filepath,
-        pagesize=A4,
-        leftMargin=50,
-        rightMargin=50,
-        topMargin=50,
-        bottomMargin=50,
-    )
-    styles = getSampleStyleSheet()
-    styles.add(
-        ParagraphStyle(
-            name="Korean",
-            fontName=PDF_FONT_NAME,
-            fontSize=12,
-            leading=18,
-            spaceAfter=12,
-        )
-    )
-    styles.add(
-        ParagraphStyle(
-            name="CustomTitle",
-            fontName=PDF_FONT_NAME,
-            fontSize=18,
-            leading=24,
-            spaceAfter=20,
-            alignment=1,
-        )
-    )
-    styles.add(
-        ParagraphStyle(
-            name="ChartCaption",
-            fontName=PDF_FONT_NAME,
-            fontSize=10,
-            leading=14,
-            italic=True,
-        )
-    )
+    filepath = os.path.join(OUTPUT_DIR, f"{report_name}.pdf")
+    # ReportLab은 PDF가 요청된 경우에만 불러옴
+    from utils.pdf_renderer import build_pdf_in_background, build_report_pdf
 
-    elements = [
-        Paragraph(
-            f"글로벌 전기차 시장 트렌드 및 주요 기업 주식 분석",
-            styles["CustomTitle"],
-        ),
-        Spacer(1, 20),
-    ]
+    if PDF_BACKGROUND:
+        build_pdf_in_background(filepath, report_text, chart_metadata)
+        logging.info(f"[ReportCompiler] 백그라운드 PDF 생성 시작 - {filepath}")
+        return filepath
 
-    inserted_chart = False
-    for section in report_text.split("\n\n"):
-        elements.append(Paragraph(section.replace("\n", "<br/>"), styles["Korean"]))
-        elements.append(Spacer(1, 14))
-
-        if not inserted_chart and "시장 트렌드" in section and chart_metadata:
-            for chart in chart_metadata.values():
-                if os.path.exists(chart["file_path"]):
-                    img_path = _convert_to_rgb_png(chart["file_path"])
-                    elements.append(Spacer(1, 16))
-                    elements.append(Image(img_path, width=440, height=260))
-                    elements.append(Spacer(1, 6))
-                    elements.append(
-                        Paragraph(
-                            f"그림 설명: {chart['description']}<br/>출처: {chart['source']}",
-                            styles["ChartCaption"],
-                        )
-                    )
-                    elements.append(Spacer(1, 16))
-                    inserted_chart = True
-                    break
-
-    doc.build(elements)
-    logging.info(f"[ReportCompiler] 최종 리포트 저장 완료 - {filepath}")
-    return filepath
+    return build_report_pdf(filepath, report_text, chart_metadata)
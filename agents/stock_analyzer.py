@@ -1,15 +1,26 @@
+import asyncio
 import os
-import json
 import logging
 from datetime import datetime
-from typing import List, Dict, Any, Tuple
+from functools import partial
+from typing import List, Dict, Any, Tuple, Optional
 
 import yfinance as yf
 import pandas as pd
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from dotenv import load_dotenv
 
 from state.ev_market_state import EVMarketState
+from utils.fundamentals_cache import FundamentalsCache
+from utils.fx import FxConverter
+from utils.indicators import compute_indicators
+from utils.price_cache import PriceCache
+from utils.report_sections import SectionCache, digest
+from utils.resilience import upstreams
+from utils.result_log import ResultLog
+from utils.risk import compute_risk
+from utils.sharding import LARGE_UNIVERSE_THRESHOLD, run_sharded
+from utils.watermark import parse_period
 
 # 환경 설정
 load_dotenv()
@@ -18,49 +29,239 @@ logging.basicConfig(
 )
 
 OUTPUT_DIR = "results/stock_results"
-START_DATE = "2024-11-01"
-END_DATE = "2025-05-19"
 LLM_MODEL = "gpt-4o"
+BENCHMARK_TICKER = "^GSPC"  # 이동 베타 계산용 벤치마크
+SUMMARY_CACHE_PATH = "results/cache/stock_summary.json"  # 요약 입력 해시별 통합 요약
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+result_log = ResultLog(OUTPUT_DIR, "stock_analysis")
+# 재시도는 utils.resilience에서 백오프/예산/차단기로 처리하므로 SDK 자체 재시도는 끔
+openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+async_openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+fundamentals_cache = FundamentalsCache()
+fx_converter = FxConverter()
+price_cache = PriceCache()
+summary_cache = SectionCache(SUMMARY_CACHE_PATH, name="stock_summary")
 
 
 # LangGraph Node 실행 함수
 def run(state: EVMarketState) -> EVMarketState:
+    results = _collect_results(state)
+    final_summary, summary_path = summarize_all_analysis(results)
+    state.stock_data = results
+    state.stock_summary_path = summary_path
+    state.stock_summary_content = final_summary  # 요약 내용 상태에 저장
+
+    return state
+
+
+async def arun(state: EVMarketState) -> EVMarketState:
+    """run()의 비동기 버전.
+
+    yfinance에는 비동기 API가 없어 시세/재무 수집과 지표 계산은 스레드에서 기다리고,
+    LLM 요약만 비동기 클라이언트로 호출한다.
+    """
+    await acollect(state)
+    return await asummarize(state)
+
+
+async def acollect(state: EVMarketState) -> EVMarketState:
+    """시세/재무 수집과 지표 계산만 수행 (스케줄러에서 요약과 별도 작업으로 실행)"""
+    state.stock_data = await asyncio.to_thread(_collect_results, state)
+    return state
+
+
+async def asummarize(state: EVMarketState) -> EVMarketState:
+    """수집된 stock_data만으로 LLM 요약을 만든다 (뉴스 수집 완료를 기다리지 않음)"""
+    final_summary, summary_path = await asummarize_all_analysis(state.stock_data)
+    state.stock_summary_path = summary_path
+    state.stock_summary_content = final_summary
+
+    return state
+
+
+def _collect_results(state: EVMarketState) -> List[dict]:
     tickers = state.tickers or []
+    period = parse_period(state.analysis_period)
     results = []
 
+    if len(tickers) > LARGE_UNIVERSE_THRESHOLD:
+        results = _run_sharded(tickers, period, state)
+        # 샤드 결과에는 가격 시계열이 없으므로 위험 지표용으로 한 번 더 모음 (샤드가 채운 캐시에서 읽음)
+        currencies = {
+            r["company"]: r["stock_analysis"]["financial_metrics"].get("price_currency")
+            for r in results
+        }
+        # 샤드가 받아 저장한 환율/가격을 다시 읽어 부모 프로세스에서 중복 조회하지 않음
+        fx_converter.refresh()
+        fx_converter.load_rates(currencies.values(), *period)
+        price_cache.refresh()
+        panel = fx_converter.convert_panel(_download_price_panel(tickers, period), currencies)
+    else:
+        batch_results, panel = _analyze_batch(tickers, period)
+        results = [r for r in batch_results if r.get("status") == "success"]
+
+    risk_result = _analyze_risk(panel, results)
+    if risk_result:
+        _save_to_file(risk_result, risk_result["company"])
+        results.append(risk_result)
+
+    result_log.flush()
+    return results
+
+
+def _analyze_batch(
+    tickers: List[str], period: Tuple[str, str], save: bool = True
+) -> Tuple[List[dict], Dict[str, pd.DataFrame]]:
+    # 재무 지표와 가격 패널은 티커 전체에 대해 한 번에 조회 (재무는 캐시 유효 시 원격 호출 없음)
+    fundamentals = fundamentals_cache.prefetch(tickers)
+    prices = _download_price_panel(tickers, period)
+    for ticker, values in fundamentals.items():
+        if isinstance(values, dict):
+            values["current_price"] = _last_close(prices.get(ticker))
+
+    # 비 USD 티커의 환율을 한 번에 받아 재무/가격 지표를 모두 USD로 환산
+    currencies = {}
+    for ticker, values in fundamentals.items():
+        if isinstance(values, dict):
+            currencies[ticker] = values.get("currency")
+            currencies[f"{ticker}:financial"] = values.get("financial_currency")
+    fx_converter.load_rates(currencies.values(), *period)
+    fundamentals = fx_converter.convert_fundamentals(fundamentals)
+    panel = fx_converter.convert_panel(prices, currencies)
+    indicators = _compute_technical_indicators(panel, tickers)
+
+    results = []
     for ticker in tickers:
         logging.info(f"[StockAnalyzer] 주식 분석 시작 - {ticker}")
-        result = analyze_stock(ticker)
-        if result.get("status") == "success":
-            results.append(result)
+        results.append(
+            analyze_stock(
+                ticker,
+                fundamentals.get(ticker),
+                panel.get(ticker),
+                indicators.get(ticker),
+                period=period,
+                save=save,
+            )
+        )
+    return results, panel
 
-    final_summary, summary_path = summarize_all_analysis(results)
-    state.stock_data = results
-    state.stock_summary_path = summary_path
-    state.stock_summary_content = final_summary  # 요약 내용 상태에 저장
 
-    return state
+def _analyze_shard(tickers: List[str], period: Tuple[str, str]) -> List[dict]:
+    # 워커 프로세스에서 실행되며, 결과 로그 기록은 부모 프로세스가 담당
+    results, _ = _analyze_batch(tickers, period, save=False)
+    return results
+
 
+def _analyze_risk(panel: Dict[str, pd.DataFrame], results: List[dict]) -> Optional[dict]:
+    """분석에 성공한 티커들의 수익률을 하나의 행렬로 맞춰 교차 위험 지표를 계산"""
+    tickers = [r["company"] for r in results if r["company"] in panel]
+    if len(tickers) < 2:
+        return None
 
-def analyze_stock(ticker: str) -> dict:
     try:
-        stock = yf.Ticker(ticker)
-        price_data = stock.history(start=START_DATE, end=END_DATE)
+        close = pd.concat({t: panel[t]["Close"] for t in tickers}, axis=1).sort_index()
+        market_caps = [
+            r["stock_analysis"]["financial_metrics"].get("market_cap")
+            for r in results
+            if r["company"] in panel
+        ]
+        caps = None
+        if all(isinstance(cap, (int, float)) for cap in market_caps):
+            caps = market_caps
+
+        report = compute_risk(close.to_numpy(), tickers, caps)
+    except Exception as e:
+        logging.error(f"[StockAnalyzer] 위험 지표 계산 실패 - {e}")
+        return None
+
+    return {
+        "agent_name": "Stock_Analyzer",
+        "status": "success",
+        "timestamp": datetime.utcnow().isoformat(),
+        "company": "PORTFOLIO",
+        "stock_analysis": {"risk_metrics": report.summary()},
+    }
+
+
+def _download_price_panel(tickers: List[str], period: Tuple[str, str]) -> Dict[str, pd.DataFrame]:
+    """티커별 history 호출 대신 한 번의 일괄 요청으로 가격 데이터를 가져온다 (캐시 이후 구간만 조회)"""
+    symbols = tickers + [BENCHMARK_TICKER]
+    try:
+        return price_cache.load(symbols, *period)
+    except Exception as e:
+        logging.error(f"[StockAnalyzer] 가격 일괄 조회 실패 - {e}")
+        return {}
+
+
+def _compute_technical_indicators(
+    panel: Dict[str, pd.DataFrame], tickers: List[str]
+) -> Dict[str, dict]:
+    available = [ticker for ticker in tickers if ticker in panel]
+    if not available:
+        return {}
+
+    try:
+        # (날짜 × 티커) 배열로 정렬해 모든 티커의 지표를 한 번에 계산
+        close = pd.concat({t: panel[t]["Close"] for t in available}, axis=1).sort_index()
+        high = pd.concat({t: panel[t]["High"] for t in available}, axis=1).reindex(close.index)
+        low = pd.concat({t: panel[t]["Low"] for t in available}, axis=1).reindex(close.index)
+        benchmark = panel.get(BENCHMARK_TICKER)
+        benchmark_close = (
+            benchmark["Close"].reindex(close.index).to_numpy()
+            if benchmark is not None
+            else None
+        )
+
+        indicators = compute_indicators(
+            close.to_numpy(), high.to_numpy(), low.to_numpy(), benchmark_close
+        )
+        return indicators.snapshot(available)
+    except Exception as e:
+        logging.error(f"[StockAnalyzer] 기술적 지표 계산 실패 - {e}")
+        return {}
+
+
+def _run_sharded(tickers: List[str], period: Tuple[str, str], state: EVMarketState) -> List[dict]:
+    results = []
+    shard_fn = partial(_analyze_shard, period=period)
+    for shard, shard_results in run_sharded(shard_fn, tickers, label="StockAnalyzer"):
+        if isinstance(shard_results, Exception):
+            shard_results = [_failure_response(ticker, str(shard_results)) for ticker in shard]
+
+        for result in shard_results:
+            if result.get("status") == "success":
+                _save_to_file(result, result["company"])
+                results.append(result)
+            else:
+                state.errors[result["company"]] = result.get("error_info", "")
+
+        # 끝난 샤드의 결과를 상태에 바로 반영
+        state.stock_data = list(results)
+    return results
+
+
+def analyze_stock(
+    ticker: str,
+    fundamentals: Optional[dict] = None,
+    price_data: Optional[pd.DataFrame] = None,
+    technical_indicators: Optional[dict] = None,
+    period: Optional[Tuple[str, str]] = None,
+    save: bool = True,
+) -> dict:
+    try:
+        if price_data is None:
+            start, end = period or parse_period(None)
+            price_data = yf.Ticker(ticker).history(start=start, end=end)
 
         if price_data.empty:
             raise ValueError("주가 데이터 없음.")
 
-        financials = stock.financials
-        balance_sheet = stock.balance_sheet
-        earnings = stock.earnings
+        if fundamentals is None:
+            fundamentals = {**fundamentals_cache.get(ticker), "current_price": _last_close(price_data)}
 
         stock_metrics = _analyze_price_data(price_data)
-        financial_metrics = _analyze_financials(
-            financials, balance_sheet, earnings, stock
-        )
+        financial_metrics = _analyze_financials(fundamentals)
 
         result = {
             "agent_name": "Stock_Analyzer",
@@ -70,10 +271,13 @@ def analyze_stock(ticker: str) -> dict:
             "stock_analysis": {
                 "price_metrics": stock_metrics,
                 "financial_metrics": financial_metrics,
+                "technical_indicators": technical_indicators or {},
+                "price_series": _price_series(price_data),
             },
         }
 
-        _save_to_file(result, ticker)
+        if save:
+            _save_to_file(result, ticker)
         return result
 
     except Exception as e:
@@ -81,6 +285,14 @@ def analyze_stock(ticker: str) -> dict:
         return _failure_response(ticker, str(e))
 
 
+def _last_close(price_data: Optional[pd.DataFrame]) -> Optional[float]:
+    # PER/PBR용 현재가는 이미 받은 일봉의 마지막 종가 (info를 매일 다시 조회하지 않음)
+    if price_data is None or price_data.empty:
+        return None
+    close = price_data["Close"].dropna()
+    return float(close.iloc[-1]) if not close.empty else None
+
+
 def _analyze_price_data(price_data: pd.DataFrame) -> dict:
     close_prices = price_data["Close"]
     start_price = close_prices.iloc[0]
@@ -101,28 +313,29 @@ def _analyze_price_data(price_data: pd.DataFrame) -> dict:
     }
 
 
-def _analyze_financials(financials, balance_sheet, earnings, stock) -> dict:
+def _price_series(price_data: pd.DataFrame) -> dict:
+    # 차트 생성용 일별 종가 (날짜 문자열과 값 목록으로 간결하게 보관)
+    close_prices = price_data["Close"].dropna()
+    return {
+        "dates": [d.strftime("%Y-%m-%d") for d in close_prices.index],
+        "close": [round(float(v), 4) for v in close_prices],
+    }
+
+
+def _analyze_financials(fundamentals: dict) -> dict:
     try:
-        total_revenue = (
-            financials.loc["Total Revenue"].iloc[0]
-            if "Total Revenue" in financials.index
-            else None
-        )
-        operating_income = (
-            financials.loc["Operating Income"].iloc[0]
-            if "Operating Income" in financials.index
-            else None
-        )
-        net_income = (
-            financials.loc["Net Income"].iloc[0]
-            if "Net Income" in financials.index
-            else None
-        )
+        if isinstance(fundamentals, Exception):
+            raise fundamentals
+
+        total_revenue = fundamentals.get("total_revenue")
+        operating_income = fundamentals.get("operating_income")
+        net_income = fundamentals.get("net_income")
 
-        info = stock.info
-        eps = info.get("trailingEps")
-        current_price = info.get("currentPrice")
-        book_value = info.get("bookValue")
+        eps = fundamentals.get("eps")
+        current_price = fundamentals.get("current_price")
+        book_value = fundamentals.get("book_value")
+        market_cap = fundamentals.get("market_cap")
+        currency = fundamentals.get("display_currency") or "USD"
 
         per = round(current_price / eps, 2) if eps and eps != 0 else None
         pbr = (
@@ -130,18 +343,27 @@ def _analyze_financials(financials, balance_sheet, earnings, stock) -> dict:
             if book_value and book_value != 0
             else None
         )
+        if fundamentals.get("mixed_currency"):
+            # 환율이 없어 가격과 재무 항목의 통화가 다르면 비율을 내지 않음
+            per = pbr = None
 
         return {
             "total_revenue_ttm": (
-                f"{total_revenue / 1e9:.2f}B USD" if total_revenue else "N/A"
+                f"{total_revenue / 1e9:.2f}B {currency}" if total_revenue else "N/A"
             ),
             "operating_income_ttm": (
-                f"{operating_income / 1e9:.2f}B USD" if operating_income else "N/A"
+                f"{operating_income / 1e9:.2f}B {currency}" if operating_income else "N/A"
+            ),
+            "net_income_ttm": (
+                f"{net_income / 1e9:.2f}B {currency}" if net_income else "N/A"
             ),
-            "net_income_ttm": f"{net_income / 1e9:.2f}B USD" if net_income else "N/A",
             "eps": round(eps, 2) if eps else "N/A",
             "per": per or "N/A",
             "pbr": pbr or "N/A",
+            "market_cap": market_cap or "N/A",
+            "reporting_currency": fundamentals.get("reporting_currency") or "USD",
+            "price_currency": fundamentals.get("currency") or "USD",
+            "price_display_currency": fundamentals.get("price_display_currency") or "USD",
         }
     except Exception as e:
         logging.error(f"[StockAnalyzer] 재무 분석 실패 - {e}")
@@ -152,20 +374,12 @@ def _analyze_financials(financials, balance_sheet, earnings, stock) -> dict:
             "eps": "N/A",
             "per": "N/A",
             "pbr": "N/A",
+            "market_cap": "N/A",
         }
 
 
 def _save_to_file(data: dict, ticker: str):
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    filename = f"{ticker}_stock_analysis_{timestamp}.json"
-    filepath = os.path.join(OUTPUT_DIR, filename)
-
-    try:
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        logging.info(f"[StockAnalyzer] 결과 저장 - {filepath}")
-    except IOError as e:
-        logging.error(f"[StockAnalyzer] 저장 실패 - {e}")
+    result_log.append(data, key=ticker)
 
 
 def _failure_response(ticker: str, error_info: str) -> dict:
@@ -178,52 +392,112 @@ def _failure_response(ticker: str, error_info: str) -> dict:
     }
 
 
-def summarize_all_analysis(
-    results: List[dict], output_filename: str = "stock_summary"
-) -> Tuple[str, str]: 
+SUMMARY_SYSTEM_PROMPT = "당신은 글로벌 전기차 산업 주식 분석 전문가입니다. 아래 내용을 바탕으로 기업들의 주가 및 재무 상태를 요약하고 투자 시사점을 작성하세요. 꼭 한국어로 작성하세요."
+
+
+def _summary_input(results: List[dict]) -> str:
     combined_text = ""
 
     for result in results:
         company = result.get("company", "Unknown")
+        risk_metrics = result["stock_analysis"].get("risk_metrics")
+        if risk_metrics:
+            combined_text += f"종목 간 상관관계 및 포트폴리오 위험 지표: {risk_metrics}\n\n"
+            continue
+
         price_metrics = result["stock_analysis"].get("price_metrics", {})
         financial_metrics = result["stock_analysis"].get("financial_metrics", {})
 
         combined_text += f"기업명: {company}\n"
         combined_text += f"주가 지표: {price_metrics}\n"
         combined_text += f"재무 지표: {financial_metrics}\n\n"
+    return combined_text
+
 
+def _summary_hash(summary_input: str) -> str:
+    return digest({"model": LLM_MODEL, "prompt": SUMMARY_SYSTEM_PROMPT, "input": summary_input})
+
+
+def _store_summary(input_hash: str, final_summary: str):
+    # 같은 지표로 다시 실행하면 요약 문구가 그대로 유지되어 리포트 섹션 캐시도 재사용됨
+    summary_cache.put("stock_summary", input_hash, {"summary_input": input_hash}, final_summary)
+    summary_cache.save()
+
+
+def _save_summary(final_summary: str, key: str) -> str:
+    # 티커별 결과와 같은 결과 로그에 기록하고, 이전과 같은 요약(캐시 재사용)은 다시 쓰지 않음
+    previous = result_log.latest(key)
+    if previous is None or previous.get("summary") != final_summary:
+        result_log.append(
+            {
+                "agent_name": "Stock_Analyzer",
+                "timestamp": datetime.utcnow().isoformat(),
+                "summary": final_summary,
+            },
+            key=key,
+        )
+        result_log.flush()
+        logging.info(f"[StockAnalyzer] 통합 요약 저장 - {result_log.data_path} ({key})")
+    return result_log.data_path
+
+
+def summarize_all_analysis(
+    results: List[dict], summary_key: str = "stock_summary"
+) -> Tuple[str, str]: 
+    summary_input = _summary_input(results)
+    input_hash = _summary_hash(summary_input)
+    cached = summary_cache.get("stock_summary", input_hash)
+    if cached is not None:
+        logging.info("[StockAnalyzer] 지표가 같아 이전 통합 요약 재사용")
+        return cached["text"], _save_summary(cached["text"], summary_key)
     try:
-        response = openai_client.chat.completions.create(
+        response = upstreams.get("openai").call(
+            openai_client.chat.completions.create,
             model=LLM_MODEL,
+            agent="StockAnalyzer",
             messages=[
-                {
-                    "role": "system",
-                    "content": "당신은 글로벌 전기차 산업 주식 분석 전문가입니다. 아래 내용을 바탕으로 기업들의 주가 및 재무 상태를 요약하고 투자 시사점을 작성하세요. 꼭 한국어로 작성하세요.",
-                },
-                {"role": "user", "content": combined_text},
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": summary_input},
             ],
             max_tokens=3000,
             temperature=0.2,
         )
 
         final_summary = response.choices[0].message.content.strip()
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        filename = f"{output_filename}_{timestamp}.json"
-        filepath = os.path.join(OUTPUT_DIR, filename)
-
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(
-                {
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "summary": final_summary,
-                },
-                f,
-                ensure_ascii=False,
-                indent=4,
-            )
+        _store_summary(input_hash, final_summary)
+        return final_summary, _save_summary(final_summary, summary_key)
 
-        logging.info(f"[StockAnalyzer] 통합 요약 저장 - {filepath}")
-        return final_summary, filepath
+    except Exception as e:
+        logging.error(f"[StockAnalyzer] 요약 실패 - {e}")
+        return "", ""
+
+
+async def asummarize_all_analysis(
+    results: List[dict], summary_key: str = "stock_summary"
+) -> Tuple[str, str]:
+    """summarize_all_analysis()의 비동기 버전"""
+    summary_input = _summary_input(results)
+    input_hash = _summary_hash(summary_input)
+    cached = summary_cache.get("stock_summary", input_hash)
+    if cached is not None:
+        logging.info("[StockAnalyzer] 지표가 같아 이전 통합 요약 재사용")
+        return cached["text"], _save_summary(cached["text"], summary_key)
+    try:
+        response = await upstreams.get("openai").acall(
+            async_openai_client.chat.completions.create,
+            model=LLM_MODEL,
+            agent="StockAnalyzer",
+            messages=[
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": summary_input},
+            ],
+            max_tokens=3000,
+            temperature=0.2,
+        )
+
+        final_summary = response.choices[0].message.content.strip()
+        _store_summary(input_hash, final_summary)
+        return final_summary, _save_summary(final_summary, summary_key)
 
     except Exception as e:
         logging.error(f"[StockAnalyzer] 요약 실패 - {e}")
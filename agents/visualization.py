@@ -1,23 +1,38 @@
 import matplotlib  # 먼저 추가
 
 matplotlib.use("Agg")  # GUI 백엔드 비활성화
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
+import matplotlib.dates as mdates
 import matplotlib.font_manager as fm
+import asyncio
+import atexit
+import hashlib
+import json
+import logging
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
 from pydantic import BaseModel, Field
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
 
-# 한글 폰트 설정
+# 한글 폰트 설정 (pyplot 전역 상태 대신 rcParams 사용)
 font_path = "C:/Windows/Fonts/malgun.ttf"
 if os.path.exists(font_path):
     font_name = fm.FontProperties(fname=font_path).get_name()
-    plt.rc("font", family=font_name)
+    matplotlib.rcParams["font.family"] = font_name
 
 OUTPUT_DIR = "results/charts"
+CHART_VERSION = 1  # 렌더링 코드가 바뀌면 올려서 기존 캐시 무효화
+MAX_WORKERS = 4
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+EV_MARKET_YEARS = [2023, 2024, 2025, 2026, 2027, 2028, 2029, 2030, 2031, 2032]
+EV_MARKET_SIZE = [3680, 3960, 4260, 4580, 4930, 5320, 5720, 6160, 6620, 7120]
+
 
 # Supervisor에서 공유하는 상태 객체 (예시)
 class ChartMetadata(BaseModel):
@@ -33,45 +48,309 @@ class EVMarketState(BaseModel):
     errors: Dict[str, str] = Field(default_factory=dict)
 
 
-# 그래프 생성 함수
-def plot_ev_market_growth() -> str:
-    years = [2023, 2024, 2025, 2026, 2027, 2028, 2029, 2030, 2031, 2032]
-    market_size = [3680, 3960, 4260, 4580, 4930, 5320, 5720, 6160, 6620, 7120]
+# 차트 정의: 상태에서 입력을 만들고, 입력만으로 그림을 그린다
+@dataclass
+class ChartSpec:
+    title: str
+    description: str
+    source: str
+    build_inputs: Callable[[Any, dict], dict]
+    render: Callable[[dict, str], None]
+    depends_on: Tuple[str, ...] = ("stock_data",)  # build_inputs가 읽는 상태 필드
+
+
+def _price_series(state) -> Dict[str, dict]:
+    series = {}
+    for result in state.stock_data:
+        data = result.get("stock_analysis", {}).get("price_series")
+        if data and data.get("close"):
+            series[result["company"]] = data
+    return series
+
+
+def _select(series: Dict[str, dict], params: dict) -> Dict[str, dict]:
+    tickers = params.get("tickers")
+    return {t: v for t, v in series.items() if not tickers or t in tickers}
+
+
+# 입력 생성 함수
+def _ev_market_growth_inputs(state, params: dict) -> dict:
+    return {"years": EV_MARKET_YEARS, "market_size": EV_MARKET_SIZE}
+
+
+def _price_inputs(state, params: dict) -> dict:
+    return {"series": _select(_price_series(state), params)}
+
+
+def _valuation_inputs(state, params: dict) -> dict:
+    points = {}
+    for result in state.stock_data:
+        analysis = result.get("stock_analysis", {})
+        per = analysis.get("financial_metrics", {}).get("per")
+        ret = analysis.get("price_metrics", {}).get("return_percentage")
+        if isinstance(per, (int, float)) and isinstance(ret, (int, float)):
+            points[result["company"]] = {"per": per, "return_percentage": ret}
+    return {"points": _select(points, params)}
+
 
-    plt.figure(figsize=(10, 6))
-    plt.plot(
-        years,
-        market_size,
+# 렌더링 함수 (Figure 객체 API 사용, 프로세스 풀에서 실행 가능)
+def plot_ev_market_growth(inputs: dict, file_path: str):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.plot(
+        inputs["years"],
+        inputs["market_size"],
         marker="o",
         linestyle="-",
         color="b",
         label="EV Market Size (Billion USD)",
     )
-    plt.xlabel("Year")
-    plt.ylabel("Market Size (Billion USD)")
-    plt.title("Electric Vehicle Market Size Forecast (2023-2032)")
-    plt.legend()
-    plt.grid(True)
-
-    file_path = os.path.join(OUTPUT_DIR, "ev_market_size_forecast.png")
-    plt.savefig(file_path)
-    plt.close()
+    ax.set_xlabel("Year")
+    ax.set_ylabel("Market Size (Billion USD)")
+    ax.set_title("Electric Vehicle Market Size Forecast (2023-2032)")
+    ax.legend()
+    ax.grid(True)
+    fig.savefig(file_path)
+
+
+def plot_price_performance(inputs: dict, file_path: str):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    for ticker, data in inputs["series"].items():
+        base = data["close"][0]
+        ax.plot(
+            mdates.datestr2num(data["dates"]),
+            [v / base * 100 for v in data["close"]],
+            label=ticker,
+        )
+    ax.xaxis_date()
+    ax.axhline(100, color="gray", linewidth=0.8)
+    ax.set_ylabel("Indexed Price (start = 100)")
+    ax.set_title("Price Performance (USD, indexed)")
+    ax.legend(ncol=2, fontsize=8)
+    ax.grid(True)
+    fig.autofmt_xdate()
+    fig.savefig(file_path)
+
+
+def plot_drawdown(inputs: dict, file_path: str):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    for ticker, data in inputs["series"].items():
+        peak = float("-inf")
+        drawdown = []
+        for value in data["close"]:
+            peak = max(peak, value)
+            drawdown.append((value / peak - 1) * 100)
+        ax.plot(mdates.datestr2num(data["dates"]), drawdown, label=ticker)
+    ax.xaxis_date()
+    ax.set_ylabel("Drawdown from Peak (%)")
+    ax.set_title("Drawdown")
+    ax.legend(ncol=2, fontsize=8)
+    ax.grid(True)
+    fig.autofmt_xdate()
+    fig.savefig(file_path)
+
+
+def plot_valuation_scatter(inputs: dict, file_path: str):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    for ticker, point in inputs["points"].items():
+        ax.scatter(point["per"], point["return_percentage"])
+        ax.annotate(ticker, (point["per"], point["return_percentage"]), fontsize=8)
+    ax.axhline(0, color="gray", linewidth=0.8)
+    ax.set_xlabel("PER")
+    ax.set_ylabel("Return over Analysis Period (%)")
+    ax.set_title("Valuation vs. Return")
+    ax.grid(True)
+    fig.savefig(file_path)
+
+
+CHART_REGISTRY: Dict[str, ChartSpec] = {
+    "ev_market_growth": ChartSpec(
+        title="Electric Vehicle Market Size Forecast (2023-2032)",
+        description="글로벌 전기차 시장 규모 성장 추이 (단위: 억 달러, Billion USD)",
+        source="IEA Global EV Outlook 2024; Our World in Data, 2024",
+        build_inputs=_ev_market_growth_inputs,
+        render=plot_ev_market_growth,
+        depends_on=(),
+    ),
+    "price_performance": ChartSpec(
+        title="Price Performance",
+        description="분석 기간 시작일을 100으로 환산한 기업별 주가 추이 (USD 기준)",
+        source="Yahoo Finance (yfinance)",
+        build_inputs=_price_inputs,
+        render=plot_price_performance,
+    ),
+    "drawdown": ChartSpec(
+        title="Drawdown",
+        description="기업별 분석 기간 중 고점 대비 하락률 (%)",
+        source="Yahoo Finance (yfinance)",
+        build_inputs=_price_inputs,
+        render=plot_drawdown,
+    ),
+    "valuation_scatter": ChartSpec(
+        title="Valuation vs. Return",
+        description="기업별 PER과 분석 기간 주가 수익률 비교",
+        source="Yahoo Finance (yfinance)",
+        build_inputs=_valuation_inputs,
+        render=plot_valuation_scatter,
+    ),
+}
+
+
+def _input_hash(chart_type: str, inputs: dict) -> str:
+    payload = json.dumps(
+        {"chart": chart_type, "version": CHART_VERSION, "inputs": inputs},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _render_chart(chart_type: str, inputs: dict, file_path: str) -> str:
+    # 임시 파일에 그린 뒤 교체해 중단된 렌더링이 캐시로 남지 않도록 함
+    tmp_path = f"{file_path}.{os.getpid()}.tmp.png"
+    CHART_REGISTRY[chart_type].render(inputs, tmp_path)
+    os.replace(tmp_path, file_path)
     return file_path
 
 
-# LangGraph Supervisor에서 호출할 함수
-def run(state: EVMarketState) -> EVMarketState:
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def _chart_executor() -> ProcessPoolExecutor:
+    """차트 작업이 함께 쓰는 렌더링 프로세스 풀 (스케줄러가 차트별로 호출해도 워커를 다시 띄우지 않음)"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        # fork된 샤드 워커에는 부모의 풀이 복사되므로 프로세스마다 따로 만든다
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _discard_broken_executor(outcomes: Dict[str, Any]):
+    # 워커가 비정상 종료되면 풀을 더 쓸 수 없으므로 다음 호출에서 새로 만든다
+    global _executor
+    if any(isinstance(outcome, BrokenProcessPool) for outcome in outcomes.values()):
+        with _executor_lock:
+            _executor = None
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=True)
+        _executor = None
+
+
+atexit.register(shutdown_executor)
+
+
+def render_charts(jobs: List[tuple]) -> Dict[str, Any]:
+    """(chart_type, inputs, file_path) 목록을 렌더링하고 차트별 경로 또는 예외를 반환"""
+    if len(jobs) <= 1:
+        outcomes = {}
+        for chart_type, inputs, file_path in jobs:
+            try:
+                outcomes[chart_type] = _render_chart(chart_type, inputs, file_path)
+            except Exception as e:
+                outcomes[chart_type] = e
+        return outcomes
+
+    outcomes = {}
+    executor = _chart_executor()
+    futures = {
+        chart_type: executor.submit(_render_chart, chart_type, inputs, file_path)
+        for chart_type, inputs, file_path in jobs
+    }
+    for chart_type, future in futures.items():
+        try:
+            outcomes[chart_type] = future.result()
+        except Exception as e:
+            outcomes[chart_type] = e
+    _discard_broken_executor(outcomes)
+    return outcomes
+
+
+async def arender_charts(jobs: List[tuple]) -> Dict[str, Any]:
+    """render_charts()의 비동기 버전 - 렌더링 프로세스를 기다리는 동안 이벤트 루프를 막지 않음"""
+    if not jobs:
+        return {}
+    loop = asyncio.get_running_loop()
+    executor = _chart_executor()
+    futures = [
+        loop.run_in_executor(executor, _render_chart, chart_type, inputs, file_path)
+        for chart_type, inputs, file_path in jobs
+    ]
+    rendered = await asyncio.gather(*futures, return_exceptions=True)
+    outcomes = {job[0]: outcome for job, outcome in zip(jobs, rendered)}
+    _discard_broken_executor(outcomes)
+    return outcomes
+
+
+def _plan_jobs(
+    state: EVMarketState, chart_types: Optional[List[str]] = None
+) -> Tuple[List[tuple], Dict[str, str]]:
+    jobs = []
+    file_paths = {}
     for chart_type, params in state.chart_requests.items():
+        if chart_types is not None and chart_type not in chart_types:
+            continue
+        spec = CHART_REGISTRY.get(chart_type)
+        if spec is None:
+            state.errors[chart_type] = f"지원하지 않는 차트 유형: {chart_type}"
+            continue
         try:
-            if chart_type == "ev_market_growth":
-                file_path = plot_ev_market_growth()
-                meta = ChartMetadata(
-                    title="Electric Vehicle Market Size Forecast (2023-2032)",
-                    description="글로벌 전기차 시장 규모 성장 추이 (단위: 억 달러, Billion USD)",
-                    source="IEA Global EV Outlook 2024; Our World in Data, 2024",
-                    file_path=file_path,
-                )
-                state.generated_charts[chart_type] = meta
+            inputs = spec.build_inputs(state, params or {})
+            file_path = os.path.join(
+                OUTPUT_DIR, f"{chart_type}_{_input_hash(chart_type, inputs)}.png"
+            )
+            file_paths[chart_type] = file_path
+            # 같은 입력으로 이미 그린 차트는 다시 그리지 않음
+            if os.path.exists(file_path):
+                logging.info(f"[Visualization] 캐시된 차트 사용 - {file_path}")
+            else:
+                jobs.append((chart_type, inputs, file_path))
         except Exception as e:
             state.errors[chart_type] = str(e)
+    return jobs, file_paths
+
+
+def _apply_outcomes(
+    state: EVMarketState, file_paths: Dict[str, str], outcomes: Dict[str, Any]
+) -> EVMarketState:
+    for chart_type, file_path in file_paths.items():
+        outcome = outcomes.get(chart_type, file_path)
+        if isinstance(outcome, Exception):
+            state.errors[chart_type] = str(outcome)
+            continue
+        spec = CHART_REGISTRY[chart_type]
+        state.generated_charts[chart_type] = ChartMetadata(
+            title=spec.title,
+            description=spec.description,
+            source=spec.source,
+            file_path=file_path,
+        )
     return state
+
+
+# LangGraph Supervisor에서 호출할 함수
+def run(state: EVMarketState) -> EVMarketState:
+    jobs, file_paths = _plan_jobs(state)
+    return _apply_outcomes(state, file_paths, render_charts(jobs))
+
+
+async def arun(state: EVMarketState) -> EVMarketState:
+    jobs, file_paths = _plan_jobs(state)
+    return _apply_outcomes(state, file_paths, await arender_charts(jobs))
+
+
+async def arun_charts(state: EVMarketState, chart_types: List[str]) -> EVMarketState:
+    """지정한 차트만 그림 (스케줄러가 차트별 입력이 준비되는 대로 호출)"""
+    jobs, file_paths = _plan_jobs(state, chart_types)
+    return _apply_outcomes(state, file_paths, await arender_charts(jobs))
@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.getcwd()))
+
+from utils.indicators import compute_indicators
+
+NUM_TICKERS = 1000
+NUM_DAYS = 252 * 10  # 10년 거래일
+
+
+def main():
+    rng = np.random.default_rng(42)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (NUM_DAYS, NUM_TICKERS)), axis=0))
+    spread = np.abs(rng.normal(0, 0.01, close.shape)) * close
+    high, low = close + spread, close - spread
+    benchmark = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, NUM_DAYS)))
+
+    started = time.perf_counter()
+    indicators = compute_indicators(close, high, low, benchmark)
+    elapsed = time.perf_counter() - started
+
+    size_mb = sum(arr.nbytes for arr in vars(indicators).values()) / 1e6
+    print(f"{NUM_TICKERS} tickers x {NUM_DAYS} days: {elapsed:.2f}s, {size_mb:.1f} MB (float32)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+import numpy as np
+
+sys.path.append(os.path.abspath(os.getcwd()))
+
+from utils import pdf_renderer
+from utils.report_formats import RENDERERS, write_reports
+
+NUM_SECTIONS = 300  # A4 기준 약 100쪽
+NUM_CHARTS = 40
+CHART_DPI = 200  # 원본 차트 해상도 (10 x 6 인치 → 2000 x 1200 px)
+PARAGRAPH = (
+    "Global EV sales grew strongly over the analysis period while average selling prices fell. "
+    "Battery costs, charging infrastructure and subsidy changes remain the main drivers of demand. "
+) * 6
+
+
+def _make_charts(directory: str) -> dict:
+    rng = np.random.default_rng(0)
+    charts = {}
+    for i in range(NUM_CHARTS):
+        key = f"chart_{i:02d}"
+        path = os.path.join(directory, f"{key}.png")
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
+        for _ in range(5):
+            ax.plot(np.cumsum(rng.normal(0, 1, 500)))
+        ax.set_title(key)
+        fig.savefig(path, dpi=CHART_DPI)
+        charts[key] = {
+            "title": key,
+            "description": f"synthetic chart {i}",
+            "source": "benchmark",
+            "file_path": path,
+        }
+    return charts
+
+
+def _report_text() -> str:
+    step = NUM_SECTIONS // NUM_CHARTS
+    sections = []
+    for i in range(NUM_SECTIONS):
+        mention = f" See chart_{i // step:02d}." if i % step == 0 and i // step < NUM_CHARTS else ""
+        sections.append(f"{i + 1}. {PARAGRAPH}{mention}")
+    return "\n\n".join(sections)
+
+
+def _timed(label: str, fn) -> float:
+    started = time.perf_counter()
+    path = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed:6.2f}s  {os.path.getsize(path) / 1e6:6.1f} MB")
+    return elapsed
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_renderer.IMAGE_CACHE_DIR = os.path.join(directory, "cache")
+        charts = _make_charts(directory)
+        text = _report_text()
+        output = os.path.join(directory, "report.pdf")
+        print(f"{NUM_SECTIONS} sections, {NUM_CHARTS} charts ({CHART_DPI} dpi source)")
+
+        started = time.perf_counter()
+        write_reports(os.path.join(directory, "report"), list(RENDERERS), text, charts)
+        print(f"{'markdown + html + json':<28} {(time.perf_counter() - started) * 1000:6.2f}ms")
+
+        _timed("original images", lambda: pdf_renderer.build_pdf(output, text, charts, dpi=None))
+        _timed("cold (downsample + cache)", lambda: pdf_renderer.build_pdf(output, text, charts))
+        _timed("warm (cached fonts/images)", lambda: pdf_renderer.build_pdf(output, text, charts))
+
+        started = time.perf_counter()
+        future = pdf_renderer.build_pdf_in_background(output, text, charts)
+        submitted = time.perf_counter() - started
+        future.result()
+        finished = time.perf_counter() - started
+        print(f"{'background (submit/done)':<28} {submitted * 1000:6.2f}ms / {finished:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
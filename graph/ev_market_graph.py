@@ -1,7 +1,9 @@
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableLambda
 from state.ev_market_state import EVMarketState
 import functools
 from agents import market_researcher, company_analyzer, stock_analyzer, report_compiler, visualization
+from utils.memory_profile import profiled
 
 
 def build_graph():
@@ -26,13 +28,18 @@ def build_graph():
         else:
             return {"current_step": "end"}
 
-    # 노드 추가
+    def agent_node(name, agent):
+        # MEMORY_PROFILE=1이면 노드별 메모리 사용을 기록하는 래퍼로 감쌈
+        run, arun = profiled(name, agent.run, agent.arun)
+        return RunnableLambda(run, afunc=arun)
+
+    # 노드 추가 (invoke는 동기 run, ainvoke/astream은 비동기 arun 사용)
     graph.add_node("Supervisor", supervisor_agent)
-    graph.add_node("MarketResearcher", market_researcher.run)
-    graph.add_node("CompanyAnalyzer", company_analyzer.run)
-    graph.add_node("StockAnalyzer", stock_analyzer.run)
-    graph.add_node("Visualization", visualization.run)
-    graph.add_node("ReportCompiler", report_compiler.run)
+    graph.add_node("MarketResearcher", agent_node("MarketResearcher", market_researcher))
+    graph.add_node("CompanyAnalyzer", agent_node("CompanyAnalyzer", company_analyzer))
+    graph.add_node("StockAnalyzer", agent_node("StockAnalyzer", stock_analyzer))
+    graph.add_node("Visualization", agent_node("Visualization", visualization))
+    graph.add_node("ReportCompiler", agent_node("ReportCompiler", report_compiler))
 
     # 슈퍼바이저가 에이전트들을 결정하는 조건부 엣지 추가
     graph.add_conditional_edges(
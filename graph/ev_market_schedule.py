@@ -0,0 +1,88 @@
+import logging
+import os
+from typing import Callable, Dict, Optional
+
+from agents import market_researcher, company_analyzer, stock_analyzer, report_compiler, visualization
+from state.ev_market_state import EVMarketState
+from utils.memory_profile import ENABLED as MEMORY_PROFILE, profiled_async
+from utils.scheduler import CriticalPathScheduler, save_report
+
+# critical_path: 작업별 의존 관계로 겹쳐 실행, graph: 기존 LangGraph 슈퍼바이저 순차 실행
+SCHEDULER = os.getenv("PIPELINE_SCHEDULER", "critical_path")
+
+# 상태 필드를 채우는 작업 (차트/리포트 섹션의 선행 작업을 찾는 데 사용)
+PRODUCERS = {
+    "market_data": "MarketResearcher",
+    "company_data": "CompanyAnalyzer",
+    "stock_data": "StockAnalyzer",
+    "stock_summary_content": "StockSummary",
+}
+
+
+def _chart_task(chart_type: str) -> str:
+    return f"Chart:{chart_type}"
+
+
+def _section_task(key: str) -> str:
+    return f"Section:{key}"
+
+
+def build_schedule(state: EVMarketState) -> CriticalPathScheduler:
+    """에이전트를 입력 기준으로 나눈 작업 그래프.
+
+    StockSummary는 yfinance 결과만, 차트는 각자 읽는 상태 필드만 기다리고,
+    리포트 섹션은 자신이 참고하는 입력이 준비되는 대로 작성된다.
+    """
+    scheduler = CriticalPathScheduler()
+
+    def add(name: str, afn, deps=()):
+        # MEMORY_PROFILE=1이면 그래프 노드와 같은 방식으로 작업별 메모리 사용을 기록
+        scheduler.add(name, profiled_async(name, afn), deps=deps)
+
+    add("MarketResearcher", lambda: market_researcher.arun(state))
+    add("CompanyAnalyzer", lambda: company_analyzer.arun(state))
+    add("StockAnalyzer", lambda: stock_analyzer.acollect(state))
+    add("StockSummary", lambda: stock_analyzer.asummarize(state), deps=["StockAnalyzer"])
+
+    for chart_type in state.chart_requests:
+        spec = visualization.CHART_REGISTRY.get(chart_type)
+        deps = [PRODUCERS[field] for field in spec.depends_on] if spec else []
+        add(
+            _chart_task(chart_type),
+            lambda chart_type=chart_type: visualization.arun_charts(state, [chart_type]),
+            deps=deps,
+        )
+
+    texts: Dict[str, str] = {}
+    records: dict = {}
+    for section in report_compiler.SECTIONS:
+        deps = [PRODUCERS[name] for name in section.inputs if name in PRODUCERS]
+        deps += [_chart_task(chart) for chart in section.charts if chart in state.chart_requests]
+        deps += [_section_task(key) for key in section.after]
+        add(
+            _section_task(section.key),
+            lambda key=section.key: report_compiler.acompose_section(state, key, texts, records),
+            deps=deps,
+        )
+
+    # 섹션이 참고하지 않는 차트도 리포트에 배치되므로 모든 작업이 끝난 뒤 조립
+    add(
+        "ReportCompiler",
+        lambda: report_compiler.awrite_report(state, texts, records),
+        deps=list(scheduler.tasks),
+    )
+    return scheduler
+
+
+async def run_scheduled(
+    state: EVMarketState, on_done: Optional[Callable[[str, float], None]] = None
+) -> EVMarketState:
+    """작업 그래프를 실행하고 임계 경로 보고서를 상태에 기록 (results/schedule 에도 저장)"""
+    if MEMORY_PROFILE:
+        logging.warning("[Scheduler] MEMORY_PROFILE=1 - 작업별 메모리 측정을 위해 작업을 하나씩 실행 (임계 경로 시간 왜곡)")
+    scheduler = build_schedule(state)
+    await scheduler.run(on_done)
+    state.schedule_report = scheduler.record()
+    save_report(state.schedule_report)
+    state.current_step = "end"
+    return state
@@ -1,5 +1,12 @@
 from graph.ev_market_graph import build_graph
+from graph.ev_market_schedule import SCHEDULER, run_scheduled
 from state.ev_market_state import EVMarketState, get_initial_state
+from utils.memory_profile import memory_profiler
+from utils.metrics import metrics
+from utils.pdf_renderer import wait_for_pending_builds
+from utils.resilience import upstreams
+from utils.watermark import INCREMENTAL
+import asyncio
 import logging
 import os
 
@@ -11,21 +18,22 @@ logger = logging.getLogger(__name__)
 # 이전 실행 결과 정리
 results_dirs = ["results/market_results", "results/company_results", 
                 "results/stock_results", "results/final_reports"]
+# 증분 수집 시 다음 실행이 기업별 워터마크와 이전 요약을 읽을 수 있도록 결과 로그는 남김
+result_log_suffixes = (".jsonl", ".jsonl.zst", ".idx")
 
 for directory in results_dirs:
     if os.path.exists(directory):
         logger.info(f"이전 결과 삭제 중: {directory}")
         for file in os.listdir(directory):
             file_path = os.path.join(directory, file)
+            if INCREMENTAL and file.endswith(result_log_suffixes):
+                continue
             try:
                 if os.path.isfile(file_path):
                     os.unlink(file_path)
             except Exception as e:
                 logger.error(f"파일 삭제 중 오류: {e}")
 
-# 그래프 생성
-graph = build_graph()
-
 # get_initial_state() 함수를 통해 초기 상태 설정
 # state = EVMarketState(**get_initial_state())  # 이 방법 또는
 initial_state_dict = get_initial_state()
@@ -39,8 +47,19 @@ logger.info(f"명시적 설정 후 current_step: {state.current_step}")
 
 # 그래프 실행
 logger.info("그래프 실행 시작")
-final_state = graph.invoke(state)
+if SCHEDULER == "graph":
+    final_state = asyncio.run(build_graph().ainvoke(state))
+else:
+    # 입력이 준비된 작업부터 겹쳐 실행하고 임계 경로를 기록 (results/schedule)
+    final_state = asyncio.run(run_scheduled(state))
+wait_for_pending_builds()  # 백그라운드 PDF 생성이 켜져 있으면 완료까지 대기
 logger.info("그래프 실행 완료")
+logger.info(f"상위 서비스 호출 통계: {upstreams.stats()}")
+if upstreams.tripped():
+    logger.warning(f"차단기 작동: {upstreams.tripped()}")
+logger.info(f"에이전트별 LLM 사용량: {metrics.llm_totals()}")
+metrics.export()  # results/metrics 에 Prometheus 텍스트/JSON 스냅샷 저장
+memory_profiler.save()  # MEMORY_PROFILE=1 인 경우 results/memory 에 노드별 메모리 보고 저장
 
 # 결과 확인
 pdf_path = "results/final_reports/EV_Market_Report_2025-05-20.pdf"
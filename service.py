@@ -0,0 +1,305 @@
+"""로컬 리포트 서비스.
+
+그래프, API 클라이언트, 폰트와 캐시를 한 프로세스에 띄워 둔 채로 리포트 작업을 받아 처리한다.
+
+    python service.py            # http://127.0.0.1:8765
+
+    POST /jobs                   초기 상태 덮어쓰기(JSON) -> {"job_id": ...}
+    GET  /jobs                   작업 목록
+    GET  /jobs/<id>              작업 상태와 결과
+    GET  /jobs/<id>/events       노드 진행 이벤트 스트림 (text/event-stream)
+    GET  /health                 워커/대기열 상태와 차단기 작동 횟수
+    GET  /upstreams              상위 서비스별 호출/재시도/차단 통계
+    GET  /metrics                토큰/지연시간/캐시 지표 (Prometheus 텍스트, ?format=json 이면 JSON)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from graph.ev_market_graph import build_graph
+from graph.ev_market_schedule import SCHEDULER, run_scheduled
+from state.ev_market_state import EVMarketState, get_initial_state
+from utils import pdf_renderer
+from utils.metrics import metrics
+from utils.resilience import upstreams
+
+HOST = "127.0.0.1"  # 외부 노출 없이 로컬에서만 사용
+PORT = int(os.getenv("REPORT_SERVICE_PORT", "8765"))
+WORKERS = int(os.getenv("REPORT_SERVICE_WORKERS", "4"))  # 동시에 실행할 작업 수
+QUEUE_SIZE = 32
+MAX_JOBS = 200  # 메모리에 보관할 완료 작업 수
+EVENT_POLL_SECONDS = 15  # 이벤트가 없을 때 연결 유지용 주석을 보내는 간격
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, overrides: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.overrides = overrides
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self._changed = threading.Condition()
+
+    def emit(self, event: str, **data):
+        with self._changed:
+            self.events.append({"event": event, "time": time.time(), **data})
+            self._changed.notify_all()
+
+    def finish(self, status: str):
+        """종료 이벤트와 상태를 함께 기록 (구독자가 종료 이벤트 없이 done을 보지 않도록)"""
+        with self._changed:
+            self.finished_at = time.time()
+            self.events.append(
+                {"event": status, "time": self.finished_at, "seconds": round(self.finished_at - self.started_at, 3)}
+            )
+            self.status = status
+            self._changed.notify_all()
+
+    def wait_events(self, start: int, timeout: float) -> List[Dict[str, Any]]:
+        with self._changed:
+            if len(self.events) <= start and not self.done:
+                self._changed.wait(timeout)
+            return self.events[start:]
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class ReportService:
+    """컴파일된 그래프 하나를 이벤트 루프 하나에서 astream으로 실행하며 대기열의 작업을 처리.
+
+    HTTP 요청은 스레드에서 받고, 작업은 루프 스레드의 워커 코루틴들이 동시에 실행한다.
+    """
+
+    def __init__(self, workers: int = WORKERS, queue_size: int = QUEUE_SIZE):
+        started = time.perf_counter()
+        self.graph = build_graph()
+        # 첫 작업이 폰트 등록/스타일 생성 비용을 치르지 않도록 미리 준비
+        pdf_renderer.stylesheet()
+        logger.info(f"[Service] 그래프/리소스 준비 완료 ({time.perf_counter() - started:.2f}s)")
+
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._queue_size = queue_size
+        self._queued = 0
+        self._workers = workers
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="report-loop", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._start_workers(), self._loop).result()
+
+    async def _start_workers(self):
+        self._queue: "asyncio.Queue[Job]" = asyncio.Queue()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self._workers)]
+
+    def submit(self, overrides: Dict[str, Any]) -> Job:
+        with self._jobs_lock:
+            if self._queued >= self._queue_size:
+                raise queue.Full
+            self._queued += 1
+            job = Job(overrides)
+            self.jobs[job.id] = job
+            self._evict()
+            job.emit("queued", position=self._queued)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._jobs_lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._jobs_lock:
+            return [job.summary() for job in self.jobs.values()]
+
+    def health(self) -> Dict[str, Any]:
+        with self._jobs_lock:
+            running = sum(1 for job in self.jobs.values() if job.status == "running")
+            status = {"workers": self._workers, "queued": self._queued, "running": running}
+        status["breaker_trips"] = upstreams.tripped()
+        return status
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[: max(0, len(self.jobs) - MAX_JOBS)]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            with self._jobs_lock:
+                self._queued -= 1
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        job.emit("started")
+        try:
+            state = EVMarketState.parse_obj({**get_initial_state(), **job.overrides})
+            state.current_step = "start"
+            # 동시에 실행되는 작업이 같은 날짜의 리포트 파일을 덮어쓰지 않도록 작업 ID를 붙임
+            state.report_name = f"EV_Market_Report_{state.current_date}_{job.id}"
+
+            final_state: Dict[str, Any] = {}
+            if SCHEDULER == "graph":
+                step_started = time.perf_counter()
+                async for mode, chunk in self.graph.astream(state, stream_mode=["updates", "values"]):
+                    if mode == "values":
+                        final_state = chunk
+                        continue
+                    for node in chunk:
+                        now = time.perf_counter()
+                        job.emit("node", node=node, seconds=round(now - step_started, 3))
+                        step_started = now
+            else:
+                # 작업이 겹쳐 실행되므로 작업별 실행 시간을 완료 순서대로 보냄
+                final_state = (
+                    await run_scheduled(
+                        state, on_done=lambda name, seconds: job.emit("node", node=name, seconds=seconds)
+                    )
+                ).dict()
+
+            await asyncio.to_thread(pdf_renderer.wait_for_pending_builds)
+            # 프로세스 누적 지표를 작업마다 파일로 남김
+            await asyncio.to_thread(metrics.export)
+            job.result = {
+                "final_report_path": final_state.get("final_report_path"),
+                "final_report_paths": final_state.get("final_report_paths", {}),
+                "errors": final_state.get("errors", {}),
+                "critical_path": final_state.get("schedule_report", {}).get("critical_path", []),
+            }
+            status = "completed"
+        except Exception as e:
+            logger.exception(f"[Service] 작업 실패 - {job.id}")
+            job.error = str(e)
+            status = "failed"
+        job.finish(status)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: ReportService = None  # serve()에서 주입
+    protocol_version = "HTTP/1.1"
+
+    def _send_text(self, status: int, text: str, content_type: str):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: Any):
+        self._send_text(status, json.dumps(payload, ensure_ascii=False), "application/json")
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            overrides = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(overrides, dict):
+                raise ValueError("request body must be a JSON object")
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+        try:
+            job = self.service.submit(overrides)
+        except queue.Full:
+            return self._send_json(503, {"error": "job queue is full"})
+        self._send_json(202, {"job_id": job.id, "events": f"/jobs/{job.id}/events"})
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        parts = [p for p in path.split("/") if p]
+        if parts == ["metrics"]:
+            if "format=json" in query:
+                return self._send_json(200, metrics.snapshot())
+            return self._send_text(200, metrics.to_prometheus(), "text/plain; version=0.0.4")
+        if parts == ["health"]:
+            return self._send_json(200, self.service.health())
+        if parts == ["upstreams"]:
+            return self._send_json(200, upstreams.stats())
+        if parts == ["jobs"]:
+            return self._send_json(200, self.service.list_jobs())
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.service.get(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": "unknown job"})
+            if len(parts) == 2:
+                return self._send_json(200, job.summary())
+            if parts[2] == "events":
+                return self._stream_events(job)
+        self._send_json(404, {"error": "not found"})
+
+    def _stream_events(self, job: Job):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        sent = 0
+        try:
+            while True:
+                events = job.wait_events(sent, EVENT_POLL_SECONDS)
+                if not events:
+                    self.wfile.write(b": keep-alive\n\n")
+                for event in events:
+                    data = json.dumps(event, ensure_ascii=False)
+                    self.wfile.write(f"event: {event['event']}\ndata: {data}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                sent += len(events)
+                if job.done and sent >= len(job.events):
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info(f"[Service] 이벤트 구독 종료 - {job.id}")
+
+    def log_message(self, format, *args):
+        logger.info(f"[Service] {self.address_string()} {format % args}")
+
+
+def serve(host: str = HOST, port: int = PORT, workers: int = WORKERS):
+    _Handler.service = ReportService(workers=workers)
+    server = ThreadingHTTPServer((host, port), _Handler)
+    logger.info(f"[Service] http://{host}:{port} 에서 대기 중 (동시 작업 {workers}개)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,6 +1,6 @@
 from agents.visualization import ChartMetadata
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Annotated, Union, Literal
+from typing import Any, List, Optional, Dict, Annotated, Union, Literal
 from datetime import datetime
 import operator
 from langchain_core.messages import BaseMessage
@@ -12,9 +12,10 @@ class EVMarketState(BaseModel):
     tickers: List[str] = []
     num_results: int = 5
     current_date: str = datetime.utcnow().strftime("%Y-%m-%d")
-    analysis_period: str = "2024-11-01 ~ 2025-05-19"
+    analysis_period: str = "2024-11-01 ~ 2025-05-19"  # 뉴스 검색/가격 조회 기간 (시작일 ~ 종료일)
     target_companies: str = ""
-    report_format: str = "pdf"  # pdf or other formats
+    report_format: str = "pdf"  # pdf, markdown, html, json (쉼표로 여러 형식 지정 가능)
+    report_name: Optional[str] = None  # 리포트 파일명 (비우면 EV_Market_Report_{current_date})
 
     # 중간 결과 저장 (에이전트 결과들)
     market_data: List[dict] = []
@@ -31,6 +32,9 @@ class EVMarketState(BaseModel):
     # 최종 리포트 결과
     final_report_path: Optional[str] = None
     final_report_content: Optional[str] = None
+    final_report_paths: Dict[str, str] = {}  # 형식별 리포트 경로
+    report_sections: Dict[str, dict] = {}  # 섹션별 입력 해시와 캐시 재사용 여부
+    schedule_report: Dict[str, Any] = {}  # 스케줄러 실행 시 작업별 실행 구간과 임계 경로
 
     # 누락된 속성 추가 (Stock Summary)
     stock_summary_path: Optional[str] = None
@@ -61,7 +65,12 @@ def get_initial_state() -> dict:
         tickers=["TSLA", "BYDDF", "VWAGY", "XPEV", "F", "LI", "300750.SZ", "006400.KQ"],
         target_companies="Tesla, BYD, Volkswagen, XPeng, Ford, Li Auto, Contemporary Amperex Technology, Samsung SDI",
         current_date=datetime.utcnow().strftime("%Y-%m-%d"),
-        chart_requests={"ev_market_growth": {}},
+        chart_requests={
+            "ev_market_growth": {},
+            "price_performance": {},
+            "drawdown": {},
+            "valuation_scatter": {},
+        },
         current_step="start",  # 시작 단계 설정
     )
     return state.dict()  # LangGraph에서는 dict로 사용
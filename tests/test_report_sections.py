@@ -0,0 +1,78 @@
+import os
+import types
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
+
+import pytest
+
+from agents import report_compiler
+from state.ev_market_state import EVMarketState
+from utils.report_sections import SectionCache
+
+
+def _stock_result(ticker: str, per: float) -> dict:
+    return {
+        "agent_name": "Stock_Analyzer",
+        "status": "success",
+        "timestamp": "2025-05-20T00:00:00",
+        "company": ticker,
+        "stock_analysis": {
+            "price_metrics": {"return_percentage": 12.5},
+            "financial_metrics": {"per": per},
+            "price_series": {"dates": ["2025-05-19"], "close": [100.0]},
+        },
+    }
+
+
+@pytest.fixture
+def generated(monkeypatch, tmp_path):
+    """섹션 캐시를 임시 경로로 바꾸고, LLM 호출 대신 생성된 섹션 키를 기록"""
+    calls = []
+
+    def create(**kwargs):
+        prompt = kwargs["messages"][1]["content"]
+        key = next(
+            s.key for s in report_compiler.SECTIONS if s.instructions in prompt
+        )
+        calls.append(key)
+        message = types.SimpleNamespace(content=f"{key} 본문 {len(calls)}")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    monkeypatch.setattr(report_compiler, "openai_client", client)
+    monkeypatch.setattr(report_compiler, "section_cache", SectionCache(str(tmp_path / "sections.json")))
+    return calls
+
+
+def _compose(state: EVMarketState):
+    return report_compiler._compose_report(report_compiler._prepare(state)["prompt"])
+
+
+def test_unchanged_inputs_reuse_every_section(generated):
+    state = EVMarketState(stock_data=[_stock_result("TSLA", 60.0)], stock_summary_content="요약")
+    _compose(state)
+    generated.clear()
+
+    # 타임스탬프만 바뀐 결과는 같은 입력으로 취급
+    state.stock_data = [{**_stock_result("TSLA", 60.0), "timestamp": "2025-05-21T00:00:00"}]
+    _, records = _compose(state)
+
+    assert generated == []
+    assert all(record["reused"] for record in records.values())
+
+
+def test_changed_ticker_metrics_regenerate_dependent_sections(generated):
+    state = EVMarketState(
+        market_data=[{"company": "Tesla", "market_trends": []}],
+        stock_data=[_stock_result("TSLA", 60.0), _stock_result("F", 7.0)],
+        stock_summary_content="요약",
+    )
+    _compose(state)
+    generated.clear()
+
+    state.stock_data = [_stock_result("TSLA", 60.0), _stock_result("F", 9.5)]
+    _, records = _compose(state)
+
+    assert set(generated) == {"company_strategy", "investment", "summary", "conclusion"}
+    assert records["market_trends"]["reused"]
@@ -0,0 +1,84 @@
+import time
+import types
+
+import pytest
+
+from utils import resilience
+from utils.resilience import CircuitOpenError, Upstream
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """차단기가 보는 monotonic 시계를 테스트에서 직접 진행"""
+    now = [1000.0]
+    fake = types.SimpleNamespace(monotonic=lambda: now[0], perf_counter=time.perf_counter, sleep=lambda _: None)
+    monkeypatch.setattr(resilience, "time", fake)
+    return now
+
+
+def _fail(status_code: int = 503):
+    raise _StatusError(status_code)
+
+
+def test_breaker_trips_rejects_then_recovers(clock):
+    upstream = Upstream("test", max_attempts=1, failure_threshold=2, reset_timeout=30.0)
+
+    for _ in range(2):
+        with pytest.raises(_StatusError):
+            upstream.call(_fail)
+    assert upstream.breaker.state == "open"
+
+    # 열려 있는 동안은 함수를 호출하지 않고 바로 거부
+    called = []
+    with pytest.raises(CircuitOpenError):
+        upstream.call(lambda: called.append(1))
+    assert called == []
+    assert upstream.stats()["breaker_rejected"] == 1
+
+    clock[0] += 29.0
+    with pytest.raises(CircuitOpenError):
+        upstream.call(lambda: "ok")
+
+    # reset_timeout이 지나면 시험 호출이 통과하고, 성공하면 닫힘
+    clock[0] += 1.0
+    assert upstream.call(lambda: "ok") == "ok"
+    assert upstream.breaker.state == "closed"
+    assert upstream.stats()["breaker_trips"] == 1
+
+
+def test_failed_probe_reopens_breaker(clock):
+    upstream = Upstream("test", max_attempts=1, failure_threshold=1, reset_timeout=10.0)
+    with pytest.raises(_StatusError):
+        upstream.call(_fail)
+
+    clock[0] += 10.0
+    with pytest.raises(_StatusError):
+        upstream.call(_fail)
+    assert upstream.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        upstream.call(lambda: "ok")
+
+
+def test_client_error_does_not_trip_breaker(clock):
+    upstream = Upstream("test", max_attempts=3, failure_threshold=2, reset_timeout=30.0)
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise _StatusError(400)
+
+    for _ in range(5):
+        with pytest.raises(_StatusError):
+            upstream.call(bad_request)
+
+    # 4xx는 재시도하지 않고 차단기에도 반영하지 않음
+    assert len(calls) == 5
+    assert upstream.breaker.state == "closed"
+    assert upstream.stats()["breaker_trips"] == 0
+    assert upstream.call(lambda: "ok") == "ok"
@@ -0,0 +1,51 @@
+import os
+
+from utils.result_log import ResultLog
+
+
+def _record(company: str, n: int) -> dict:
+    return {"company": company, "timestamp": f"2025-05-{n:02d}T00:00:00", "n": n}
+
+
+def test_latest_after_reopen_returns_most_recent(tmp_path):
+    log = ResultLog(str(tmp_path), "market_research")
+    for n in (1, 2, 3):
+        log.append(_record("Tesla", n), key="Tesla")
+    log.append(_record("BYD", 4), key="BYD")
+    log.flush()
+
+    reopened = ResultLog(str(tmp_path), "market_research")
+    assert reopened.latest("Tesla")["n"] == 3
+    assert [r["n"] for r in reopened.history("Tesla")] == [1, 2, 3]
+    assert sorted(reopened.keys()) == ["BYD", "Tesla"]
+    assert reopened.latest("Rivian") is None
+
+
+def test_latest_includes_unflushed_records(tmp_path):
+    log = ResultLog(str(tmp_path), "market_research")
+    log.append(_record("Tesla", 1), key="Tesla")
+    log.flush()
+    log.append(_record("Tesla", 2), key="Tesla")
+
+    assert log.latest("Tesla")["n"] == 2
+
+
+def test_index_entry_past_end_of_data_is_ignored(tmp_path):
+    log = ResultLog(str(tmp_path), "market_research")
+    log.append(_record("Tesla", 1), key="Tesla")
+    log.flush()
+
+    # 인덱스만 기록되고 데이터 기록이 중단된 경우
+    size = os.path.getsize(log.data_path)
+    with open(log.index_path, "a", encoding="utf-8") as f:
+        f.write(f"Tesla\t2025-05-02T00:00:00\t{size}\t100\n")
+        f.write("broken line\n")
+
+    reopened = ResultLog(str(tmp_path), "market_research")
+    assert reopened.latest("Tesla")["n"] == 1
+    assert len(reopened.history("Tesla")) == 1
+
+    # 이후 기록은 실제 데이터 끝에 이어 씀
+    reopened.append(_record("Tesla", 3), key="Tesla")
+    reopened.flush()
+    assert ResultLog(str(tmp_path), "market_research").latest("Tesla")["n"] == 3
@@ -0,0 +1,69 @@
+import pytest
+
+from utils import watermark
+from utils.watermark import IngestWindow, failed_ingest
+
+PERIOD = ("2025-01-01", "2025-05-19")
+
+
+@pytest.fixture(autouse=True)
+def incremental(monkeypatch):
+    monkeypatch.setattr(watermark, "INCREMENTAL", True)
+
+
+def _previous() -> dict:
+    return {
+        "company": "Tesla",
+        "status": "success",
+        "coverage": {
+            "period_start": "2025-01-01",
+            "searched_through": "2025-05-01",
+            "watermark": "2025-04-28",
+            "updated_at": "2025-05-01T00:00:00",
+        },
+    }
+
+
+def test_complete_ingest_advances_watermark():
+    window = IngestWindow(PERIOD, _previous())
+    assert window.start == "2025-04-28"
+
+    coverage = window.next_coverage([{"published_date": "2025-05-10"}, {"published_date": "Unknown"}])
+    assert coverage["watermark"] == "2025-05-10"
+    assert coverage["searched_through"] == "2025-05-19"
+    assert IngestWindow(PERIOD, {"coverage": coverage}).up_to_date
+
+
+def test_failed_ingest_keeps_previous_watermark():
+    previous = _previous()
+    window = IngestWindow(PERIOD, previous)
+
+    result = failed_ingest("Market_Researcher", "Tesla", window, "검색 실패: timeout")
+    assert result["status"] == "fail"
+    assert result["previous"] is previous
+    assert "coverage" not in result
+
+    # 실패 결과는 저장하지 않으므로 다음 실행도 같은 구간부터 다시 검색
+    retry = IngestWindow(PERIOD, previous)
+    assert retry.start == window.start == "2025-04-28"
+    assert not retry.up_to_date
+
+
+def test_partial_ingest_keeps_watermark_and_searched_through():
+    window = IngestWindow(PERIOD, _previous())
+
+    coverage = window.next_coverage([{"published_date": "2025-05-15"}], complete=False)
+    assert coverage["watermark"] == "2025-04-28"
+    assert coverage["searched_through"] == "2025-05-01"
+
+    retry = IngestWindow(PERIOD, {"coverage": coverage})
+    assert retry.start == "2025-04-28"
+    assert not retry.up_to_date
+
+
+def test_partial_first_ingest_restarts_from_period_start():
+    window = IngestWindow(PERIOD)
+
+    coverage = window.next_coverage([{"published_date": "2025-05-15"}], complete=False)
+    assert coverage["watermark"] == coverage["searched_through"] == "2025-01-01"
+    assert IngestWindow(PERIOD, {"coverage": coverage}).start == "2025-01-01"
@@ -0,0 +1,318 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from urllib.parse import urlparse
+
+import httpx
+import requests
+
+from utils.metrics import BYTES_BUCKETS, metrics
+from utils.resilience import CircuitOpenError, upstreams
+
+T = TypeVar("T")
+
+DEFAULT_TIMEOUT = 5.0
+MIN_TIMEOUT = 1.0
+MAX_TIMEOUT = 10.0
+TIMEOUT_MULTIPLIER = 1.5  # p95 대비 타임아웃 여유
+HEDGE_PERCENTILE = 95
+LATENCY_WINDOW = 50  # 도메인별로 유지할 최근 지연시간 샘플 수
+MIN_SAMPLES = 5  # 백분위 계산에 필요한 최소 샘플 수
+MAX_HEDGES = 2  # 필요한 개수 외에 추가로 띄울 수 있는 헤지 요청 수
+POOL_SIZE = 32  # 호스트별로 유지할 keep-alive 연결 수
+
+
+class Deadline:
+    """에이전트/기업 단위 작업 시간 예산 (monotonic 기준)"""
+
+    def __init__(self, seconds: Optional[float]):
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def child(self, seconds: Optional[float]) -> "Deadline":
+        # 하위 작업의 기한은 상위 기한을 넘을 수 없음
+        child = Deadline(seconds)
+        if self.expires_at is not None and (
+            child.expires_at is None or child.expires_at > self.expires_at
+        ):
+            child.expires_at = self.expires_at
+        return child
+
+
+def _domain(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class FetchPolicy:
+    """도메인별 지연시간을 추적해 적응형 타임아웃과 헤지 요청을 결정"""
+
+    def __init__(
+        self,
+        default_timeout: float = DEFAULT_TIMEOUT,
+        min_timeout: float = MIN_TIMEOUT,
+        max_timeout: float = MAX_TIMEOUT,
+        window: int = LATENCY_WINDOW,
+    ):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+        # 세션을 재사용해 같은 호스트로의 연결(TCP/TLS)을 요청 간에 유지
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # 비동기 클라이언트는 이벤트 루프에 묶이므로 루프마다 하나씩 만든다
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def record(self, url: str, elapsed: float):
+        with self._lock:
+            self._latencies[_domain(url)].append(elapsed)
+        metrics.observe("fetch_seconds", elapsed)
+
+    def percentile(self, url: str, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = list(self._latencies.get(_domain(url), ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return _percentile(samples, pct)
+
+    def timeout_for(self, url: str, deadline: Optional[Deadline] = None) -> float:
+        p95 = self.percentile(url, HEDGE_PERCENTILE)
+        if p95 is None:
+            timeout = self.default_timeout
+        else:
+            timeout = min(self.max_timeout, max(self.min_timeout, p95 * TIMEOUT_MULTIPLIER))
+        remaining = deadline.remaining() if deadline else None
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+        return timeout
+
+    def hedge_delay(self, url: str) -> float:
+        # 요청이 p95를 넘기면 다음 후보 URL로 헤지 요청을 보냄
+        p95 = self.percentile(url, HEDGE_PERCENTILE)
+        return p95 if p95 is not None else self.default_timeout
+
+    def get(self, url: str, deadline: Optional[Deadline] = None) -> Optional[requests.Response]:
+        timeout = self.timeout_for(url, deadline)
+        if timeout <= 0 or not self._allow(url):
+            return None
+        started = time.monotonic()
+        try:
+            response = self.session.get(url, timeout=timeout)
+        except requests.RequestException as e:
+            self._record_outcome(url, error=e)
+            return None
+        finally:
+            # 타임아웃도 지연시간 샘플로 기록해 느린 호스트가 반영되도록 함
+            self.record(url, time.monotonic() - started)
+        self._record_outcome(url, status=response.status_code, size=len(response.content))
+        return response
+
+    def _allow(self, url: str) -> bool:
+        # 차단된 호스트는 기다리지 않고 바로 건너뛰어 다음 후보로 넘어가게 함
+        try:
+            upstreams.host(url).before_call()
+            return True
+        except CircuitOpenError as e:
+            logging.debug(f"[FetchPolicy] {e} - {url}")
+            return False
+
+    def _record_outcome(
+        self, url: str, status: Optional[int] = None, error: Optional[Exception] = None, size: int = 0
+    ):
+        upstream = upstreams.host(url)
+        if error is not None:
+            logging.warning(f"[FetchPolicy] 요청 실패 - {url} - {type(error).__name__}: {error}")
+            metrics.inc("fetch_requests_total", outcome="error")
+            upstream.record_failure(error)
+            return
+        metrics.inc("fetch_requests_total", outcome=f"{status // 100}xx")
+        metrics.observe("fetch_response_bytes", size, buckets=BYTES_BUCKETS)
+        if status == 429 or status >= 500:
+            upstream.record_failure()
+        else:
+            upstream.record_success()
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            limits = httpx.Limits(max_connections=None, max_keepalive_connections=POOL_SIZE)
+            client = httpx.AsyncClient(follow_redirects=True, limits=limits)
+            self._async_clients[loop] = client
+        return client
+
+    async def aget(self, url: str, deadline: Optional[Deadline] = None) -> Optional[httpx.Response]:
+        """get()의 비동기 버전 (같은 지연시간 통계와 타임아웃 정책 사용)"""
+        timeout = self.timeout_for(url, deadline)
+        if timeout <= 0 or not self._allow(url):
+            return None
+        started = time.monotonic()
+        try:
+            response = await self._async_client().get(url, timeout=timeout)
+        except httpx.HTTPError as e:
+            self._record_outcome(url, error=e)
+            return None
+        finally:
+            self.record(url, time.monotonic() - started)
+        self._record_outcome(url, status=response.status_code, size=len(response.content))
+        return response
+
+    def fetch_candidates(
+        self,
+        urls: List[str],
+        fetch_fn: Callable[[str], Optional[T]],
+        needed: int,
+        deadline: Optional[Deadline] = None,
+    ) -> List[Tuple[str, T]]:
+        """후보 URL들을 병렬로 가져오며, p95를 넘긴 요청은 다음 후보로 헤지한다.
+
+        needed 개를 확보하거나 후보/기한이 소진되면 그때까지의 결과를 후보 순서대로 반환.
+        """
+        if needed <= 0 or not urls:
+            return []
+
+        hedged = _HedgedFetch(self, urls, needed, deadline)
+        executor = ThreadPoolExecutor(max_workers=needed + MAX_HEDGES)
+        submit = partial(executor.submit, fetch_fn)
+        try:
+            hedged.fill(submit)
+            while hedged.running():
+                done, _ = wait(hedged.in_flight, timeout=hedged.wait_time(), return_when=FIRST_COMPLETED)
+                hedged.collect(done)
+                hedged.fill(submit)
+                hedged.hedge(submit)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return hedged.fetched()
+
+    async def afetch_candidates(
+        self,
+        urls: List[str],
+        fetch_fn: Callable[[str], Awaitable[Optional[T]]],
+        needed: int,
+        deadline: Optional[Deadline] = None,
+    ) -> List[Tuple[str, T]]:
+        """fetch_candidates()의 비동기 버전. 스레드 대신 이벤트 루프의 태스크로 헤지한다."""
+        if needed <= 0 or not urls:
+            return []
+
+        hedged = _HedgedFetch(self, urls, needed, deadline)
+
+        def submit(url: str) -> asyncio.Task:
+            return asyncio.ensure_future(fetch_fn(url))
+
+        try:
+            hedged.fill(submit)
+            while hedged.running():
+                done, _ = await asyncio.wait(
+                    list(hedged.in_flight), timeout=hedged.wait_time(), return_when=asyncio.FIRST_COMPLETED
+                )
+                hedged.collect(done)
+                hedged.fill(submit)
+                hedged.hedge(submit)
+        finally:
+            for task in hedged.in_flight:
+                task.cancel()
+        return hedged.fetched()
+
+
+class _HedgedFetch:
+    """fetch_candidates()/afetch_candidates()가 공유하는 후보 선택, 헤지, 기한 판단.
+
+    submit은 URL 하나를 받아 완료를 기다릴 수 있는 객체(Future 또는 Task)를 반환하며,
+    동기/비동기 버전은 제출 방식과 완료 대기만 다르다.
+    """
+
+    def __init__(self, policy: FetchPolicy, urls: List[str], needed: int, deadline: Optional[Deadline]):
+        self.policy = policy
+        self.urls = urls
+        self.needed = needed
+        self.deadline = deadline
+        self.pending = list(urls)
+        self.results: Dict[int, Any] = {}
+        self.in_flight: Dict[Any, list] = {}  # future -> [후보 순서, url, 시작 시각, 헤지 여부]
+
+    def _launch(self, submit: Callable[[str], Any]):
+        idx = len(self.urls) - len(self.pending)
+        url = self.pending.pop(0)
+        self.in_flight[submit(url)] = [idx, url, time.monotonic(), False]
+
+    def fill(self, submit: Callable[[str], Any]):
+        # 필요한 개수만큼 요청을 띄우고, 실패한 자리는 다음 후보로 채움
+        while self.pending and len(self.in_flight) + len(self.results) < self.needed:
+            self._launch(submit)
+
+    def running(self) -> bool:
+        if not self.in_flight or len(self.results) >= self.needed:
+            return False
+        if self.deadline and self.deadline.expired():
+            logging.warning("[FetchPolicy] 기한 초과 - 부분 결과 반환")
+            return False
+        return True
+
+    def wait_time(self) -> Optional[float]:
+        """다음 헤지 시점 또는 기한까지 남은 시간 (둘 다 없으면 None)"""
+        now = time.monotonic()
+        hedge_at = [
+            started + self.policy.hedge_delay(url) - now
+            for _, url, started, hedged in self.in_flight.values()
+            if not hedged
+        ]
+        wait_for = max(0.0, min(hedge_at)) if hedge_at and self.pending else None
+        remaining = self.deadline.remaining() if self.deadline else None
+        if remaining is not None:
+            wait_for = remaining if wait_for is None else min(wait_for, remaining)
+        return wait_for
+
+    def collect(self, done: Iterable[Any]):
+        for future in done:
+            idx, url, _, _ = self.in_flight.pop(future)
+            try:
+                content = future.result()
+            except Exception as e:
+                logging.debug(f"[FetchPolicy] 처리 실패 - {url} - {e}")
+                content = None
+            if content:
+                self.results[idx] = content
+
+    def hedge(self, submit: Callable[[str], Any]):
+        # p95를 넘긴 요청마다 다음 후보로 헤지 요청
+        now = time.monotonic()
+        for entry in list(self.in_flight.values()):
+            _, url, started, hedged = entry
+            if hedged or now - started < self.policy.hedge_delay(url):
+                continue
+            entry[3] = True
+            if self.pending and len(self.in_flight) < self.needed + MAX_HEDGES:
+                self._launch(submit)
+
+    def fetched(self) -> List[Tuple[str, Any]]:
+        return [(self.urls[idx], self.results[idx]) for idx in sorted(self.results)][: self.needed]
+
+
+# 에이전트 간에 도메인 통계를 공유하는 기본 정책
+fetch_policy = FetchPolicy()
@@ -0,0 +1,180 @@
+import json
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import yfinance as yf
+
+from utils.metrics import metrics
+from utils.resilience import upstreams
+
+CACHE_PATH = "results/cache/fundamentals.json"
+MAX_WORKERS = 8
+REPORT_LAG_DAYS = 45  # 분기 종료 후 실적 공시까지의 여유 기간
+ANNUAL_REPORT_LAG_DAYS = 90  # 연간 재무제표 공시 여유 기간
+
+STATEMENT_ROWS = {
+    "total_revenue": "Total Revenue",
+    "operating_income": "Operating Income",
+    "net_income": "Net Income",
+}
+INFO_FIELDS = {
+    "eps": "trailingEps",
+    "book_value": "bookValue",
+    "market_cap": "marketCap",
+}
+# 통화 코드는 숫자로 변환하지 않고 그대로 보관
+CURRENCY_FIELDS = {
+    "currency": "currency",
+    "financial_currency": "financialCurrency",
+}
+# 항목이 추가된 이전 형식의 캐시는 만료된 것으로 간주
+EXPECTED_FIELDS = {
+    "statements": set(STATEMENT_ROWS),
+    "info": set(INFO_FIELDS) | set(CURRENCY_FIELDS),
+}
+
+
+def _clean(value) -> Optional[float]:
+    # pandas/numpy 값과 NaN을 JSON에 저장 가능한 값으로 정리
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _next_quarter_end(day: date) -> date:
+    quarter_month = ((day.month - 1) // 3 + 1) * 3
+    if quarter_month == 12:
+        return date(day.year, 12, 31)
+    return date(day.year, quarter_month + 1, 1) - timedelta(days=1)
+
+
+def _expiry(candidate: date, today: date) -> str:
+    # 공시가 늦어져 기한이 이미 지났다면 하루 단위로 다시 확인
+    if candidate <= today:
+        candidate = today + timedelta(days=1)
+    return candidate.isoformat()
+
+
+class FundamentalsCache:
+    """재무제표/기본 지표를 회계 기간 경계까지 보관하는 로컬 캐시.
+
+    재무제표는 다음 연간 보고 시점, trailingEps/bookValue는 다음 분기 공시 시점까지 유효하다.
+    현재가는 매일 바뀌므로 보관하지 않고, 호출 측이 이미 받은 가격 데이터의 마지막 종가를 사용한다.
+    """
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            logging.warning(f"[FundamentalsCache] 캐시 로드 실패 - {e}")
+            return {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            # 샤드 워커 등 다른 프로세스가 기록한 티커를 덮어쓰지 않도록 병합
+            merged = {**self._load(), **self._entries}
+            data = json.dumps(merged, ensure_ascii=False)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            logging.error(f"[FundamentalsCache] 캐시 저장 실패 - {e}")
+
+    def _section(self, ticker: str, name: str, today: date) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            section = self._entries.get(ticker, {}).get(name)
+        if (
+            section
+            and section.get("expires_at", "") > today.isoformat()
+            and EXPECTED_FIELDS[name] <= set(section.get("values", {}))
+        ):
+            return section
+        return None
+
+    def _store(self, ticker: str, name: str, section: Dict[str, Any]):
+        with self._lock:
+            self._entries.setdefault(ticker, {})[name] = section
+
+    def _fetch_statements(self, stock: yf.Ticker, today: date) -> Dict[str, Any]:
+        financials = stock.financials
+        values = {
+            key: (_clean(financials.loc[row].iloc[0]) if row in financials.index else None)
+            for key, row in STATEMENT_ROWS.items()
+        }
+        if len(financials.columns):
+            period_end = financials.columns[0].date()
+            expires = period_end + timedelta(days=365 + ANNUAL_REPORT_LAG_DAYS)
+        else:
+            expires = _next_quarter_end(today) + timedelta(days=REPORT_LAG_DAYS)
+        return {"values": values, "expires_at": _expiry(expires, today)}
+
+    def _fetch_info(self, stock: yf.Ticker, today: date) -> Dict[str, Any]:
+        info = stock.info
+        values = {key: _clean(info.get(field)) for key, field in INFO_FIELDS.items()}
+        values.update({key: info.get(field) for key, field in CURRENCY_FIELDS.items()})
+
+        most_recent_quarter = info.get("mostRecentQuarter")
+        if most_recent_quarter:
+            last_quarter = datetime.utcfromtimestamp(most_recent_quarter).date()
+            expires = _next_quarter_end(last_quarter + timedelta(days=1))
+        else:
+            expires = _next_quarter_end(today)
+        expires += timedelta(days=REPORT_LAG_DAYS)
+
+        return {"values": values, "expires_at": _expiry(expires, today)}
+
+    def get(self, ticker: str) -> Dict[str, Optional[float]]:
+        """캐시가 유효하면 그대로, 만료된 항목만 원격에서 다시 가져온다"""
+        today = datetime.utcnow().date()
+        statements = self._section(ticker, "statements", today)
+        info = self._section(ticker, "info", today)
+        for name, section in (("statements", statements), ("info", info)):
+            metrics.cache(f"fundamentals_{name}", section is not None)
+
+        if statements is None or info is None:
+            stock = yf.Ticker(ticker)
+            yfinance = upstreams.get("yfinance")
+            if statements is None:
+                statements = yfinance.call(self._fetch_statements, stock, today)
+                self._store(ticker, "statements", statements)
+            if info is None:
+                info = yfinance.call(self._fetch_info, stock, today)
+                self._store(ticker, "info", info)
+        else:
+            logging.info(f"[FundamentalsCache] 캐시 사용 - {ticker}")
+
+        return {**statements["values"], **info["values"]}
+
+    def prefetch(self, tickers: List[str], max_workers: int = MAX_WORKERS) -> Dict[str, Any]:
+        """여러 티커의 기본 지표를 동시에 가져오고 캐시 파일을 한 번만 갱신"""
+        def fetch(ticker):
+            try:
+                return self.get(ticker)
+            except Exception as e:
+                logging.error(f"[FundamentalsCache] 조회 실패 - {ticker} - {e}")
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers)))) as executor:
+            results = dict(zip(tickers, executor.map(fetch, tickers)))
+        self.save()
+        return results
@@ -0,0 +1,228 @@
+import json
+import logging
+import os
+import threading
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from utils.metrics import metrics
+from utils.resilience import upstreams
+
+FX_CACHE_PATH = "results/cache/fx_rates.json"
+BASE_CURRENCY = "USD"
+COVERAGE_SLACK_DAYS = 5  # 주말/휴일로 인한 양 끝 누락 허용 범위
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
+# 보조 통화 단위 (예: 영국 펜스) -> (기준 통화, 배율)
+SUBUNITS = {"GBp": ("GBP", 0.01), "GBX": ("GBP", 0.01), "ZAc": ("ZAR", 0.01), "ILA": ("ILS", 0.01)}
+
+# 재무제표 통화(financialCurrency)와 가격 통화(currency)로 표시되는 항목
+FINANCIAL_FIELDS = ["total_revenue", "operating_income", "net_income", "eps", "book_value"]
+PRICE_FIELDS = ["current_price", "market_cap"]
+
+
+def _normalize(currency: Optional[str]):
+    if not currency:
+        return BASE_CURRENCY, 1.0
+    return SUBUNITS.get(currency, (currency.upper(), 1.0))
+
+
+class FxConverter:
+    """실행당 한 번의 일괄 요청으로 환율을 받아 로컬에 캐시하고 USD로 환산"""
+
+    def __init__(self, path: str = FX_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._rates: Dict[str, pd.Series] = self._load()
+
+    def _load(self) -> Dict[str, pd.Series]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except (IOError, ValueError) as e:
+            logging.warning(f"[FX] 환율 캐시 로드 실패 - {e}")
+            return {}
+        return {
+            currency: pd.Series(values, dtype=float).rename(index=pd.Timestamp).sort_index()
+            for currency, values in raw.items()
+        }
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            rates = dict(self._rates)
+        # 샤드 워커 등 다른 프로세스가 받은 통화/구간을 덮어쓰지 않도록 병합
+        merged = _merge_rates(rates, self._load())
+        data = {
+            currency: {ts.strftime("%Y-%m-%d"): float(v) for ts, v in series.dropna().items()}
+            for currency, series in merged.items()
+        }
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            logging.error(f"[FX] 환율 캐시 저장 실패 - {e}")
+
+    def refresh(self):
+        """다른 프로세스(샤드 워커)가 저장한 환율을 다시 읽어 반영"""
+        loaded = self._load()
+        with self._lock:
+            self._rates = _merge_rates(self._rates, loaded)
+
+    def _covers(self, currency: str, start: pd.Timestamp, end: pd.Timestamp) -> bool:
+        series = self._rates.get(currency)
+        if series is None or series.empty:
+            return False
+        slack = timedelta(days=COVERAGE_SLACK_DAYS)
+        return series.index[0] <= start + slack and series.index[-1] >= end - slack
+
+    def load_rates(self, currencies: Iterable[Optional[str]], start: str, end: str):
+        """필요한 통화 중 캐시에 없는 구간만 모아 한 번에 조회"""
+        start_ts, end_ts = pd.Timestamp(start), pd.Timestamp(end)
+        needed = {_normalize(c)[0] for c in currencies} - {BASE_CURRENCY}
+        missing = sorted(c for c in needed if not self._covers(c, start_ts, end_ts))
+        if missing:
+            # 동시에 실행 중인 다른 샤드가 이미 받은 통화면 다시 요청하지 않음
+            self.refresh()
+            missing = [c for c in missing if not self._covers(c, start_ts, end_ts)]
+        for currency in needed:
+            metrics.cache("fx", currency not in missing)
+        if not missing:
+            return
+
+        symbols = [f"{c}{BASE_CURRENCY}=X" for c in missing]
+        try:
+            data = upstreams.get("yfinance").call(
+                yf.download, symbols, start=start, end=end, progress=False, auto_adjust=False
+            )
+        except Exception as e:
+            logging.error(f"[FX] 환율 조회 실패 - {missing} - {e}")
+            return
+
+        if data.empty:
+            logging.warning(f"[FX] 환율 데이터 없음 - {missing}")
+            return
+        close = data["Close"]
+        if isinstance(close, pd.Series):
+            close = close.to_frame(symbols[0])
+        close.index = _naive_dates(close.index)
+
+        for currency, symbol in zip(missing, symbols):
+            if symbol not in close:
+                logging.warning(f"[FX] 환율 데이터 없음 - {symbol}")
+                continue
+            with self._lock:
+                self._rates = _merge_rates({currency: close[symbol].dropna()}, self._rates)
+        logging.info(f"[FX] 환율 일괄 조회 - {', '.join(symbols)}")
+        self._save()
+
+    def rate_series(self, currency: Optional[str], index: pd.Index) -> np.ndarray:
+        """주어진 날짜 인덱스에 맞춘 USD 환율 벡터 (휴장일은 직전 값 사용)"""
+        base, factor = _normalize(currency)
+        if base == BASE_CURRENCY:
+            return np.full(len(index), factor)
+        series = self._rates.get(base)
+        if series is None or series.empty:
+            return np.full(len(index), np.nan)
+        aligned = series.reindex(series.index.union(_naive_dates(index))).ffill().bfill()
+        return aligned.reindex(_naive_dates(index)).to_numpy() * factor
+
+    def latest_rate(self, currency: Optional[str]) -> float:
+        base, factor = _normalize(currency)
+        if base == BASE_CURRENCY:
+            return factor
+        series = self._rates.get(base)
+        if series is None or series.dropna().empty:
+            return np.nan
+        return float(series.dropna().iloc[-1]) * factor
+
+    def convert_panel(
+        self, panel: Dict[str, pd.DataFrame], currencies: Dict[str, Optional[str]]
+    ) -> Dict[str, pd.DataFrame]:
+        """티커별 가격 데이터의 OHLC 열을 날짜별 환율 벡터로 한 번에 환산"""
+        converted = {}
+        for ticker, frame in panel.items():
+            currency = currencies.get(ticker)
+            if _normalize(currency) == (BASE_CURRENCY, 1.0):
+                converted[ticker] = frame
+                continue
+            rates = self.rate_series(currency, frame.index)
+            if np.isnan(rates).all():
+                logging.warning(f"[FX] 환율 없음 - {ticker} ({currency}) 원 통화 유지")
+                converted[ticker] = frame
+                continue
+            frame = frame.copy()
+            columns = [c for c in PRICE_COLUMNS if c in frame]
+            frame[columns] = frame[columns].to_numpy() * rates[:, None]
+            converted[ticker] = frame
+        return converted
+
+    def convert_fundamentals(self, fundamentals: Dict[str, Any]) -> Dict[str, Any]:
+        """티커 × 항목 행렬에 통화별 최신 환율 벡터를 곱해 USD로 환산"""
+        tickers = [t for t, f in fundamentals.items() if isinstance(f, dict)]
+        if not tickers:
+            return fundamentals
+
+        def matrix(fields):
+            return np.array(
+                [[np.nan if fundamentals[t].get(k) is None else fundamentals[t][k] for k in fields] for t in tickers],
+                dtype=np.float64,
+            )
+
+        financial_rates = np.array([self.latest_rate(fundamentals[t].get("financial_currency")) for t in tickers])
+        price_rates = np.array([self.latest_rate(fundamentals[t].get("currency")) for t in tickers])
+        # 두 환율 중 하나라도 구하지 못한 티커는 재무/가격 항목 모두 원 통화로 남김
+        # (한쪽만 환산하면 PER/PBR이 서로 다른 통화로 계산됨)
+        missing = np.isnan(financial_rates) | np.isnan(price_rates)
+        financial_rates[missing] = 1.0
+        price_rates[missing] = 1.0
+        financial = matrix(FINANCIAL_FIELDS) * financial_rates[:, None]
+        price = matrix(PRICE_FIELDS) * price_rates[:, None]
+
+        converted = dict(fundamentals)
+        for i, ticker in enumerate(tickers):
+            values = dict(fundamentals[ticker])
+            for fields, block in ((FINANCIAL_FIELDS, financial), (PRICE_FIELDS, price)):
+                for j, key in enumerate(fields):
+                    values[key] = None if np.isnan(block[i, j]) else float(block[i, j])
+            reporting_currency = fundamentals[ticker].get("financial_currency") or BASE_CURRENCY
+            values["reporting_currency"] = reporting_currency
+            values["display_currency"] = reporting_currency if missing[i] else BASE_CURRENCY
+            values["price_display_currency"] = (
+                fundamentals[ticker].get("currency") or BASE_CURRENCY if missing[i] else BASE_CURRENCY
+            )
+            # 원 통화로 남긴 티커의 재무/가격 통화가 다르면 가격 대비 비율은 계산할 수 없음
+            values["mixed_currency"] = bool(missing[i]) and _normalize(
+                fundamentals[ticker].get("currency")
+            ) != _normalize(fundamentals[ticker].get("financial_currency"))
+            if missing[i]:
+                logging.warning(
+                    f"[FX] 환율 없음 - {ticker} 원 통화 유지 "
+                    f"(가격 {values['price_display_currency']}, 재무 {reporting_currency})"
+                )
+            converted[ticker] = values
+        return converted
+
+
+def _merge_rates(preferred: Dict[str, pd.Series], other: Dict[str, pd.Series]) -> Dict[str, pd.Series]:
+    """통화별 환율 시계열 병합 (같은 날짜는 preferred 값 우선)"""
+    merged = dict(other)
+    for currency, series in preferred.items():
+        previous = merged.get(currency)
+        merged[currency] = (series if previous is None else series.combine_first(previous)).sort_index()
+    return merged
+
+
+def _naive_dates(index: pd.Index) -> pd.DatetimeIndex:
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
@@ -0,0 +1,190 @@
+from dataclasses import dataclass, fields
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 지표 기본 파라미터
+SMA_WINDOW = 20
+EMA_SPAN = 20
+RSI_WINDOW = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_WINDOW, BOLLINGER_K = 20, 2.0
+ATR_WINDOW = 14
+BETA_WINDOW = 60
+
+
+@dataclass
+class IndicatorSet:
+    """(날짜 × 티커) float32 배열로 보관하는 기술적 지표 묶음"""
+
+    sma: np.ndarray
+    ema: np.ndarray
+    rsi: np.ndarray
+    macd: np.ndarray
+    macd_signal: np.ndarray
+    macd_hist: np.ndarray
+    bollinger_upper: np.ndarray
+    bollinger_lower: np.ndarray
+    atr: np.ndarray
+    beta: np.ndarray
+
+    def latest(self) -> Dict[str, np.ndarray]:
+        """지표별로 티커마다 마지막 유효값(1차원 배열)을 반환"""
+        return {f.name: _last_valid(getattr(self, f.name)) for f in fields(self)}
+
+    def snapshot(self, tickers: List[str]) -> Dict[str, Dict[str, Optional[float]]]:
+        """리포트용으로 티커별 최신 지표를 dict로 변환"""
+        latest = self.latest()
+        return {
+            ticker: {
+                name: (None if np.isnan(values[i]) else round(float(values[i]), 4))
+                for name, values in latest.items()
+            }
+            for i, ticker in enumerate(tickers)
+        }
+
+
+def _last_valid(values: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(values)
+    last_idx = values.shape[0] - 1 - np.argmax(valid[::-1], axis=0)
+    result = values[last_idx, np.arange(values.shape[1])]
+    result[~valid.any(axis=0)] = np.nan
+    return result
+
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    """휴장일 등으로 비어 있는 값을 직전 값으로 채움 (티커별, 벡터 연산)"""
+    mask = np.isnan(values)
+    idx = np.where(~mask, np.arange(values.shape[0])[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    filled = values[idx, np.arange(values.shape[1])]
+    filled[mask & (idx == 0) & np.isnan(values[0])] = np.nan
+    return filled
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """누적합 차분으로 계산한 이동합 (창 안에 NaN이 있거나 덜 찬 구간은 NaN)"""
+    valid = ~np.isnan(values)
+    csum = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    ccount = np.cumsum(valid, axis=0)
+    out = np.full(values.shape, np.nan)
+    if values.shape[0] < window:
+        return out
+    out[window - 1] = csum[window - 1]
+    out[window:] = csum[window:] - csum[:-window]
+    counts = ccount.copy()
+    counts[window:] = ccount[window:] - ccount[:-window]
+    out[counts < window] = np.nan
+    return out
+
+
+def sma(values: np.ndarray, window: int = SMA_WINDOW) -> np.ndarray:
+    return rolling_sum(values, window) / window
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    mean = sma(values, window)
+    mean_sq = rolling_sum(values * values, window) / window
+    return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+
+def ewm(values: np.ndarray, alpha: float) -> np.ndarray:
+    """지수 가중 평균. 시간 축만 순회하고 티커 축은 벡터 연산으로 처리"""
+    out = np.empty_like(values)
+    prev = values[0].copy()
+    out[0] = prev
+    for t in range(1, values.shape[0]):
+        current = values[t]
+        prev = np.where(np.isnan(prev), current, prev + alpha * (current - prev))
+        out[t] = prev
+    return out
+
+
+def ema(values: np.ndarray, span: int = EMA_SPAN) -> np.ndarray:
+    return ewm(values, 2.0 / (span + 1))
+
+
+def rsi(close: np.ndarray, window: int = RSI_WINDOW) -> np.ndarray:
+    delta = np.diff(close, axis=0, prepend=np.nan)
+    gain = np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None))
+    loss = np.where(np.isnan(delta), np.nan, np.clip(-delta, 0, None))
+    # Wilder 평활 (alpha = 1/window)
+    avg_gain = ewm(gain, 1.0 / window)
+    avg_loss = ewm(loss, 1.0 / window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        out = 100.0 - 100.0 / (1.0 + rs)
+    out[avg_loss == 0] = 100.0
+    out[:window] = np.nan
+    return out
+
+
+def macd(close: np.ndarray, fast: int = MACD_FAST, slow: int = MACD_SLOW, signal: int = MACD_SIGNAL):
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close: np.ndarray, window: int = BOLLINGER_WINDOW, k: float = BOLLINGER_K):
+    mid = sma(close, window)
+    band = k * rolling_std(close, window)
+    return mid + band, mid - band
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = ATR_WINDOW) -> np.ndarray:
+    prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    true_range = np.fmax(
+        high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close))
+    )
+    return ewm(true_range, 1.0 / window)
+
+
+def returns(close: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.diff(close, axis=0, prepend=np.nan) / np.vstack([close[:1], close[:-1]])
+
+
+def rolling_beta(asset_returns: np.ndarray, benchmark_returns: np.ndarray, window: int = BETA_WINDOW) -> np.ndarray:
+    """벤치마크 대비 이동 베타 = cov(r_i, r_b) / var(r_b), 누적합으로 한 번에 계산"""
+    r = np.nan_to_num(asset_returns)
+    b = np.nan_to_num(benchmark_returns).reshape(-1, 1)
+    mean_r = rolling_sum(r, window) / window
+    mean_b = rolling_sum(b, window) / window
+    cov = rolling_sum(r * b, window) / window - mean_r * mean_b
+    var = rolling_sum(b * b, window) / window - mean_b * mean_b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(var > 0, cov / var, np.nan)
+
+
+def compute_indicators(
+    close: np.ndarray,
+    high: Optional[np.ndarray] = None,
+    low: Optional[np.ndarray] = None,
+    benchmark_close: Optional[np.ndarray] = None,
+) -> IndicatorSet:
+    """(날짜 × 티커) 가격 배열 전체에 대해 지표를 한 번에 계산"""
+    close = forward_fill(np.asarray(close, dtype=np.float64))
+    high = close if high is None else forward_fill(np.asarray(high, dtype=np.float64))
+    low = close if low is None else forward_fill(np.asarray(low, dtype=np.float64))
+
+    macd_line, macd_signal, macd_hist = macd(close)
+    upper, lower = bollinger(close)
+    if benchmark_close is None:
+        beta = np.full_like(close, np.nan)
+    else:
+        bench = forward_fill(np.asarray(benchmark_close, dtype=np.float64).reshape(-1, 1))
+        beta = rolling_beta(returns(close), returns(bench)[:, 0])
+
+    values = dict(
+        sma=sma(close),
+        ema=ema(close),
+        rsi=rsi(close),
+        macd=macd_line,
+        macd_signal=macd_signal,
+        macd_hist=macd_hist,
+        bollinger_upper=upper,
+        bollinger_lower=lower,
+        atr=atr(high, low, close),
+        beta=beta,
+    )
+    return IndicatorSet(**{name: arr.astype(np.float32) for name, arr in values.items()})
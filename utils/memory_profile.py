@@ -0,0 +1,217 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:  # 없으면 /proc 또는 getrusage로 RSS를 읽음
+    psutil = None
+
+ENABLED = os.getenv("MEMORY_PROFILE", "0") == "1"  # 노드별 메모리 프로파일링 사용 여부
+TRACE_FRAMES = int(os.getenv("MEMORY_PROFILE_FRAMES", "1"))  # 할당 위치마다 기록할 호출 스택 깊이
+TOP_SITES = 10  # 노드별로 보고할 할당 위치 수
+RSS_SAMPLE_INTERVAL = 0.05  # 노드 실행 중 RSS 샘플링 간격(초)
+REPORT_DIR = "results/memory"
+
+MB = 1024 * 1024
+# 프로파일러 자체(샘플링 스레드 포함)와 임포트 과정의 할당은 보고에서 제외
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, threading.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes() -> int:
+    """현재 프로세스의 RSS (psutil → /proc → 최대 RSS 순으로 대체)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # getrusage는 현재값이 아닌 최대 RSS만 제공 (macOS는 바이트, Linux는 KB)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _RssSampler:
+    """노드 실행 동안 별도 스레드에서 RSS 최대값을 기록"""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self) -> "_RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+def _top_sites(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, limit: int) -> List[Dict[str, Any]]:
+    stats = after.filter_traces(_IGNORED).compare_to(before.filter_traces(_IGNORED), "traceback")
+    stats = sorted((s for s in stats if s.size_diff > 0), key=lambda s: s.size_diff, reverse=True)
+    return [
+        {
+            "site": " <- ".join(f"{frame.filename}:{frame.lineno}" for frame in stat.traceback),
+            "size_diff_mb": round(stat.size_diff / MB, 3),
+            "count_diff": stat.count_diff,
+        }
+        for stat in stats[:limit]
+    ]
+
+
+def _state_bytes(result: Any) -> Optional[int]:
+    # 노드가 돌려준 상태의 직렬화 크기 (상태가 커지는 추세 확인용)
+    if hasattr(result, "json"):
+        try:
+            return len(result.json().encode("utf-8"))
+        except Exception:
+            return None
+    return None
+
+
+class MemoryProfiler:
+    """그래프 노드를 감싸 tracemalloc 스냅샷과 RSS 샘플로 노드별 메모리 사용을 기록.
+
+    tracemalloc은 프로세스 전역이라 겹쳐 실행되는 작업의 할당과 해제가 서로의 수치에 섞이므로,
+    awrap()으로 감싼 작업은 이벤트 루프마다 한 번에 하나씩 실행한다. 임계 경로 스케줄러나
+    서비스에서 MEMORY_PROFILE=1이면 작업이 직렬화되어 실행 시간과 임계 경로는 실제보다 길어진다.
+    샤드/차트 워커 프로세스의 메모리는 포함하지 않는다.
+    """
+
+    def __init__(self, top_sites: int = TOP_SITES, frames: int = TRACE_FRAMES):
+        self.top_sites = top_sites
+        self.frames = frames
+        self.reports: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # asyncio.Lock은 이벤트 루프에 묶이므로 루프마다 하나씩 만든다
+        self._async_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _serial(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            lock = self._async_locks.get(loop)
+            if lock is None:
+                lock = self._async_locks[loop] = asyncio.Lock()
+        return lock
+
+    def _start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        return tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()[0], rss_bytes()
+
+    def _finish(self, name: str, started: float, baseline, sampler: _RssSampler, result: Any):
+        before, traced_before, rss_before = baseline
+        traced_after, traced_peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        rss_after = rss_bytes()
+        report = {
+            "node": name,
+            "seconds": round(time.perf_counter() - started, 3),
+            "peak_mb": round((traced_peak - traced_before) / MB, 3),
+            "net_mb": round((traced_after - traced_before) / MB, 3),
+            "rss_before_mb": round(rss_before / MB, 1),
+            "rss_peak_mb": round(sampler.peak / MB, 1),
+            "rss_after_mb": round(rss_after / MB, 1),
+            "state_bytes": _state_bytes(result),
+            "top_sites": _top_sites(before, after, self.top_sites),
+        }
+        with self._lock:
+            self.reports.append(report)
+        logging.info(
+            f"[Memory] {name} - 최대 +{report['peak_mb']:.1f}MB, 순증가 {report['net_mb']:+.1f}MB, "
+            f"RSS {report['rss_before_mb']:.0f} → {report['rss_peak_mb']:.0f}(최대) → {report['rss_after_mb']:.0f}MB"
+        )
+        for site in report["top_sites"][:3]:
+            logging.info(f"[Memory]   {site['size_diff_mb']:+.2f}MB ({site['count_diff']:+d}) {site['site']}")
+
+    def wrap(self, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            baseline = self._start()
+            result = None
+            with _RssSampler() as sampler:
+                try:
+                    result = fn(*args, **kwargs)
+                finally:
+                    self._finish(name, started, baseline, sampler, result)
+            return result
+
+        return wrapper
+
+    def awrap(self, name: str, afn: Callable[..., Any]) -> Callable[..., Any]:
+        """wrap()의 비동기 버전 (to_thread로 넘긴 작업의 할당도 같은 프로세스이므로 포함).
+
+        다른 프로파일 대상 작업이 실행 중이면 끝날 때까지 기다린 뒤 기준점을 잡는다.
+        """
+
+        @functools.wraps(afn)
+        async def wrapper(*args, **kwargs):
+            async with self._serial():
+                started = time.perf_counter()
+                baseline = self._start()
+                result = None
+                with _RssSampler() as sampler:
+                    try:
+                        result = await afn(*args, **kwargs)
+                    finally:
+                        self._finish(name, started, baseline, sampler, result)
+                return result
+
+        return wrapper
+
+    def save(self, directory: str = REPORT_DIR) -> Optional[str]:
+        """수집한 노드별 보고를 JSON으로 저장하고 경로를 반환 (기록이 없으면 None)"""
+        with self._lock:
+            reports = list(self.reports)
+        if not reports:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"memory_{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"frames": self.frames, "nodes": reports}, f, ensure_ascii=False, indent=2)
+        logging.info(f"[Memory] 노드별 메모리 보고 저장 - {path}")
+        return path
+
+
+memory_profiler = MemoryProfiler()
+
+
+def profiled_async(name: str, arun: Callable[..., Any]) -> Callable[..., Any]:
+    """MEMORY_PROFILE=1이면 비동기 함수를 프로파일러로 감싸서 반환 (그래프 노드와 스케줄러 작업 공통)"""
+    return memory_profiler.awrap(name, arun) if ENABLED else arun
+
+
+def profiled(name: str, run: Callable[..., Any], arun: Callable[..., Any]):
+    """MEMORY_PROFILE=1이면 노드의 동기/비동기 함수를 프로파일러로 감싸서 반환"""
+    if not ENABLED:
+        return run, arun
+    return memory_profiler.wrap(name, run), profiled_async(name, arun)
@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+METRICS_DIR = "results/metrics"
+METRICS_FORMATS = os.getenv("METRICS_FORMAT", "prometheus,json")  # 실행 종료 시 내보낼 형식
+PREFIX = "evmarket_"
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # 초
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 4e6)
+
+# 모델별 1M 토큰당 가격(USD): 입력, 캐시된 입력, 출력
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+}
+
+METRIC_HELP = {
+    "llm_requests_total": "chat.completions.create 성공 응답 수",
+    "llm_prompt_tokens_total": "입력 토큰 수",
+    "llm_completion_tokens_total": "출력 토큰 수",
+    "llm_cached_prompt_tokens_total": "프롬프트 캐시에서 처리된 입력 토큰 수",
+    "llm_cost_usd_total": "MODEL_PRICES 기준 추정 비용(USD)",
+    "llm_request_seconds": "LLM 호출 지연시간(초)",
+    "upstream_requests_total": "상위 서비스 호출 시도 수 (재시도 포함)",
+    "upstream_request_seconds": "상위 서비스 호출 시도별 지연시간(초)",
+    "fetch_requests_total": "기사 본문 요청 수",
+    "fetch_seconds": "기사 본문 요청 지연시간(초)",
+    "fetch_response_bytes": "기사 본문 응답 크기(바이트)",
+    "cache_requests_total": "캐시 조회 수 (result=hit|miss)",
+    "pipeline_queue_depth": "스트리밍 파이프라인 단계별 입력 큐 깊이 (항목을 넣을 때마다 기록)",
+    "pipeline_items_total": "스트리밍 파이프라인 단계별 처리 건수 (result=processed|errors)",
+    "task_seconds": "스케줄러 작업별 실행 시간(초)",
+    "critical_path_seconds": "실행별 임계 경로 길이(초)",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _model_price(model: str) -> Optional[Tuple[float, float, float]]:
+    # "gpt-4o-2024-08-06"처럼 버전이 붙은 이름은 가장 긴 접두사로 찾음
+    matches = [name for name in MODEL_PRICES if model.startswith(name)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+class Metrics:
+    """프로세스 내 카운터/히스토그램 저장소.
+
+    snapshot()은 JSON으로 직렬화 가능한 형태이며, 샤드 워커 프로세스의 값은
+    drain()으로 꺼내 부모 프로세스에서 merge()로 합친다.
+    """
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = {
+                    "buckets": list(buckets),
+                    "counts": [0] * (len(buckets) + 1),  # 마지막 칸은 +Inf
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            hist["counts"][bisect_left(hist["buckets"], value)] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def record_completion(self, agent: str, model: str, usage: Any, seconds: float):
+        """chat.completions 응답의 usage로 토큰/비용/지연시간/프롬프트 캐시 적중을 기록"""
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+        labels = {"agent": agent, "model": model}
+
+        self.inc("llm_requests_total", **labels)
+        self.inc("llm_prompt_tokens_total", prompt, **labels)
+        self.inc("llm_completion_tokens_total", completion, **labels)
+        self.inc("llm_cached_prompt_tokens_total", cached, **labels)
+        self.observe("llm_request_seconds", seconds, **labels)
+        self.inc("cache_requests_total", cache="openai_prompt", result="hit" if cached else "miss")
+
+        price = _model_price(model)
+        if price is not None:
+            input_price, cached_price, output_price = price
+            cost = ((prompt - cached) * input_price + cached * cached_price + completion * output_price) / 1e6
+            self.inc("llm_cost_usd_total", cost, **labels)
+
+    def cache(self, cache: str, hit: bool):
+        self.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "buckets": list(hist["buckets"]),
+                    "counts": list(hist["counts"]),
+                    "sum": hist["sum"],
+                    "count": hist["count"],
+                }
+                for (name, labels), hist in sorted(self._histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def drain(self) -> Dict[str, List[Dict[str, Any]]]:
+        """현재 값을 꺼내고 비움 (재사용되는 워커 프로세스에서 중복 집계 방지)"""
+        snapshot = self.snapshot()
+        self.reset()
+        return snapshot
+
+    def merge(self, snapshot: Dict[str, List[Dict[str, Any]]]):
+        for item in snapshot.get("counters", []):
+            self.inc(item["name"], item["value"], **item["labels"])
+        with self._lock:
+            for item in snapshot.get("histograms", []):
+                key = (item["name"], _label_key(item["labels"]))
+                hist = self._histograms.get(key)
+                if hist is None:
+                    self._histograms[key] = {
+                        "buckets": list(item["buckets"]),
+                        "counts": list(item["counts"]),
+                        "sum": item["sum"],
+                        "count": item["count"],
+                    }
+                    continue
+                hist["counts"] = [a + b for a, b in zip(hist["counts"], item["counts"])]
+                hist["sum"] += item["sum"]
+                hist["count"] += item["count"]
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_prometheus(self) -> str:
+        """Prometheus 텍스트 노출 형식 (node_exporter textfile 수집기에서 읽을 수 있음)"""
+        snapshot = self.snapshot()
+        lines: List[str] = []
+        described = set()
+
+        def describe(name: str, kind: str):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {PREFIX}{name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        for item in snapshot["counters"]:
+            describe(item["name"], "counter")
+            labels = _label_key(item["labels"])
+            lines.append(f"{PREFIX}{item['name']}{_format_labels(labels)} {_format_value(item['value'])}")
+
+        for item in snapshot["histograms"]:
+            name = item["name"]
+            describe(name, "histogram")
+            labels = _label_key(item["labels"])
+            cumulative = 0
+            for bound, count in zip(item["buckets"] + ["+Inf"], item["counts"]):
+                cumulative += count
+                le = bound if bound == "+Inf" else _format_value(bound)
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, (('le', le),))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {_format_value(item['sum'])}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {item['count']}")
+        return "\n".join(lines) + "\n"
+
+    def llm_totals(self) -> Dict[str, Dict[str, float]]:
+        """에이전트별 토큰/비용 합계 (로그 요약용)"""
+        totals: Dict[str, Dict[str, float]] = {}
+        for item in self.snapshot()["counters"]:
+            if item["name"].startswith("llm_") and "agent" in item["labels"]:
+                agent = totals.setdefault(item["labels"]["agent"], {})
+                field = item["name"][len("llm_") : -len("_total")]
+                agent[field] = round(agent.get(field, 0.0) + item["value"], 6)
+        return totals
+
+    def export(self, directory: str = METRICS_DIR, formats: str = METRICS_FORMATS) -> Dict[str, str]:
+        """실행 종료 시 스냅샷을 실행별 파일과 latest 파일로 저장"""
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        writers = {
+            "prometheus": (".prom", self.to_prometheus),
+            "json": (".json", lambda: json.dumps(
+                {"generated_at": time.time(), **self.snapshot()}, ensure_ascii=False, indent=2
+            )),
+        }
+        paths = {}
+        for fmt in (f.strip().lower() for f in formats.split(",")):
+            if fmt not in writers:
+                logging.warning(f"[Metrics] 지원하지 않는 형식 - {fmt}")
+                continue
+            extension, render = writers[fmt]
+            content = render()
+            for name in (f"metrics_{stamp}", "latest"):
+                path = os.path.join(directory, name + extension)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(content)
+                # 수집기가 쓰다 만 파일을 읽지 않도록 교체
+                os.replace(tmp_path, path)
+            paths[fmt] = os.path.join(directory, f"metrics_{stamp}{extension}")
+            logging.info(f"[Metrics] {fmt} 내보내기 완료 - {paths[fmt]}")
+        return paths
+
+
+metrics = Metrics()
@@ -0,0 +1,216 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from PIL import Image as PILImage
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, StyleSheet1, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer
+
+from utils.metrics import metrics
+from utils.report_formats import REPORT_TITLE, layout_blocks
+
+FONT_PATH = r"C:/Windows/Fonts/malgun.ttf"
+PDF_FONT_NAME = "MalgunGothic"
+FALLBACK_FONT_NAME = "Helvetica"
+IMAGE_CACHE_DIR = "results/cache/pdf_images"
+IMAGE_DPI = 150  # PDF에 넣는 차트 이미지 해상도 (None이면 원본 그대로 사용)
+REPORT_CACHE_DIR = "results/cache/report_pdfs"
+MAX_CACHED_REPORTS = 20
+CHART_WIDTH, CHART_HEIGHT = 440, 260  # pt
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending: List[Future] = []
+
+
+@lru_cache(maxsize=None)
+def font_name() -> str:
+    """한글 폰트를 프로세스당 한 번만 등록 (없으면 기본 폰트 사용)"""
+    if not os.path.exists(FONT_PATH):
+        logging.warning(f"[PDF] 폰트 없음 - {FONT_PATH}, {FALLBACK_FONT_NAME} 사용")
+        return FALLBACK_FONT_NAME
+    pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, FONT_PATH))
+    return PDF_FONT_NAME
+
+
+@lru_cache(maxsize=None)
+def stylesheet() -> StyleSheet1:
+    """리포트 스타일시트를 프로세스당 한 번만 생성"""
+    font = font_name()
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name="Korean", fontName=font, fontSize=12, leading=18, spaceAfter=12))
+    styles.add(
+        ParagraphStyle(
+            name="CustomTitle", fontName=font, fontSize=18, leading=24, spaceAfter=20, alignment=1
+        )
+    )
+    styles.add(ParagraphStyle(name="ChartCaption", fontName=font, fontSize=10, leading=14))
+    return styles
+
+
+@lru_cache(maxsize=256)
+def _scaled_image(path: str, mtime_ns: int, width: int, height: int, dpi: Optional[int]) -> str:
+    # 원본 경로/수정 시각/출력 크기가 같으면 디스크에 남은 축소본을 재사용
+    key = hashlib.sha256(f"{os.path.abspath(path)}|{mtime_ns}|{width}|{height}|{dpi}".encode()).hexdigest()[:16]
+    cached_path = os.path.join(IMAGE_CACHE_DIR, f"{key}.png")
+    if os.path.exists(cached_path):
+        metrics.cache("pdf_image", True)
+        return cached_path
+    metrics.cache("pdf_image", False)
+
+    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cached_path}.{os.getpid()}.tmp.png"
+    with PILImage.open(path) as img:
+        img = img.convert("RGB")
+        if dpi:
+            target = (round(width / 72 * dpi), round(height / 72 * dpi))
+            if img.width > target[0] or img.height > target[1]:
+                img = img.resize(target, PILImage.LANCZOS)
+        img.save(tmp_path, format="PNG")
+    os.replace(tmp_path, cached_path)
+    return cached_path
+
+
+def prepare_image(
+    path: str, width: int = CHART_WIDTH, height: int = CHART_HEIGHT, dpi: Optional[int] = IMAGE_DPI
+) -> str:
+    """차트 이미지를 출력 크기 × dpi에 맞춰 RGB로 한 번만 축소하고 캐시 경로를 반환"""
+    if dpi is None and path.lower().endswith(".png"):
+        return path
+    try:
+        args = (path, os.stat(path).st_mtime_ns, width, height, dpi)
+        cached_path = _scaled_image(*args)
+        if not os.path.exists(cached_path):
+            # 캐시 디렉터리가 정리되어 축소본이 사라졌으면 메모리 캐시를 비우고 다시 만듦
+            _scaled_image.cache_clear()
+            cached_path = _scaled_image(*args)
+        return cached_path
+    except Exception as e:
+        logging.warning(f"[PDF] 이미지 변환 실패: {path} - {e}")
+        return path
+
+
+def build_pdf(
+    filepath: str,
+    report_text: str,
+    chart_metadata: Optional[Dict[str, dict]] = None,
+    dpi: Optional[int] = IMAGE_DPI,
+) -> str:
+    styles = stylesheet()
+    # 중단된 빌드가 완성된 리포트처럼 남지 않도록 임시 파일에 쓴 뒤 교체
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    doc = SimpleDocTemplate(
+        tmp_path,
+        pagesize=A4,
+        leftMargin=50,
+        rightMargin=50,
+        topMargin=50,
+        bottomMargin=50,
+    )
+
+    elements = [Paragraph(REPORT_TITLE, styles["CustomTitle"]), Spacer(1, 20)]
+    for kind, value in layout_blocks(report_text, chart_metadata):
+        if kind == "paragraph":
+            elements.append(Paragraph(value.replace("\n", "<br/>"), styles["Korean"]))
+            elements.append(Spacer(1, 14))
+            continue
+        elements.append(Spacer(1, 16))
+        elements.append(Image(prepare_image(value["file_path"], dpi=dpi), width=CHART_WIDTH, height=CHART_HEIGHT))
+        elements.append(Spacer(1, 6))
+        elements.append(
+            Paragraph(
+                f"그림 설명: {value['description']}<br/>출처: {value['source']}",
+                styles["ChartCaption"],
+            )
+        )
+        elements.append(Spacer(1, 16))
+
+    doc.build(elements)
+    os.replace(tmp_path, filepath)
+    logging.info(f"[PDF] 리포트 저장 완료 - {filepath}")
+    return filepath
+
+
+def _copy_atomic(src: str, dst: str):
+    tmp_path = f"{dst}.{os.getpid()}.tmp"
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def _prune_report_cache(keep: int = MAX_CACHED_REPORTS):
+    # 최근에 쓰인 순서로 keep개만 남김
+    paths = sorted(
+        (os.path.join(REPORT_CACHE_DIR, name) for name in os.listdir(REPORT_CACHE_DIR) if name.endswith(".pdf")),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def build_report_pdf(
+    filepath: str,
+    report_text: str,
+    chart_metadata: Optional[Dict[str, dict]] = None,
+    dpi: Optional[int] = IMAGE_DPI,
+) -> str:
+    """본문/차트/해상도가 같은 PDF를 이미 만들었으면 복사하고, 아니면 build_pdf()로 만들어 보관"""
+    key = hashlib.sha256(
+        json.dumps(
+            {"text": report_text, "charts": chart_metadata or {}, "dpi": dpi, "font": font_name()},
+            sort_keys=True,
+            ensure_ascii=False,
+        ).encode("utf-8")
+    ).hexdigest()[:16]
+    cached_path = os.path.join(REPORT_CACHE_DIR, f"{key}.pdf")
+    if os.path.exists(cached_path):
+        metrics.cache("report_pdf", True)
+        _copy_atomic(cached_path, filepath)
+        os.utime(cached_path)
+        logging.info(f"[PDF] 변경된 섹션이 없어 이전 PDF 재사용 - {filepath}")
+        return filepath
+    metrics.cache("report_pdf", False)
+
+    build_pdf(filepath, report_text, chart_metadata, dpi)
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    _copy_atomic(filepath, cached_path)
+    _prune_report_cache()
+    return filepath
+
+
+def build_pdf_in_background(
+    filepath: str, report_text: str, chart_metadata: Optional[Dict[str, dict]] = None
+) -> Future:
+    """상주 워커 프로세스에서 PDF를 만든다 (폰트/스타일 캐시는 워커에 유지)"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=1)
+    future = _executor.submit(build_report_pdf, filepath, report_text, chart_metadata)
+    _pending.append(future)
+    return future
+
+
+def wait_for_pending_builds(timeout: Optional[float] = None) -> List[str]:
+    """백그라운드 PDF 빌드가 모두 끝날 때까지 기다리고 완료된 경로를 반환"""
+    completed = []
+    while _pending:
+        future = _pending.pop(0)
+        try:
+            completed.append(future.result(timeout=timeout))
+        except Exception as e:
+            logging.error(f"[PDF] 백그라운드 빌드 실패 - {e}")
+    return completed
+
+
+atexit.register(wait_for_pending_builds)
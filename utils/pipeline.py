@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import queue
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+from utils.fetch_policy import Deadline
+from utils.metrics import metrics
+
+QUEUE_SIZE = 16  # 단계 사이 큐의 최대 길이 (가득 차면 앞 단계가 대기)
+QUEUE_DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32)
+POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+
+class Stage:
+    """파이프라인 한 단계.
+
+    fn은 입력 하나를 받아 결과 하나(None이면 버림)를 반환하며,
+    fan_out=True이면 여러 결과를 담은 iterable을 반환한다.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        workers: int = 1,
+        queue_size: int = QUEUE_SIZE,
+        fan_out: bool = False,
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+        self.fan_out = fan_out
+
+
+class _PipelineStats:
+    """단계별 입력 큐 깊이와 처리/실패 건수 (utils.metrics에도 pipeline/stage 레이블로 기록)"""
+
+    def __init__(self, stages: List[Stage], name: str):
+        self.stages = stages
+        self.name = name
+        self._lock = threading.Lock()
+        self._queues: list = []
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.completed = False  # 마지막 실행이 기한 초과 없이 모든 입력을 처리했는지 여부
+
+    def _reset_stats(self):
+        self.completed = False
+        self._stats = {
+            stage.name: {"processed": 0, "errors": 0, "max_queue_depth": 0}
+            for stage in self.stages
+        }
+
+    def _record_depth(self, stage_name: Optional[str], depth: int):
+        # 최종 출력 큐(stage_name=None)는 소비자가 비우므로 기록하지 않음
+        if not stage_name:
+            return
+        with self._lock:
+            stats = self._stats[stage_name]
+            stats["max_queue_depth"] = max(stats["max_queue_depth"], depth)
+        metrics.observe(
+            "pipeline_queue_depth", depth, buckets=QUEUE_DEPTH_BUCKETS, pipeline=self.name, stage=stage_name
+        )
+
+    def _count(self, stage_name: str, key: str):
+        with self._lock:
+            self._stats[stage_name][key] += 1
+        metrics.inc("pipeline_items_total", pipeline=self.name, stage=stage_name, result=key)
+
+    def metrics(self) -> Dict[str, Dict[str, int]]:
+        """단계별 입력 큐 깊이(현재/최대)와 처리/실패 건수"""
+        with self._lock:
+            snapshot = {name: dict(stats) for name, stats in self._stats.items()}
+        for stage, q in zip(self.stages, self._queues):
+            snapshot[stage.name]["queue_depth"] = q.qsize()
+        return snapshot
+
+
+class StreamingPipeline(_PipelineStats):
+    """bounded queue로 연결된 단계별 스레드 풀 파이프라인.
+
+    각 단계는 자체 동시성으로 동작하고, 뒤 단계가 밀리면 큐가 차서 앞 단계가
+    멈추므로 처리 대상 규모와 관계없이 메모리 사용량이 일정하게 유지된다.
+    """
+
+    def __init__(self, stages: List[Stage], name: str = "pipeline"):
+        super().__init__(stages, name)
+
+    def _put(self, q: queue.Queue, item: Any, stop: threading.Event, stage_name: Optional[str]) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=POLL_INTERVAL)
+            except queue.Full:
+                continue
+            self._record_depth(stage_name, q.qsize())
+            return True
+        return False
+
+    def _get(self, q: queue.Queue, stop: threading.Event) -> Any:
+        while not stop.is_set():
+            try:
+                return q.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def run(self, source: Iterable[Any], deadline: Optional[Deadline] = None) -> Iterator[Any]:
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        self._queues.append(queue.Queue(maxsize=QUEUE_SIZE))  # 최종 출력
+        self._reset_stats()
+        stop = threading.Event()
+        names = [stage.name for stage in self.stages] + [None]
+        remaining = [stage.workers for stage in self.stages]
+
+        def feed():
+            for item in source:
+                if not self._put(self._queues[0], item, stop, names[0]):
+                    return
+            self._put(self._queues[0], _DONE, stop, None)
+
+        def work(idx: int):
+            stage = self.stages[idx]
+            inbox, outbox = self._queues[idx], self._queues[idx + 1]
+            while True:
+                item = self._get(inbox, stop)
+                if item is _DONE:
+                    with self._lock:
+                        remaining[idx] -= 1
+                        last = remaining[idx] == 0
+                    # 같은 단계의 다른 워커도 종료하도록 되돌려 놓고, 마지막 워커만 다음 단계에 전달
+                    self._put(outbox if last else inbox, _DONE, stop, None)
+                    return
+                try:
+                    output = stage.fn(item)
+                    outputs = (output or ()) if stage.fan_out else (output,)
+                    for out in outputs:
+                        if out is not None and not self._put(outbox, out, stop, names[idx + 1]):
+                            return
+                    key = "processed"
+                except Exception as e:
+                    logging.error(f"[Pipeline] {stage.name} 단계 실패 - {e}")
+                    key = "errors"
+                self._count(stage.name, key)
+
+        threads = [threading.Thread(target=feed, daemon=True)]
+        for idx, stage in enumerate(self.stages):
+            threads.extend(
+                threading.Thread(target=work, args=(idx,), daemon=True)
+                for _ in range(stage.workers)
+            )
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                if deadline and deadline.expired():
+                    logging.warning("[Pipeline] 기한 초과 - 부분 결과 반환")
+                    break
+                try:
+                    item = self._queues[-1].get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    self.completed = True
+                    break
+                yield item
+        finally:
+            stop.set()
+
+
+class AsyncStreamingPipeline(_PipelineStats):
+    """StreamingPipeline의 asyncio 버전. Stage.fn은 코루틴 함수이며 단계별 워커는 태스크로 실행.
+
+    워커 수와 큐 길이가 동시에 처리 중인 항목 수를 제한하므로, 입력마다 태스크를
+    미리 만들지 않고도 여러 기업의 검색/수집/요약이 겹쳐 진행된다.
+    """
+
+    def __init__(self, stages: List[Stage], name: str = "pipeline"):
+        super().__init__(stages, name)
+
+    async def run(self, source: Iterable[Any], deadline: Optional[Deadline] = None) -> AsyncIterator[Any]:
+        self._queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        self._queues.append(asyncio.Queue(maxsize=QUEUE_SIZE))  # 최종 출력
+        self._reset_stats()
+        names = [stage.name for stage in self.stages] + [None]
+        remaining = [stage.workers for stage in self.stages]
+
+        async def put(idx: int, item: Any):
+            await self._queues[idx].put(item)
+            if item is not _DONE:
+                self._record_depth(names[idx], self._queues[idx].qsize())
+
+        async def feed():
+            for item in source:
+                await put(0, item)
+            await put(0, _DONE)
+
+        async def work(idx: int):
+            stage = self.stages[idx]
+            while True:
+                item = await self._queues[idx].get()
+                if item is _DONE:
+                    remaining[idx] -= 1
+                    # 같은 단계의 다른 워커도 종료하도록 되돌려 놓고, 마지막 워커만 다음 단계에 전달
+                    await put(idx + 1 if remaining[idx] == 0 else idx, _DONE)
+                    return
+                try:
+                    output = await stage.fn(item)
+                    outputs = (output or ()) if stage.fan_out else (output,)
+                    for out in outputs:
+                        if out is not None:
+                            await put(idx + 1, out)
+                    key = "processed"
+                except Exception as e:
+                    logging.error(f"[Pipeline] {stage.name} 단계 실패 - {e}")
+                    key = "errors"
+                self._count(stage.name, key)
+
+        workers = [asyncio.ensure_future(feed())]
+        for idx, stage in enumerate(self.stages):
+            workers.extend(asyncio.ensure_future(work(idx)) for _ in range(stage.workers))
+
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(
+                        self._queues[-1].get(), timeout=deadline.remaining() if deadline else None
+                    )
+                except asyncio.TimeoutError:
+                    logging.warning("[Pipeline] 기한 초과 - 부분 결과 반환")
+                    break
+                if item is _DONE:
+                    self.completed = True
+                    break
+                yield item
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
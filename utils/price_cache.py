@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, List
+
+import pandas as pd
+import yfinance as yf
+
+from utils.metrics import metrics
+from utils.resilience import upstreams
+
+PRICE_CACHE_PATH = "results/cache/prices.json"
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+COVERAGE_SLACK_DAYS = 5  # 주말/휴일로 인한 시작일 누락 허용 범위
+# 이어 받은 구간의 첫날 종가가 캐시와 이 비율 이상 다르면 (분할/배당 수정) 전체 구간을 다시 받음
+ADJUSTMENT_TOLERANCE = 0.005
+
+
+class PriceCache:
+    """티커별 일봉(OHLCV)을 로컬에 보관하고, 저장된 마지막 날짜 이후 구간만 이어서 조회"""
+
+    def __init__(self, path: str = PRICE_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._frames: Dict[str, pd.DataFrame] = self._load()
+
+    def _load(self) -> Dict[str, pd.DataFrame]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except (IOError, ValueError) as e:
+            logging.warning(f"[PriceCache] 캐시 로드 실패 - {e}")
+            return {}
+        return {
+            symbol: pd.DataFrame(values["columns"], index=pd.DatetimeIndex(values["dates"]))
+            for symbol, values in raw.items()
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            frames = dict(self._frames)
+        # 샤드 워커 등 다른 프로세스가 기록한 티커를 덮어쓰지 않도록 병합
+        merged = {**self._load(), **frames}
+        data = {
+            symbol: {
+                "dates": [d.strftime("%Y-%m-%d") for d in frame.index],
+                "columns": {c: [None if pd.isna(v) else float(v) for v in frame[c]] for c in frame},
+            }
+            for symbol, frame in merged.items()
+        }
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            logging.error(f"[PriceCache] 캐시 저장 실패 - {e}")
+
+    def refresh(self):
+        """다른 프로세스(샤드 워커)가 저장한 구간을 다시 읽어 반영"""
+        loaded = self._load()
+        with self._lock:
+            self._frames.update(loaded)
+
+    def _fetch_start(self, symbol: str, start: pd.Timestamp) -> pd.Timestamp:
+        # 캐시가 시작일을 덮으면 마지막 저장일부터(겹치는 하루로 수정 여부 확인), 아니면 처음부터
+        frame = self._frames.get(symbol)
+        if frame is None or frame.empty or frame.index[0] > start + pd.Timedelta(days=COVERAGE_SLACK_DAYS):
+            return start
+        return max(start, frame.index[-1])
+
+    def _download(self, symbols: List[str], start: str, end: str) -> Dict[str, pd.DataFrame]:
+        data = upstreams.get("yfinance").call(
+            yf.download,
+            symbols,
+            start=start,
+            end=end,
+            group_by="ticker",
+            auto_adjust=True,
+            progress=False,
+            threads=True,
+        )
+        frames = {}
+        available = set(data.columns.get_level_values(0)) if not data.empty else set()
+        for symbol in symbols:
+            if symbol in available:
+                frame = data[symbol].dropna(how="all")
+                if not frame.empty:
+                    frame.index = _naive_dates(frame.index)
+                    frames[symbol] = frame[[c for c in COLUMNS if c in frame]]
+        return frames
+
+    def _extend(self, symbol: str, fresh: pd.DataFrame) -> bool:
+        """새 구간을 캐시에 이어 붙임. 겹치는 날의 종가가 달라졌으면 False (전체 재조회 필요)"""
+        cached = self._frames.get(symbol)
+        if cached is not None and not cached.empty:
+            overlap = fresh.index.intersection(cached.index)
+            if len(overlap):
+                old, new = cached.loc[overlap[0], "Close"], fresh.loc[overlap[0], "Close"]
+                if old and abs(new - old) / abs(old) > ADJUSTMENT_TOLERANCE:
+                    return False
+            fresh = pd.concat([cached[cached.index < fresh.index[0]], fresh])
+        self._frames[symbol] = fresh
+        return True
+
+    def load(self, symbols: List[str], start: str, end: str) -> Dict[str, pd.DataFrame]:
+        """심볼별 [start, end) 일봉을 반환. 캐시 이후 구간만 시작일별로 묶어 일괄 조회"""
+        start_ts, end_ts = pd.Timestamp(start), pd.Timestamp(end)
+        groups: Dict[pd.Timestamp, List[str]] = defaultdict(list)
+        for symbol in symbols:
+            fetch_start = self._fetch_start(symbol, start_ts)
+            # yfinance의 end는 해당 일을 포함하지 않으므로, 마지막 저장일과 end 사이에 평일이 없으면 받을 것이 없음
+            pending = pd.bdate_range(fetch_start + pd.Timedelta(days=1), end_ts - pd.Timedelta(days=1))
+            if fetch_start > start_ts and pending.empty:
+                metrics.cache("prices", True)
+                continue
+            metrics.cache("prices", False)
+            groups[fetch_start].append(symbol)
+
+        refetch = []
+        for fetch_start, group in sorted(groups.items()):
+            label = "전체" if fetch_start == start_ts else f"{fetch_start.date()} 이후"
+            logging.info(f"[PriceCache] 가격 조회 ({label}) - {', '.join(group)}")
+            fresh = self._download(group, fetch_start.strftime("%Y-%m-%d"), end)
+            for symbol, frame in fresh.items():
+                if not self._extend(symbol, frame):
+                    refetch.append(symbol)
+        if refetch:
+            logging.info(f"[PriceCache] 수정 주가 변경 감지 - 전체 재조회: {', '.join(refetch)}")
+            for symbol, frame in self._download(refetch, start, end).items():
+                self._frames[symbol] = frame
+        if groups:
+            self.save()
+
+        panel = {}
+        for symbol in symbols:
+            frame = self._frames.get(symbol)
+            if frame is None:
+                continue
+            frame = frame[(frame.index >= start_ts) & (frame.index < end_ts)].dropna(how="all")
+            if not frame.empty:
+                panel[symbol] = frame
+        return panel
+
+
+def _naive_dates(index: pd.Index) -> pd.DatetimeIndex:
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
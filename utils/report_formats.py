@@ -0,0 +1,174 @@
+import html
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+REPORT_TITLE = "글로벌 전기차 시장 트렌드 및 주요 기업 주식 분석"
+CHART_ANCHOR = "시장 트렌드"  # 본문에서 언급되지 않은 차트를 넣을 섹션
+FORMAT_ALIASES = {"md": "markdown", "htm": "html"}
+
+Block = Tuple[str, object]  # ("paragraph", str) 또는 ("chart", 차트 메타데이터 dict)
+
+
+def layout_blocks(report_text: str, chart_metadata: Optional[Dict[str, dict]]) -> List[Block]:
+    """본문을 문단/차트 블록 목록으로 배치.
+
+    차트는 키나 제목을 처음 언급한 문단 뒤에 넣고, 언급되지 않은 차트는
+    시장 트렌드 문단 뒤에 모아 넣는다.
+    """
+    charts = {
+        key: chart
+        for key, chart in (chart_metadata or {}).items()
+        if os.path.exists(chart["file_path"])
+    }
+    sections = report_text.split("\n\n")
+    mentioned = {
+        key
+        for key, chart in charts.items()
+        if any(key in section or chart["title"] in section for section in sections)
+    }
+
+    blocks: List[Block] = []
+    anchored = False
+    for section in sections:
+        blocks.append(("paragraph", section))
+        for key in list(charts):
+            chart = charts[key]
+            if key in mentioned:
+                place = key in section or chart["title"] in section
+            else:
+                place = not anchored and CHART_ANCHOR in section
+            if place:
+                blocks.append(("chart", chart))
+                del charts[key]
+        anchored = anchored or CHART_ANCHOR in section
+    return blocks
+
+
+def _caption(chart: dict) -> str:
+    return f"그림 설명: {chart['description']} / 출처: {chart['source']}"
+
+
+def _image_src(chart: dict, output_dir: str) -> str:
+    # 리포트 파일 위치 기준 상대 경로 (슬래시 구분)
+    return os.path.relpath(chart["file_path"], output_dir).replace(os.sep, "/")
+
+
+def render_markdown(blocks: List[Block], output_dir: str) -> str:
+    parts = [f"# {REPORT_TITLE}"]
+    for kind, value in blocks:
+        if kind == "paragraph":
+            parts.append(value)
+        else:
+            parts.append(f"![{value['title']}]({_image_src(value, output_dir)})\n\n*{_caption(value)}*")
+    return "\n\n".join(parts) + "\n"
+
+
+def _inline_html(text: str) -> str:
+    return re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", html.escape(text))
+
+
+def _paragraph_html(text: str) -> str:
+    """LLM이 쓰는 마크다운 일부(제목, 굵게, 불릿)만 HTML로 변환"""
+    out, items, lines = [], [], []
+
+    def flush():
+        if lines:
+            out.append(f"<p>{'<br/>'.join(lines)}</p>")
+            lines.clear()
+        if items:
+            out.append("<ul>" + "".join(f"<li>{item}</li>" for item in items) + "</ul>")
+            items.clear()
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        heading = re.match(r"(#{1,6})\s+(.*)", stripped)
+        if heading:
+            flush()
+            level = min(len(heading.group(1)) + 1, 6)  # h1은 리포트 제목에 사용
+            out.append(f"<h{level}>{_inline_html(heading.group(2))}</h{level}>")
+        elif stripped.startswith(("- ", "* ")):
+            if lines:
+                flush()
+            items.append(_inline_html(stripped[2:]))
+        elif stripped:
+            if items:
+                flush()
+            lines.append(_inline_html(stripped))
+    flush()
+    return "\n".join(out)
+
+
+def render_html(blocks: List[Block], output_dir: str) -> str:
+    body = []
+    for kind, value in blocks:
+        if kind == "paragraph":
+            body.append(_paragraph_html(value))
+        else:
+            body.append(
+                f'<figure><img src="{html.escape(_image_src(value, output_dir))}" '
+                f'alt="{html.escape(value["title"])}" style="max-width:100%"/>'
+                f"<figcaption>{html.escape(_caption(value))}</figcaption></figure>"
+            )
+    return (
+        '<!DOCTYPE html>\n<html lang="ko">\n<head><meta charset="utf-8"/>'
+        f"<title>{html.escape(REPORT_TITLE)}</title></head>\n<body>\n"
+        f"<h1>{html.escape(REPORT_TITLE)}</h1>\n" + "\n".join(body) + "\n</body>\n</html>\n"
+    )
+
+
+def render_json(blocks: List[Block], output_dir: str) -> str:
+    items = []
+    for kind, value in blocks:
+        if kind == "paragraph":
+            items.append({"type": "paragraph", "text": value})
+        else:
+            items.append({"type": "chart", **value, "file_path": _image_src(value, output_dir)})
+    document = {
+        "title": REPORT_TITLE,
+        "generated_at": datetime.utcnow().isoformat(),
+        "blocks": items,
+    }
+    return json.dumps(document, ensure_ascii=False, indent=2)
+
+
+RENDERERS: Dict[str, Tuple[str, Callable[[List[Block], str], str]]] = {
+    "markdown": (".md", render_markdown),
+    "html": (".html", render_html),
+    "json": (".json", render_json),
+}
+
+
+def parse_formats(report_format: str) -> List[str]:
+    """"pdf", "md,html" 같은 값을 중복 없는 형식 목록으로 변환"""
+    formats = []
+    for name in (report_format or "pdf").split(","):
+        name = FORMAT_ALIASES.get(name.strip().lower(), name.strip().lower())
+        if name and name not in formats:
+            formats.append(name)
+    return formats
+
+
+def write_reports(
+    base_path: str,
+    formats: List[str],
+    report_text: str,
+    chart_metadata: Optional[Dict[str, dict]] = None,
+) -> Dict[str, str]:
+    """한 번 배치한 블록으로 여러 텍스트 형식을 렌더링하고 형식별 경로를 반환 (ReportLab 미사용)"""
+    output_dir = os.path.dirname(base_path) or "."
+    blocks = layout_blocks(report_text, chart_metadata)
+    paths = {}
+    for fmt in formats:
+        extension, render = RENDERERS[fmt]
+        started = time.perf_counter()
+        path = base_path + extension
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(render(blocks, output_dir))
+        paths[fmt] = path
+        logging.info(f"[ReportFormats] {fmt} 저장 완료 ({(time.perf_counter() - started) * 1000:.1f}ms) - {path}")
+    return paths
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from utils.metrics import metrics
+
+SECTION_CACHE_PATH = "results/cache/report_sections.json"
+MAX_ENTRIES_PER_SECTION = 8  # 섹션별로 보관할 입력 조합 수 (대상 기업/기간이 달라지는 실행 대비)
+
+
+def digest(value: Any) -> str:
+    """JSON으로 직렬화한 값의 짧은 해시 (키 순서와 무관)"""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class SectionCache:
+    """LLM 생성 결과(리포트 섹션, 주가 통합 요약)를 입력 해시로 보관하는 로컬 캐시.
+
+    각 항목은 섹션 본문과 함께 입력별 해시를 기록하므로, 다시 생성할 때
+    어떤 입력이 바뀌었는지 알 수 있다.
+    """
+
+    def __init__(self, path: str = SECTION_CACHE_PATH, name: str = "report_section"):
+        self.path = path
+        self.name = name  # 캐시 적중 지표의 cache 레이블
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = self._load()
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            logging.warning(f"[SectionCache] 캐시 로드 실패 - {e}")
+            return {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            entries = {key: list(items) for key, items in self._entries.items()}
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            logging.error(f"[SectionCache] 캐시 저장 실패 - {e}")
+
+    def get(self, section: str, input_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for entry in self._entries.get(section, []):
+                if entry["input_hash"] == input_hash:
+                    metrics.cache(self.name, True)
+                    return entry
+        metrics.cache(self.name, False)
+        return None
+
+    def latest(self, section: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self._entries.get(section)
+            return entries[0] if entries else None
+
+    def put(self, section: str, input_hash: str, inputs: Dict[str, str], text: str) -> Dict[str, Any]:
+        entry = {
+            "input_hash": input_hash,
+            "inputs": inputs,
+            "text": text,
+            "generated_at": datetime.utcnow().isoformat(),
+        }
+        with self._lock:
+            others = [e for e in self._entries.get(section, []) if e["input_hash"] != input_hash]
+            self._entries[section] = [entry] + others[: MAX_ENTRIES_PER_SECTION - 1]
+        return entry
+
+
+def changed_inputs(inputs: Dict[str, str], previous: Optional[Dict[str, Any]]) -> List[str]:
+    """이전 항목과 비교해 해시가 달라진 입력 이름 목록 (이전 항목이 없으면 전체)"""
+    if previous is None:
+        return sorted(inputs)
+    old = previous.get("inputs", {})
+    return sorted(name for name in set(inputs) | set(old) if inputs.get(name) != old.get(name))
+
+
+section_cache = SectionCache()
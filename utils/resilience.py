@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, TypeVar
+from urllib.parse import urlparse
+
+from utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from utils.fetch_policy import Deadline
+
+T = TypeVar("T")
+
+BUDGET_WINDOW = 60.0  # 재시도 예산을 계산하는 구간(초)
+BUDGET_RATIO = 0.2  # 구간 내 요청 수 대비 허용 재시도 비율
+BUDGET_MIN_RETRIES = 5  # 요청이 적을 때도 허용하는 최소 재시도 수
+
+# 상위 서비스별 재시도/차단 설정
+UPSTREAM_SETTINGS: Dict[str, Dict[str, float]] = {
+    "openai": {"max_attempts": 4, "base_delay": 1.0, "max_delay": 20.0, "failure_threshold": 5, "reset_timeout": 30.0},
+    "tavily": {"max_attempts": 3, "base_delay": 0.5, "max_delay": 8.0, "failure_threshold": 5, "reset_timeout": 30.0},
+    "yfinance": {"max_attempts": 3, "base_delay": 1.0, "max_delay": 10.0, "failure_threshold": 8, "reset_timeout": 60.0},
+}
+# 뉴스 호스트는 헤지 요청이 대체 후보를 가져오므로 재시도 없이 차단만 적용
+HOST_SETTINGS: Dict[str, float] = {"max_attempts": 1, "failure_threshold": 3, "reset_timeout": 60.0}
+DEFAULT_SETTINGS: Dict[str, float] = {"max_attempts": 3, "base_delay": 0.5, "max_delay": 10.0, "failure_threshold": 5, "reset_timeout": 30.0}
+
+
+class CircuitOpenError(Exception):
+    """차단기가 열려 있어 호출하지 않고 바로 실패"""
+
+    def __init__(self, upstream: str, retry_in: float):
+        super().__init__(f"{upstream} 차단 중 ({retry_in:.0f}초 후 재시도)")
+        self.upstream = upstream
+        self.retry_in = retry_in
+
+
+def is_retryable(exc: Exception) -> bool:
+    """4xx(408/429 제외) 응답은 다시 보내도 같은 결과이므로 재시도하지 않음"""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in (408, 429):
+        return False
+    return True
+
+
+class CircuitBreaker:
+    """연속 실패가 임계값을 넘으면 reset_timeout 동안 호출을 막고, 이후 한 번의 시험 호출로 복구 여부를 판단"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if self.state == "open" and elapsed >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_timeout - elapsed)
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half_open" or (
+                self.state == "closed" and self._failures >= self.failure_threshold
+            ):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                tripped = True
+            else:
+                tripped = False
+        if tripped:
+            logging.warning(f"[Resilience] 차단기 작동 - {self.name} ({self.reset_timeout:.0f}초)")
+
+
+class RetryBudget:
+    """최근 구간의 요청 수에 비례해 재시도를 허용 (장애 시 재시도 폭주 방지)"""
+
+    def __init__(self, ratio: float = BUDGET_RATIO, min_retries: int = BUDGET_MIN_RETRIES, window: float = BUDGET_WINDOW):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+        self._lock = threading.Lock()
+        self.exhausted = 0
+
+    def _trim(self, now: float):
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self):
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                self.exhausted += 1
+                return False
+            self._retries.append(now)
+            return True
+
+
+class Upstream:
+    """상위 서비스 하나에 대한 차단기 + 재시도 예산 + 지터 지수 백오프"""
+
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 10.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        retryable: Callable[[Exception], bool] = is_retryable,
+    ):
+        self.name = name
+        self.max_attempts = int(max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+        self.breaker = CircuitBreaker(name, int(failure_threshold), reset_timeout)
+        self.budget = RetryBudget()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+
+    def backoff(self, attempt: int) -> float:
+        # full jitter: 0 ~ min(max_delay, base * 2^attempt)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def before_call(self):
+        """호출 직전 차단기 확인 (열려 있으면 CircuitOpenError)"""
+        self.breaker.allow()
+        self.budget.record_request()
+        with self._lock:
+            self.calls += 1
+
+    def record_success(self):
+        self.breaker.record_success()
+
+    def record_failure(self, exc: Optional[Exception] = None):
+        # 요청 자체가 잘못된 경우(4xx)는 상위 서비스 상태와 무관하므로 차단기에 반영하지 않음
+        with self._lock:
+            self.failures += 1
+        if exc is None or self.retryable(exc):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _next_delay(self, attempt: int, exc: Exception, deadline: Optional["Deadline"]) -> Optional[float]:
+        """재시도할 경우 대기 시간, 포기할 경우 None"""
+        if attempt + 1 >= self.max_attempts or not self.retryable(exc):
+            return None
+        delay = self.backoff(attempt)
+        remaining = deadline.remaining() if deadline else None
+        if remaining is not None and remaining <= delay:
+            return None
+        if not self.budget.try_acquire():
+            logging.warning(f"[Resilience] 재시도 예산 소진 - {self.name}")
+            return None
+        with self._lock:
+            self.retries += 1
+        return delay
+
+    def _observe(
+        self, started: float, outcome: str, result: Any = None, agent: Optional[str] = None, model: Any = None
+    ):
+        """시도별 지연시간을 기록하고, chat.completions 응답이면 토큰 사용량도 기록"""
+        seconds = time.perf_counter() - started
+        metrics.inc("upstream_requests_total", upstream=self.name, outcome=outcome)
+        metrics.observe("upstream_request_seconds", seconds, upstream=self.name)
+        usage = getattr(result, "usage", None)
+        if usage is not None:
+            metrics.record_completion(agent or "unknown", model or getattr(result, "model", "unknown"), usage, seconds)
+
+    def call(
+        self,
+        fn: Callable[..., T],
+        *args,
+        deadline: Optional["Deadline"] = None,
+        agent: Optional[str] = None,
+        **kwargs,
+    ) -> T:
+        """agent는 지표 라벨로만 쓰이며 fn에는 전달하지 않음"""
+        attempt = 0
+        while True:
+            self.before_call()
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._observe(started, "error")
+                self.record_failure(e)
+                delay = self._next_delay(attempt, e, deadline)
+                if delay is None:
+                    raise
+                logging.info(f"[Resilience] {self.name} 재시도 {attempt + 1} ({delay:.1f}초 후) - {e}")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._observe(started, "ok", result, agent, kwargs.get("model"))
+            self.record_success()
+            return result
+
+    async def acall(
+        self,
+        fn: Callable[..., Awaitable[T]],
+        *args,
+        deadline: Optional["Deadline"] = None,
+        agent: Optional[str] = None,
+        **kwargs,
+    ) -> T:
+        """call()의 비동기 버전 (백오프 동안 이벤트 루프를 막지 않음)"""
+        attempt = 0
+        while True:
+            self.before_call()
+            started = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                self._observe(started, "error")
+                self.record_failure(e)
+                delay = self._next_delay(attempt, e, deadline)
+                if delay is None:
+                    raise
+                logging.info(f"[Resilience] {self.name} 재시도 {attempt + 1} ({delay:.1f}초 후) - {e}")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._observe(started, "ok", result, agent, kwargs.get("model"))
+            self.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "breaker_trips": self.breaker.trips,
+            "breaker_rejected": self.breaker.rejected,
+            "budget_exhausted": self.budget.exhausted,
+        }
+
+
+class UpstreamRegistry:
+    """이름별 Upstream을 프로세스 전체에서 공유"""
+
+    def __init__(self):
+        self._upstreams: Dict[str, Upstream] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Upstream:
+        with self._lock:
+            upstream = self._upstreams.get(name)
+            if upstream is None:
+                settings = UPSTREAM_SETTINGS.get(name, DEFAULT_SETTINGS)
+                upstream = self._upstreams[name] = Upstream(name, **settings)
+            return upstream
+
+    def host(self, url: str) -> Upstream:
+        """뉴스 호스트별 Upstream (news:<도메인>)"""
+        name = f"news:{urlparse(url).netloc.lower()}"
+        with self._lock:
+            upstream = self._upstreams.get(name)
+            if upstream is None:
+                upstream = self._upstreams[name] = Upstream(name, **HOST_SETTINGS)
+            return upstream
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            upstreams = dict(self._upstreams)
+        return {name: upstream.stats() for name, upstream in sorted(upstreams.items())}
+
+    def tripped(self) -> Dict[str, int]:
+        """차단기가 한 번 이상 작동한 상위 서비스별 작동 횟수"""
+        return {name: s["breaker_trips"] for name, s in self.stats().items() if s["breaker_trips"]}
+
+
+upstreams = UpstreamRegistry()
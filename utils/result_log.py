@@ -0,0 +1,133 @@
+import atexit
+import json
+import logging
+import mmap
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # 압축은 선택 사항
+    zstandard = None
+
+BUFFER_SIZE = 64 * 1024  # 이 크기를 넘으면 디스크에 기록
+COMPRESS = os.getenv("RESULT_LOG_ZSTD", "0") == "1"  # zstd 압축 사용 여부
+
+
+class ResultLog:
+    """에이전트별 append-only JSONL 결과 로그와 오프셋 인덱스.
+
+    레코드는 `<name>.jsonl`(압축 시 `<name>.jsonl.zst`, 레코드마다 독립 프레임)에
+    이어 쓰고, `<name>.idx`에 `key, timestamp, offset, length`를 한 줄씩 기록한다.
+    인덱스는 처음 사용할 때 메모리에 올려 키별 최신 레코드를 O(1)로 찾는다.
+    """
+
+    def __init__(self, directory: str, name: str, compress: bool = COMPRESS):
+        if compress and zstandard is None:
+            logging.warning("[ResultLog] zstandard 미설치 - 압축 없이 기록")
+            compress = False
+        self.compress = compress
+        suffix = ".jsonl.zst" if compress else ".jsonl"
+        self.data_path = os.path.join(directory, f"{name}{suffix}")
+        self.index_path = os.path.join(directory, f"{name}.idx")
+
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[str, List[Tuple[str, int, int]]]] = None
+        self._data_buffer: List[bytes] = []
+        self._index_buffer: List[str] = []
+        self._buffered = 0
+        self._size = 0
+        atexit.register(self.flush)
+
+    def _ensure_loaded(self):
+        # 실행 전 결과 정리 이후에 읽도록 처음 사용할 때 인덱스를 로드
+        if self._entries is not None:
+            return
+        self._entries = {}
+        self._size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    key, timestamp, offset, length = line.rstrip("\n").split("\t")
+                    offset, length = int(offset), int(length)
+                except ValueError:
+                    continue
+                # 데이터 파일보다 앞선 인덱스 항목(쓰기 중단)은 무시
+                if offset + length <= self._size:
+                    self._entries.setdefault(key, []).append((timestamp, offset, length))
+
+    def _encode(self, record: Dict[str, Any]) -> bytes:
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        if self.compress:
+            return zstandard.ZstdCompressor().compress(line)
+        return line
+
+    def _decode(self, payload: bytes) -> Dict[str, Any]:
+        if self.compress:
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        return json.loads(payload)
+
+    def append(self, record: Dict[str, Any], key: str):
+        payload = self._encode(record)
+        timestamp = record.get("timestamp", "")
+        key = key.replace("\t", " ")
+
+        with self._lock:
+            self._ensure_loaded()
+            offset = self._size + self._buffered
+            self._data_buffer.append(payload)
+            self._index_buffer.append(f"{key}\t{timestamp}\t{offset}\t{len(payload)}\n")
+            self._entries.setdefault(key, []).append((timestamp, offset, len(payload)))
+            self._buffered += len(payload)
+            if self._buffered >= BUFFER_SIZE:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._data_buffer:
+                return
+            os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
+            try:
+                # 데이터를 먼저 기록해 인덱스가 없는 위치를 가리키지 않도록 함
+                with open(self.data_path, "ab") as f:
+                    f.write(b"".join(self._data_buffer))
+                with open(self.index_path, "a", encoding="utf-8") as f:
+                    f.write("".join(self._index_buffer))
+                logging.info(
+                    f"[ResultLog] {len(self._data_buffer)}건 기록 - {self.data_path}"
+                )
+            except IOError as e:
+                logging.error(f"[ResultLog] 기록 실패 - {e}")
+                return
+            self._size += self._buffered
+            self._data_buffer, self._index_buffer, self._buffered = [], [], 0
+
+    def _read(self, offset: int, length: int) -> Dict[str, Any]:
+        with open(self.data_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return self._decode(mm[offset : offset + length])
+
+    def latest(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_loaded()
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            self.flush()
+            _, offset, length = entries[-1]
+        return self._read(offset, length)
+
+    def history(self, key: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_loaded()
+            entries = list(self._entries.get(key, ()))
+            self.flush()
+        return [self._read(offset, length) for _, offset, length in entries]
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._entries)
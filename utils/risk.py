@@ -0,0 +1,152 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.indicators import forward_fill, returns
+
+TRADING_DAYS = 252
+ROLLING_WINDOW = 60  # 이동 상관계수 창(거래일)
+ROLLING_STEP = 20  # 이동 상관계수 계산 간격(거래일)
+TOP_PEERS = 5  # 티커별로 리포트에 남길 상관 높은 종목 수
+
+
+@dataclass
+class RiskReport:
+    """정렬된 수익률 행렬에서 한 번에 계산한 교차 위험 지표"""
+
+    tickers: List[str]
+    covariance: np.ndarray  # 연율화 공분산 (N × N)
+    correlation: np.ndarray  # (N × N)
+    cluster_order: np.ndarray  # 상관 구조 기준 티커 정렬 인덱스
+    equal_weight_volatility: float
+    cap_weight_volatility: Optional[float]
+    rolling_correlation: np.ndarray  # 구간별 상관 행렬 (K × N × N)
+    rolling_end_index: np.ndarray  # 각 구간의 마지막 행 인덱스 (K,)
+
+    def summary(self, top_k: int = TOP_PEERS) -> Dict[str, object]:
+        """stock_data에 넣을 JSON 직렬화 가능한 요약"""
+        n = len(self.tickers)
+        corr = np.where(np.eye(n, dtype=bool), np.nan, self.correlation)
+        avg_corr = np.nanmean(corr, axis=1) if n > 1 else np.full(n, np.nan)
+        volatility = np.sqrt(np.diag(self.covariance))
+
+        per_ticker = {}
+        for i, ticker in enumerate(self.tickers):
+            peers = [j for j in np.argsort(-np.nan_to_num(corr[i], nan=-np.inf)) if j != i][:top_k]
+            per_ticker[ticker] = {
+                "annual_volatility_percentage": _round(volatility[i] * 100),
+                "average_correlation": _round(avg_corr[i]),
+                "top_correlated": {self.tickers[j]: _round(corr[i, j]) for j in peers},
+            }
+
+        upper = self.rolling_correlation[:, ~np.tri(n, dtype=bool)] if n > 1 else None
+        rolling_avg = (
+            [_round(v) for v in np.nanmean(upper, axis=1)] if upper is not None and upper.size else []
+        )
+
+        return {
+            "cluster_order": [self.tickers[i] for i in self.cluster_order],
+            "equal_weight_volatility_percentage": _round(self.equal_weight_volatility * 100),
+            "cap_weight_volatility_percentage": (
+                _round(self.cap_weight_volatility * 100)
+                if self.cap_weight_volatility is not None
+                else None
+            ),
+            "rolling_average_correlation": rolling_avg,
+            "tickers": per_ticker,
+        }
+
+
+def _round(value, digits: int = 4) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def _masked_covariance(ret: np.ndarray) -> np.ndarray:
+    """NaN을 쌍별로 제외한 공분산 (행렬곱 한 번으로 모든 쌍 계산)"""
+    valid = ~np.isnan(ret)
+    counts = valid.sum(axis=0)
+    means = np.where(counts > 0, np.nansum(ret, axis=0) / np.maximum(counts, 1), 0.0)
+    centered = np.where(valid, ret - means, 0.0)
+    pair_counts = valid.T.astype(np.float64) @ valid.astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(pair_counts > 1, centered.T @ centered / (pair_counts - 1), np.nan)
+
+
+def _correlation(cov: np.ndarray) -> np.ndarray:
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.clip(cov / np.outer(std, std), -1.0, 1.0)
+
+
+def cluster_order(corr: np.ndarray) -> np.ndarray:
+    """상관 행렬의 스펙트럴 정렬 (Fiedler 벡터 순서) - 비슷한 종목끼리 인접하게 배치"""
+    n = corr.shape[0]
+    if n < 3:
+        return np.arange(n)
+    affinity = (1.0 + np.nan_to_num(corr)) / 2.0
+    np.fill_diagonal(affinity, 0.0)
+    laplacian = np.diag(affinity.sum(axis=1)) - affinity
+    _, vectors = np.linalg.eigh(laplacian)
+    return np.argsort(vectors[:, 1])
+
+
+def portfolio_volatility(cov: np.ndarray, weights: np.ndarray) -> float:
+    cov = np.nan_to_num(cov)
+    return float(np.sqrt(max(weights @ cov @ weights, 0.0)))
+
+
+def rolling_correlations(ret: np.ndarray, window: int = ROLLING_WINDOW, step: int = ROLLING_STEP):
+    """step 간격의 모든 창에 대한 상관 행렬을 einsum 한 번으로 계산"""
+    t, n = ret.shape
+    if t < window:
+        return np.empty((0, n, n), dtype=np.float32), np.empty(0, dtype=int)
+
+    filled = np.nan_to_num(ret)
+    windows = sliding_window_view(filled, window, axis=0)[::step]  # (K, N, window)
+    centered = windows - windows.mean(axis=2, keepdims=True)
+    cov = np.einsum("kiw,kjw->kij", centered, centered) / (window - 1)
+    std = np.sqrt(np.einsum("kii->ki", cov))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / (std[:, :, None] * std[:, None, :])
+    end_index = np.arange(window - 1, t, step)
+    return corr.astype(np.float32), end_index
+
+
+def compute_risk(
+    close: np.ndarray,
+    tickers: List[str],
+    market_caps: Optional[np.ndarray] = None,
+    window: int = ROLLING_WINDOW,
+    step: int = ROLLING_STEP,
+) -> RiskReport:
+    """(날짜 × 티커) 종가 배열로 수익률 행렬을 한 번 만들고 모든 위험 지표를 계산"""
+    ret = returns(forward_fill(np.asarray(close, dtype=np.float64)))[1:]
+
+    daily_cov = _masked_covariance(ret)
+    covariance = daily_cov * TRADING_DAYS
+    correlation = _correlation(daily_cov)
+
+    n = len(tickers)
+    equal_vol = portfolio_volatility(covariance, np.full(n, 1.0 / n)) if n else float("nan")
+
+    cap_vol = None
+    if market_caps is not None:
+        caps = np.nan_to_num(np.asarray(market_caps, dtype=np.float64))
+        if caps.sum() > 0:
+            cap_vol = portfolio_volatility(covariance, caps / caps.sum())
+
+    rolling, end_index = rolling_correlations(ret, window, step)
+
+    return RiskReport(
+        tickers=list(tickers),
+        covariance=covariance.astype(np.float32),
+        correlation=correlation.astype(np.float32),
+        cluster_order=cluster_order(correlation),
+        equal_weight_volatility=equal_vol,
+        cap_weight_volatility=cap_vol,
+        rolling_correlation=rolling,
+        rolling_end_index=end_index + 1,  # 수익률은 종가보다 한 행 짧음
+    )
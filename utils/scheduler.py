@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from utils.metrics import metrics
+
+REPORT_DIR = "results/schedule"
+
+
+class Task:
+    """스케줄러 작업 하나. afn은 인자 없는 코루틴 함수이며 deps가 모두 끝나면 바로 시작한다."""
+
+    def __init__(self, name: str, afn: Callable[[], Awaitable[Any]], deps: Iterable[str] = ()):
+        self.name = name
+        self.afn = afn
+        self.deps = tuple(deps)
+
+
+class CriticalPathScheduler:
+    """의존 관계가 있는 비동기 작업들을 입력이 준비되는 즉시 실행하고 임계 경로를 계산.
+
+    단계별로 모두 끝나기를 기다리는 방식(LangGraph 슈퍼스텝)과 달리 각 작업은 자신의
+    선행 작업만 기다리므로, 전체 실행 시간은 가장 긴 의존 경로에 가까워진다.
+    """
+
+    def __init__(self):
+        self.tasks: Dict[str, Task] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self._started: Optional[float] = None
+
+    def add(self, name: str, afn: Callable[[], Awaitable[Any]], deps: Iterable[str] = ()) -> Task:
+        if name in self.tasks:
+            raise ValueError(f"중복된 작업 이름: {name}")
+        task = self.tasks[name] = Task(name, afn, deps)
+        return task
+
+    def _validate(self):
+        for task in self.tasks.values():
+            unknown = [dep for dep in task.deps if dep not in self.tasks]
+            if unknown:
+                raise ValueError(f"{task.name}의 선행 작업이 없음: {', '.join(unknown)}")
+        # 순환 의존이 있으면 해당 작업들이 서로를 영원히 기다리므로 실행 전에 확인
+        remaining = {name: set(task.deps) for name, task in self.tasks.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"순환 의존: {', '.join(sorted(remaining))}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    async def run(self, on_done: Optional[Callable[[str, float], None]] = None) -> Dict[str, Any]:
+        """모든 작업을 실행하고 작업별 결과를 반환. 작업이 실패하면 나머지를 취소하고 예외를 전달"""
+        self._validate()
+        self.timings = {}
+        self._started = time.perf_counter()
+        futures: Dict[str, asyncio.Future] = {}
+
+        async def execute(task: Task) -> Any:
+            if task.deps:
+                await asyncio.gather(*(futures[dep] for dep in task.deps))
+            start = time.perf_counter()
+            result = await task.afn()
+            end = time.perf_counter()
+            self.timings[task.name] = {"start": start - self._started, "end": end - self._started}
+            logging.info(f"[Scheduler] {task.name} 완료 ({end - start:.2f}s)")
+            if on_done is not None:
+                on_done(task.name, round(end - start, 3))
+            return result
+
+        for task in self.tasks.values():
+            futures[task.name] = asyncio.ensure_future(execute(task))
+        try:
+            results = await asyncio.gather(*futures.values())
+        except BaseException:
+            for future in futures.values():
+                future.cancel()
+            await asyncio.gather(*futures.values(), return_exceptions=True)
+            raise
+        return dict(zip(futures, results))
+
+    def _seconds(self, name: str) -> float:
+        timing = self.timings[name]
+        return timing["end"] - timing["start"]
+
+    def critical_path(self) -> List[str]:
+        """가장 늦게 끝난 작업에서 시작해, 매번 가장 늦게 끝난 선행 작업을 따라 거슬러 올라간 경로"""
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda n: self.timings[n]["end"])
+        path = [name]
+        while self.tasks[name].deps:
+            name = max(self.tasks[name].deps, key=lambda n: self.timings[n]["end"])
+            path.append(name)
+        return path[::-1]
+
+    def _slack(self) -> Dict[str, float]:
+        # 전체 실행 시간을 늘리지 않고 늦게 끝나도 되는 여유 시간 (임계 경로 위 작업은 0에 가까움)
+        makespan = max(t["end"] for t in self.timings.values())
+        successors: Dict[str, List[str]] = {name: [] for name in self.tasks}
+        for task in self.tasks.values():
+            for dep in task.deps:
+                successors[dep].append(task.name)
+
+        latest_finish: Dict[str, float] = {}
+
+        def finish_by(name: str) -> float:
+            if name not in latest_finish:
+                latest_finish[name] = min(
+                    (finish_by(s) - self._seconds(s) for s in successors[name]), default=makespan
+                )
+            return latest_finish[name]
+
+        return {name: max(0.0, finish_by(name) - self.timings[name]["end"]) for name in self.timings}
+
+    def report(self) -> Dict[str, Any]:
+        """실행 구간, 여유 시간, 임계 경로를 JSON으로 직렬화 가능한 형태로 반환"""
+        if not self.timings:
+            return {}
+        path = self.critical_path()
+        slack = self._slack()
+        return {
+            "total_seconds": round(max(t["end"] for t in self.timings.values()), 3),
+            "critical_path": path,
+            "critical_path_seconds": round(sum(self._seconds(name) for name in path), 3),
+            "tasks": {
+                name: {
+                    "deps": list(self.tasks[name].deps),
+                    "start": round(timing["start"], 3),
+                    "end": round(timing["end"], 3),
+                    "seconds": round(timing["end"] - timing["start"], 3),
+                    "slack": round(slack[name], 3),
+                }
+                for name, timing in sorted(self.timings.items(), key=lambda item: item[1]["start"])
+            },
+        }
+
+    def record(self) -> Dict[str, Any]:
+        """보고서를 로그와 지표에 남기고 반환"""
+        report = self.report()
+        if not report:
+            return report
+        for name, task in report["tasks"].items():
+            metrics.observe("task_seconds", task["seconds"], task=name)
+        metrics.observe("critical_path_seconds", report["critical_path_seconds"])
+        chain = " → ".join(f"{name}({report['tasks'][name]['seconds']:.1f}s)" for name in report["critical_path"])
+        logging.info(
+            f"[Scheduler] 전체 {report['total_seconds']:.2f}s, "
+            f"임계 경로 {report['critical_path_seconds']:.2f}s: {chain}"
+        )
+        return report
+
+
+def save_report(report: Dict[str, Any], directory: str = REPORT_DIR) -> Optional[str]:
+    """실행별 스케줄 보고서를 JSON으로 저장하고 경로를 반환 (보고서가 비었으면 None)"""
+    if not report:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"schedule_{datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logging.info(f"[Scheduler] 스케줄 보고서 저장 - {path}")
+    return path
@@ -0,0 +1,103 @@
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+
+from utils.metrics import metrics
+
+SHARD_SIZE = 16  # 샤드 하나에 담을 기업/티커 수
+SHARD_TIMEOUT = 600  # 샤드 하나의 최대 실행 시간(초)
+LARGE_UNIVERSE_THRESHOLD = 32  # 이 개수를 넘으면 샤드 실행 모드 사용
+POLL_INTERVAL = 1.0
+
+
+def split_shards(items: List[Any], shard_size: int = SHARD_SIZE) -> List[List[Any]]:
+    return [items[i : i + shard_size] for i in range(0, len(items), shard_size)]
+
+
+def _init_worker():
+    # fork로 복사된 부모 프로세스의 지표를 비워 합산 시 중복되지 않게 함
+    metrics.reset()
+
+
+def _run_shard(fn: Callable[[List[Any]], List[Any]], shard: List[Any]) -> Tuple[List[Any], dict]:
+    # 워커 프로세스에서 쌓인 지표를 결과와 함께 돌려줘 부모 프로세스에서 합산
+    try:
+        return fn(shard), metrics.drain()
+    except Exception:
+        metrics.reset()
+        raise
+
+
+def run_sharded(
+    fn: Callable[[List[Any]], List[Any]],
+    items: List[Any],
+    shard_size: int = SHARD_SIZE,
+    max_workers: Optional[int] = None,
+    shard_timeout: float = SHARD_TIMEOUT,
+    label: str = "Shard",
+) -> Iterator[Tuple[List[Any], Union[List[Any], Exception]]]:
+    """items를 샤드로 나눠 프로세스 풀에서 실행하고, 끝나는 순서대로 결과를 반환.
+
+    fn은 모듈 수준 함수여야 하며(피클 가능), 샤드가 실패하거나 시간을 초과하면
+    결과 대신 예외를 돌려주므로 다른 샤드에는 영향을 주지 않는다.
+    """
+    shards = split_shards(items, shard_size)
+    if not shards:
+        return
+
+    workers = max_workers or min(len(shards), os.cpu_count() or 1)
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    futures = {executor.submit(_run_shard, fn, shard): shard for shard in shards}
+    started = {}
+    finished_shards = 0
+    finished_items = 0
+    timed_out = False
+
+    def report(shard: List[Any]):
+        nonlocal finished_shards, finished_items
+        finished_shards += 1
+        finished_items += len(shard)
+        logging.info(
+            f"[{label}] 진행률 - 샤드 {finished_shards}/{len(shards)}, "
+            f"항목 {finished_items}/{len(items)}"
+        )
+
+    try:
+        while futures:
+            now = time.monotonic()
+            for future in futures:
+                if future not in started and future.running():
+                    started[future] = now
+
+            running = [started[f] + shard_timeout - now for f in futures if f in started]
+            timeout = max(0.0, min(running + [POLL_INTERVAL]))
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                shard = futures.pop(future)
+                try:
+                    result, shard_metrics = future.result()
+                    metrics.merge(shard_metrics)
+                except Exception as e:
+                    logging.error(f"[{label}] 샤드 실패 - {shard} - {e}")
+                    result = e
+                report(shard)
+                yield shard, result
+
+            now = time.monotonic()
+            for future in list(futures):
+                if future in started and now - started[future] > shard_timeout:
+                    shard = futures.pop(future)
+                    logging.error(f"[{label}] 샤드 시간 초과 - {shard}")
+                    timed_out = True
+                    report(shard)
+                    yield shard, TimeoutError(f"shard exceeded {shard_timeout}s")
+    finally:
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        if timed_out:
+            # 멈춘 워커가 인터프리터 종료를 붙잡지 않도록 강제 종료
+            for process in processes:
+                process.terminate()
@@ -0,0 +1,119 @@
+import math
+import re
+from collections import Counter
+from typing import List
+
+# BM25 파라미터
+BM25_K1 = 1.5
+BM25_B = 0.75
+# 수치(금액, 비율, 연도 등)가 포함된 문장 가중치
+NUMERIC_BOOST = 0.5
+MIN_SENTENCE_CHARS = 30
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?。])\s+|\n+")
+_TOKEN = re.compile(r"[A-Za-z0-9&]+|[가-힣]+")
+_NUMBER = re.compile(r"\d")
+_SUFFIXES = ("ments", "ment", "ing", "ies", "ed", "es", "s")
+
+# 내비게이션, 쿠키 배너 등 기사 본문이 아닌 문장
+_BOILERPLATE = (
+    "cookie",
+    "subscribe",
+    "sign up",
+    "newsletter",
+    "privacy policy",
+    "all rights reserved",
+    "terms of use",
+    "advertisement",
+    "javascript",
+    "log in",
+)
+
+
+def estimate_tokens(text: str) -> int:
+    # tiktoken 없이 쓰는 근사치 (영문 기준 약 4자 = 1토큰)
+    return max(1, len(text) // 4)
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for raw in _SENTENCE_SPLIT.split(text):
+        sentence = " ".join(raw.split())
+        if len(sentence) < MIN_SENTENCE_CHARS:
+            continue
+        lowered = sentence.lower()
+        if any(marker in lowered for marker in _BOILERPLATE):
+            continue
+        sentences.append(sentence)
+    return sentences
+
+
+def _stem(token: str) -> str:
+    # investment/invests/investing -> invest 수준의 간단한 어간 처리
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[: -len(suffix)]
+    return token
+
+
+def _tokenize(text: str) -> List[str]:
+    return [_stem(token.lower()) for token in _TOKEN.findall(text)]
+
+
+def rank_sentences(sentences: List[str], query: str) -> List[float]:
+    """BM25 점수로 각 문장과 질의의 관련도를 계산"""
+    docs = [_tokenize(sentence) for sentence in sentences]
+    if not docs:
+        return []
+
+    avg_len = sum(len(doc) for doc in docs) / len(docs) or 1.0
+    doc_freq = Counter()
+    for doc in docs:
+        doc_freq.update(set(doc))
+
+    n_docs = len(docs)
+    query_terms = set(_tokenize(query))
+    idf = {
+        term: math.log(1 + (n_docs - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+        for term in query_terms
+    }
+
+    scores = []
+    for sentence, doc in zip(sentences, docs):
+        term_freq = Counter(doc)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / avg_len)
+        score = 0.0
+        for term in query_terms:
+            tf = term_freq.get(term, 0)
+            if tf:
+                score += idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+        if score and _NUMBER.search(sentence):
+            score += NUMERIC_BOOST
+        scores.append(score)
+    return scores
+
+
+def compress_text(text: str, query: str, token_budget: int) -> str:
+    """질의와 관련도가 높은 문장만 토큰 예산 안에서 원문 순서대로 남긴다"""
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    sentences = list(dict.fromkeys(split_sentences(text)))  # 중복 문장 제거
+    scores = rank_sentences(sentences, query)
+    ranked = sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True)
+
+    selected = []
+    used = 0
+    for idx in ranked:
+        if scores[idx] <= 0:
+            break
+        cost = estimate_tokens(sentences[idx])
+        if used + cost > token_budget:
+            continue
+        selected.append(idx)
+        used += cost
+
+    if not selected:
+        # 관련 문장이 없으면 앞부분만 예산만큼 사용
+        return text[: token_budget * 4]
+    return " ".join(sentences[i] for i in sorted(selected))
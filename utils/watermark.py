@@ -0,0 +1,131 @@
+import logging
+import os
+import re
+from datetime import date, datetime
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_ANALYSIS_PERIOD = "2024-11-01 ~ 2025-05-19"
+# 이전 실행 결과의 워터마크 이후 기사만 검색 (0이면 매번 전체 기간을 다시 처리)
+INCREMENTAL = os.getenv("INCREMENTAL_INGEST", "1") == "1"
+
+
+def parse_period(analysis_period: Optional[str]) -> Tuple[str, str]:
+    """"2024-11-01 ~ 2025-05-19" 형식의 분석 기간을 (시작일, 종료일) 문자열로 변환"""
+    parts = re.split(r"\s*(?:~|\bto\b)\s*", (analysis_period or DEFAULT_ANALYSIS_PERIOD).strip())
+    if len(parts) != 2:
+        raise ValueError(f"분석 기간 형식 오류: {analysis_period!r} (예: 2024-11-01 ~ 2025-05-19)")
+    start, end = (date.fromisoformat(part).isoformat() for part in parts)
+    if start > end:
+        raise ValueError(f"분석 기간 시작일이 종료일보다 늦음: {analysis_period!r}")
+    return start, end
+
+
+def published_date(item: Dict[str, Any]) -> Optional[str]:
+    """검색 결과/기사의 발행일을 YYYY-MM-DD로 변환 (알 수 없으면 None)"""
+    value = item.get("published_date") or item.get("published_at")
+    if not value or value == "Unknown":
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10]).isoformat()
+    except ValueError:
+        pass
+    try:
+        # Tavily 뉴스 검색은 "Mon, 12 May 2025 10:00:00 GMT" 형식을 사용
+        return parsedate_to_datetime(str(value)).date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+class IngestWindow:
+    """한 기업에 대해 이번 실행에서 새로 검색할 기간과 병합할 이전 결과"""
+
+    def __init__(self, period: Tuple[str, str], previous: Optional[Dict[str, Any]] = None):
+        self.period_start, self.period_end = period
+        coverage = (previous or {}).get("coverage")
+        # 이전 결과가 없거나 분석 기간이 앞쪽으로 늘어났으면 전체 기간을 처리
+        if not INCREMENTAL or not coverage or coverage["period_start"] > self.period_start:
+            previous, coverage = None, None
+        self.previous = previous
+        self.coverage = coverage
+        self.start = max(coverage["watermark"], self.period_start) if coverage else self.period_start
+        self.end = self.period_end
+
+    @property
+    def incremental(self) -> bool:
+        return self.previous is not None
+
+    @property
+    def up_to_date(self) -> bool:
+        # 이미 종료일까지 검색했으면 새로 찾을 기사가 없음
+        return self.coverage is not None and self.coverage["searched_through"] >= self.period_end
+
+    def search_kwargs(self) -> Dict[str, str]:
+        """Tavily 검색의 날짜 범위 인자"""
+        return {"start_date": self.start, "end_date": self.end}
+
+    def is_new(self, item: Dict[str, Any], seen_urls: Set[str]) -> bool:
+        # 검색 API가 날짜 범위를 무시하는 경우에도 이미 처리한 기사는 건너뜀
+        if item.get("url", "") in seen_urls:
+            return False
+        published = published_date(item)
+        return published is None or self.start <= published <= self.end
+
+    def next_coverage(self, articles: Iterable[Dict[str, Any]], complete: bool = True) -> Dict[str, str]:
+        """이번 실행까지 반영한 워터마크 (가장 최근 발행일, 발행일을 모르면 검색 종료일).
+
+        기한 초과로 후보 기사를 다 처리하지 못했으면(complete=False) 수집한 기사는 결과에 남기되
+        워터마크와 검색 종료일은 이전 값을 유지해 다음 실행에서 같은 구간을 다시 검색한다
+        (이미 요약한 기사는 URL로 걸러짐). 검색 자체가 실패하면 failed_ingest()를 사용.
+        """
+        period_start = self.coverage["period_start"] if self.coverage else self.period_start
+        if not complete:
+            return {
+                "period_start": period_start,
+                "searched_through": self.coverage["searched_through"] if self.coverage else self.start,
+                "watermark": self.coverage["watermark"] if self.coverage else self.start,
+                "updated_at": datetime.utcnow().isoformat(),
+            }
+        dates = [d for d in (published_date(a) for a in articles) if d]
+        if self.coverage and self.coverage.get("watermark"):
+            dates.append(self.coverage["watermark"])
+        return {
+            "period_start": period_start,
+            "searched_through": self.period_end,
+            "watermark": max(dates) if dates else self.period_end,
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+
+
+def merge_articles(
+    new: List[Dict[str, Any]], old: List[Dict[str, Any]], period_start: str, limit: int
+) -> List[Dict[str, Any]]:
+    """새 기사와 이전 기사를 URL 기준으로 합치고, 기간을 벗어난 기사는 빼고 최신순으로 limit개만 유지"""
+    merged, seen = [], set()
+    for article in list(new) + list(old):
+        url = article.get("url", "")
+        published = published_date(article)
+        if (url and url in seen) or (published and published < period_start):
+            continue
+        seen.add(url)
+        merged.append(article)
+    # 발행일을 모르는 기사는 뒤로 (같은 날짜 안에서는 새 기사 우선)
+    merged.sort(key=lambda a: published_date(a) or "", reverse=True)
+    return merged[:limit]
+
+
+def failed_ingest(agent_name: str, company: str, window: IngestWindow, error: str) -> Dict[str, Any]:
+    """검색이 실패했거나 기한 안에 처리한 기사가 하나도 없는 기업의 결과.
+
+    결과 로그에 저장하지 않으므로 워터마크와 검색 종료일이 그대로 남아 다음 실행에서
+    같은 구간을 다시 검색한다. 이전 결과가 있으면 previous로 함께 돌려줘 이번 실행에서 사용한다.
+    """
+    logging.warning(f"[{agent_name.replace('_', '')}] 수집 미완료 - {company} - {error} (워터마크 유지)")
+    return {
+        "agent_name": agent_name,
+        "status": "fail",
+        "timestamp": datetime.utcnow().isoformat(),
+        "company": company,
+        "error_info": error,
+        "previous": window.previous,
+    }